@@ -0,0 +1,91 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import json
+import os
+import re
+
+import pyarrow.compute as pc
+
+### bucketed layout: csv_to_parquet --bucket_by writes the rows of a table with
+## bucket = key % num_buckets to <name>_bucket_<bucket>.parquet files, and the bucketing spec to
+## <table dir>/_bucketing.json. Readers assign bucket i to rank i % world_size, so all rows with
+## a given key are on the same rank. Joins and groupbys on the bucket key of tables bucketed
+## with the same num_buckets then need no shuffle
+
+BUCKETING_FILE = "_bucketing.json"
+
+BUCKET_FILE_RE = re.compile(r"_bucket_(\d+)\.parquet$")
+
+
+def get_bucket_ids(key_column, num_buckets):
+    """Bucket of each key. Null keys are put in bucket 0"""
+    return pc.fill_null(pc.remainder(pc.abs(key_column), num_buckets), 0)
+
+
+def split_by_bucket(pa_table, column, num_buckets):
+    """Returns [(bucket, table)] of the non empty buckets of pa_table, in bucket order"""
+    bucket_ids = get_bucket_ids(pa_table.column(column), num_buckets)
+    order = pc.sort_indices(bucket_ids)
+    sorted_table = pa_table.take(order)
+    sorted_ids = bucket_ids.take(order)
+
+    buckets = []
+    offset = 0
+    for bucket_count in pc.value_counts(sorted_ids):
+        bucket, count = bucket_count["values"].as_py(), bucket_count["counts"].as_py()
+        buckets.append((bucket, sorted_table.slice(offset, count)))
+        offset += count
+    return buckets
+
+
+def get_bucket_file_name(name, bucket):
+    return f"{name}_bucket_{bucket:05}.parquet"
+
+
+def get_bucket(filepath):
+    """Returns the bucket of a bucket file, or None if it is not one"""
+    match = BUCKET_FILE_RE.search(filepath)
+    return int(match.group(1)) if match else None
+
+
+def write_bucketing(table_dir, column, num_buckets):
+    os.makedirs(table_dir, exist_ok=True)
+    with open(os.path.join(table_dir, BUCKETING_FILE), "w") as fp:
+        json.dump({"column": column, "num_buckets": num_buckets}, fp)
+
+
+def read_bucketing(table_dir):
+    """Returns the (column, num_buckets) a table is bucketed by, or None if it is not"""
+    path = os.path.join(table_dir, BUCKETING_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as fp:
+        spec = json.load(fp)
+    return spec["column"], spec["num_buckets"]
+
+
+def get_rank_buckets(rank, world_size, num_buckets):
+    return [b for b in range(num_buckets) if b % world_size == rank]
+
+
+def co_bucketed(reader, table_keys):
+    """
+    Returns True if all tables of table_keys [(table, key column)] are bucketed on their key
+    column with the same number of buckets, ie: rows with equal keys are on the same rank
+    """
+    specs = [reader.get_bucketing(table) for table, _ in table_keys]
+    if any(spec is None for spec in specs):
+        return False
+    return all(spec[0] == key for spec, (_, key) in zip(specs, table_keys)) and \
+        len({num_buckets for _, num_buckets in specs}) == 1
@@ -0,0 +1,51 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+from pycylon import Table, DataFrame, CylonEnv
+
+from cylon_xbb_tools.schemas import decode_dictionary_columns
+
+### chunked tables: pieces of a table (data and data_refresh files, byte ranges, row groups)
+## are concatenated as chunks of the same columns, which only links their buffers. Chunked
+## tables are handed to pycylon as they are: cylon operators that need contiguous columns (join,
+## sort, groupby keys) combine the chunks of the columns they use themselves, so columns that are
+## only projected or filtered are never copied.
+## Dictionary encoded columns (see schemas.DICTIONARY_COLUMNS) are decoded here: they only
+## shrink the arrow side of the readers (scan filters, cached and node shared IPC files), as
+## pycylon merges, groupbys and shuffles are not known to take dictionary columns
+
+
+def concat_tables(tables):
+    """
+    Zero-copy concat of tables with the same schema. Empty tables are dropped, so that they do
+    not add chunks. Returns the table itself if there is a single one
+    """
+    non_empty = [t for t in tables if t.num_rows > 0]
+    if not non_empty:
+        return tables[0]
+    return pa.concat_tables(non_empty) if len(non_empty) > 1 else non_empty[0]
+
+
+def to_dataframe(env: CylonEnv, pa_table) -> DataFrame:
+    """
+    Wraps pa_table (chunked or not) in a cylon DataFrame, zero-copy except for its dictionary
+    encoded columns, which are decoded
+    """
+    return DataFrame(Table.from_arrow(env.context, decode_dictionary_columns(pa_table)))
+
+
+def concat_dataframes(env: CylonEnv, dfs) -> DataFrame:
+    """Zero-copy concat of local DataFrames with the same columns, as chunks (cy.concat copies)"""
+    return to_dataframe(env, concat_tables([df.to_arrow() for df in dfs]))
+
@@ -0,0 +1,63 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+from pycylon import CylonEnv
+
+### small collectives over mpi4py (on MPI.COMM_WORLD, as the MPIConfig of the queries), for
+## objects and arrow tables that pycylon has no collective for. Tables are sent as Arrow IPC
+## streams, which only contain the data of sliced tables
+
+
+def _serialize(pa_table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, pa_table.schema) as writer:
+        writer.write_table(pa_table)
+    return sink.getvalue().to_pybytes()
+
+
+def _deserialize(data):
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+
+
+def allgather(env: CylonEnv, obj):
+    """Collective. Returns the list of obj of all ranks, in rank order"""
+    if env.world_size == 1:
+        return [obj]
+    from mpi4py import MPI
+    return MPI.COMM_WORLD.allgather(obj)
+
+
+def barrier(env: CylonEnv):
+    """Collective. Returns once all ranks called it"""
+    if env.world_size == 1:
+        return
+    from mpi4py import MPI
+    MPI.COMM_WORLD.Barrier()
+
+
+def gather_tables(env: CylonEnv, pa_table, root=0):
+    """Collective. Returns the list of pa_table of all ranks on root (in rank order), else None"""
+    if env.world_size == 1:
+        return [pa_table]
+    from mpi4py import MPI
+    gathered = MPI.COMM_WORLD.gather(_serialize(pa_table), root=root)
+    return [_deserialize(data) for data in gathered] if env.rank == root else None
+
+
+def allgather_tables(env: CylonEnv, pa_table):
+    """Collective. Returns the list of pa_table of all ranks, in rank order"""
+    if env.world_size == 1:
+        return [pa_table]
+    from mpi4py import MPI
+    return [_deserialize(data) for data in MPI.COMM_WORLD.allgather(_serialize(pa_table))]
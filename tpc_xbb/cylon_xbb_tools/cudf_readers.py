@@ -15,8 +15,11 @@ import os
 from abc import ABC, abstractmethod
 
 import cudf
+import pyarrow as pa
 import pygcylon as gc
 
+from cylon_xbb_tools.schemas import get_arrow_schema
+
 # from pycylon.io import read_csv, CSVReadOptions
 # from pycylon.frame import DataFrame
 
@@ -94,21 +97,12 @@ SINGLE_PARTITION_TABLES = [
     "time_dim",
 ]
 
-spark_schema_dir = f"{os.getcwd()}/spark_table_schemas/"
-
-
 def get_schema(table):
-    with open(f"{spark_schema_dir}{table}.schema") as fp:
-        schema = fp.read()
-        names = [line.replace(",", "").split()[0] for line in schema.split("\n")]
-        types = [
-            line.replace(",", "").split()[1].replace("bigint", "int").replace("string", "str")
-            for line in schema.split("\n")
-        ]
-        types = [
-            col_type.split("(")[0].replace("decimal", "float") for col_type in types
-        ]
-        return names, types
+    """Returns the column names and cudf dtypes of a table from the schema registry"""
+    schema = get_arrow_schema(table)
+    types = ["str" if pa.types.is_string(t) else t.to_pandas_dtype().__name__
+             for t in schema.types]
+    return schema.names, types
 
 
 class Reader(ABC):
@@ -203,7 +197,10 @@ class CSVReader(Reader):
     def read(self, env: gc.CylonEnv, table, relevant_cols=None, **kwargs) -> gc.DataFrame:
         filepath = self.table_path_mapping[table].replace('$TABLE', table)
 
-        column_names, _ = get_schema(table)
+        column_names, column_types = get_schema(table)
+        # exact types from the schema registry, so that cudf does not infer them
+        dtype = {c: t for c, t in zip(column_names, column_types)
+                 if relevant_cols is None or c in relevant_cols}
 
         # if table is in refresh_tables list, read that table and concat
         # NOTE: refresh tables have the same parallelism as its data tables
@@ -211,14 +208,16 @@ class CSVReader(Reader):
             data_table = cudf.read_csv(filepath,
                                        names=column_names,
                                        delimiter='|',
-                                       usecols=relevant_cols)
+                                       usecols=relevant_cols,
+                                       dtype=dtype)
 #            print("has read the file:", filepath, "with rows:", len(data_table.index))
             refresh_path = filepath.replace('/data/', '/data_refresh/')
 
             refresh_table = cudf.read_csv(refresh_path,
                                           names=column_names,
                                           delimiter='|',
-                                          usecols=relevant_cols)
+                                          usecols=relevant_cols,
+                                          dtype=dtype)
 
             pa_table = gc.concat([gc.DataFrame.from_cudf(data_table), gc.DataFrame.from_cudf(refresh_table)])
         else:
@@ -226,7 +225,8 @@ class CSVReader(Reader):
             pa_table = cudf.read_csv(filepath,
                                      names=column_names,
                                      delimiter='|',
-                                     usecols=relevant_cols)
+                                     usecols=relevant_cols,
+                                     dtype=dtype)
 #            print("has read the file:", filepath, "with rows:", len(pa_table.index))
             pa_table = gc.DataFrame.from_cudf(pa_table)
 
@@ -0,0 +1,49 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+import pyarrow.compute as pc
+
+### exact decimals: decimal(p,s) columns read as int64 values scaled by 10^s (ex: 12.34 -> 1234
+## for decimal(7,2)). Sums and comparisons are then exact integer ops, and results do not
+## depend on the summation order (ie: the number of ranks). Convert back to float only for
+## final ratios/outputs
+
+# all TPCx-BB decimals are decimal(p,2)
+DEFAULT_SCALE = 2
+
+
+def scale_decimal_columns(pa_table, decimal_scales):
+    """
+    Converts the float64 (or decimal128) decimal columns of pa_table to scaled int64s.
+    decimal_scales is {column: scale} (see schemas.get_decimal_scales). Rounding makes the
+    conversion exact for |values| < 2^53 / 10^scale, far above the decimal(7,2) range of TPCx-BB
+    """
+    for i, name in enumerate(pa_table.column_names):
+        col_type = pa_table.schema.field(i).type
+        if name in decimal_scales and \
+                (pa.types.is_floating(col_type) or pa.types.is_decimal(col_type)):
+            column = pa_table.column(i).cast(pa.float64())
+            scaled = pc.round(pc.multiply(column, 10 ** decimal_scales[name]))
+            pa_table = pa_table.set_column(i, name, scaled.cast(pa.int64()))
+    return pa_table
+
+
+def to_scaled(value, scale=DEFAULT_SCALE):
+    """Scales a decimal constant to compare with exact decimal columns"""
+    return int(round(value * 10 ** scale))
+
+
+def decimal_constant(value, exact_decimals, scale=DEFAULT_SCALE):
+    """Returns a decimal constant in the units of columns read with(out) exact_decimals"""
+    return to_scaled(value, scale) if exact_decimals else value
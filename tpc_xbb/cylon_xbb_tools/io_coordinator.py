@@ -0,0 +1,126 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import fcntl
+import io
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+from cylon_xbb_tools.node import is_node_local
+
+
+class IOCoordinator:
+    """
+    Limits the concurrent reads of the ranks of a node from each device (disk or mount, by
+    st_dev) to tokens_per_device. When many ranks of a node read a spinning disk at once, its
+    seeks between their files collapse the throughput; ranges are read sequentially instead, in
+    large readahead chunks, each while holding a token of the device. Chunks are parsed after
+    the token is released, so the disk stays busy while the CPU heavy parsing runs in parallel,
+    and a piece never needs more than one chunk in memory.
+
+    Tokens are flock()ed files in token_dir, so the ranks sharing a node (and their reader
+    threads) share them without any MPI communication. token_dir must be on a node local
+    filesystem, so that the ranks of other nodes do not hold the same tokens.
+    """
+
+    def __init__(self, tokens_per_device=1, token_dir=None, readahead=(1 << 26),
+                 poll_interval=0.01):
+        self.tokens_per_device = tokens_per_device
+        self.token_dir = token_dir if token_dir is not None else \
+            os.path.join(tempfile.gettempdir(), "cylon_xbb_io_tokens")
+        os.makedirs(self.token_dir, exist_ok=True)
+        if not is_node_local(self.token_dir):
+            raise ValueError(f"io token dir {self.token_dir} is on a network filesystem, its "
+                             f"tokens would be shared by the ranks of several nodes")
+        self.readahead = readahead
+        self.poll_interval = poll_interval
+
+    @contextmanager
+    def token(self, path):
+        """Holds one of the read tokens of the device of path"""
+        device = os.stat(path).st_dev
+        while True:
+            for i in range(self.tokens_per_device):
+                fd = os.open(os.path.join(self.token_dir, f"dev-{device}-{i}.lock"),
+                             os.O_CREAT | os.O_RDWR, 0o666)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    continue
+
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+                return
+            time.sleep(self.poll_interval)
+
+    def open_range(self, path, start=None, end=None):
+        """
+        Opens [start, end) of path (the whole file if start is None) as a pyarrow input stream,
+        read in readahead sized chunks while holding a token of the device
+        """
+        if start is None:
+            start, end = 0, os.path.getsize(path)
+        return pa.PythonFile(_TokenRangeFile(self, path, start, end), mode="r")
+
+
+class _TokenRangeFile(io.RawIOBase):
+    """A [start, end) range of a file, read one readahead chunk (and token) at a time"""
+
+    def __init__(self, coordinator, path, start, end):
+        super().__init__()
+        self.coordinator = coordinator
+        self.path = path
+        self.end = end
+        self.fp = open(path, "rb", buffering=0)
+        os.posix_fadvise(self.fp.fileno(), start, end - start, os.POSIX_FADV_SEQUENTIAL)
+        self.fp.seek(start)
+        self.offset = start
+        self.chunk = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def _read_chunk(self):
+        buf = bytearray(min(self.coordinator.readahead, self.end - self.offset))
+        view = memoryview(buf)
+        n = 0
+        with self.coordinator.token(self.path):
+            while n < len(buf):
+                read = self.fp.readinto(view[n:])
+                if read == 0:
+                    raise EOFError(f"{self.path} is shorter than {self.end} bytes")
+                n += read
+        self.offset += n
+        self.chunk = view
+
+    def readinto(self, b):
+        if not self.chunk:
+            if self.offset >= self.end:
+                return 0
+            self._read_chunk()
+        n = min(len(b), len(self.chunk))
+        b[:n] = self.chunk[:n]
+        self.chunk = self.chunk[n:]
+        return n
+
+    def close(self):
+        self.fp.close()
+        super().close()
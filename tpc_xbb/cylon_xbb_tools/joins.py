@@ -0,0 +1,125 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+import pyarrow.compute as pc
+from pycylon import DataFrame, CylonEnv
+
+from cylon_xbb_tools.chunked import concat_tables, to_dataframe
+from cylon_xbb_tools.collectives import allgather, allgather_tables
+
+### joins of a large partitioned table with a small one. A shuffle join (merge(..., env=env))
+## moves the rows of both tables; a broadcast join replicates the small table on every rank
+## instead, and joins it with the rank local partition of the large one, which does not move.
+## smart_merge picks one of them (or a local join) from the global sizes of the tables. A semi
+## join, which only filters the large table, moves the distinct keys of the small one only
+
+
+def broadcast(env: CylonEnv, df: DataFrame) -> DataFrame:
+    """Collective. Returns all rows of the partitioned df on every rank"""
+    return to_dataframe(env, concat_tables(allgather_tables(env, df.to_arrow())))
+
+
+def broadcast_merge(env: CylonEnv, left: DataFrame, right: DataFrame, how="inner",
+                    algorithm="hash", **kwargs) -> DataFrame:
+    """
+    Collective. Joins left with the small right by broadcasting right, and a local (hash by
+    default) join on each rank. kwargs (on, left_on, right_on, suffixes) are passed to merge
+    """
+    # rows of left are only matched against the right rows of their own rank
+    assert how in ("inner", "left"), f"broadcast join does not support how={how}"
+    return left.merge(broadcast(env, right), how=how, algorithm=algorithm, **kwargs)
+
+
+# total bytes of the smaller table (across all ranks) below which smart_merge broadcasts it
+BROADCAST_THRESHOLD = 1 << 26
+
+
+def _get_sizes(env: CylonEnv, left: DataFrame, right: DataFrame):
+    """
+    Collective. Global (rows, bytes) of left and right, summed from a single allgather of the
+    local sizes of every rank
+    """
+    left_table, right_table = left.to_arrow(), right.to_arrow()
+    local = (left_table.num_rows, left_table.nbytes, right_table.num_rows, right_table.nbytes)
+    totals = [sum(sizes) for sizes in zip(*allgather(env, local))]
+    return (totals[0], totals[1]), (totals[2], totals[3])
+
+
+def smart_merge(left: DataFrame, right: DataFrame, on=None, env: CylonEnv = None, how="inner",
+                algorithm="sort", left_replicated=False, right_replicated=False,
+                broadcast_threshold=BROADCAST_THRESHOLD, verbose=False, **kwargs) -> DataFrame:
+    """
+    Collective (unless a side is replicated). Joins left and right with the cheapest strategy,
+    from their global sizes (allgathered, see _get_sizes):
+    - local: if a side is replicated on every rank (ex: SINGLE_PARTITION_TABLES), or env is None
+    - broadcast: if the smaller side is below broadcast_threshold bytes in total
+    - shuffle: otherwise
+    kwargs (left_on, right_on, suffixes) are passed to merge. With verbose, the strategy is
+    printed on rank 0
+    """
+    if on is not None:
+        kwargs["on"] = on
+
+    if env is None or (right_replicated and how in ("inner", "left")) or \
+            (left_replicated and how in ("inner", "right")):
+        return left.merge(right, how=how, algorithm=algorithm, **kwargs)
+
+    (left_rows, left_bytes), (right_rows, right_bytes) = _get_sizes(env, left, right)
+    # a side can only be broadcast if the rows of the other side need no match from other ranks
+    broadcast_right = right_bytes <= broadcast_threshold and how in ("inner", "left")
+    broadcast_left = left_bytes <= broadcast_threshold and how in ("inner", "right")
+    if broadcast_right and (not broadcast_left or right_bytes <= left_bytes):
+        strategy = "broadcast right"
+        result = broadcast_merge(env, left, right, how=how, **kwargs)
+    elif broadcast_left:
+        strategy = "broadcast left"
+        result = broadcast(env, left).merge(right, how=how, algorithm="hash", **kwargs)
+    else:
+        strategy = "shuffle"
+        result = left.merge(right, how=how, algorithm=algorithm, env=env, **kwargs)
+
+    if verbose and env.rank == 0:
+        print(f"smart_merge: {strategy} left: {left_rows} rows {left_bytes} bytes "
+              f"right: {right_rows} rows {right_bytes} bytes")
+    return result
+
+
+# name of the key column of the distinct keys of semi_join
+SEMI_JOIN_KEY = "__semi_join_key"
+
+
+def semi_join(left: DataFrame, right_keys: DataFrame, env: CylonEnv, left_on, right_on=None,
+              right_replicated=False, algorithm="sort",
+              broadcast_threshold=BROADCAST_THRESHOLD) -> DataFrame:
+    """
+    Left semi join: rows of left whose left_on key is one of the right_on (left_on by default)
+    keys of right_keys. Only the distinct keys of right_keys are moved (none if it is
+    replicated): broadcast if they are below broadcast_threshold bytes in total, otherwise
+    shuffled along with left. The result has the columns of left only
+    """
+    right_on = left_on if right_on is None else right_on
+    keys = right_keys.to_arrow().column(right_on).unique()
+
+    if not right_replicated and env is not None and env.world_size > 1:
+        if sum(allgather(env, keys.nbytes)) > broadcast_threshold:
+            keys_df = to_dataframe(env, pa.table({SEMI_JOIN_KEY: keys})).drop_duplicates(env=env)
+            return left.merge(keys_df, how="inner", algorithm=algorithm, left_on=[left_on],
+                              right_on=[SEMI_JOIN_KEY], suffixes=("", ""), env=env) \
+                .drop([SEMI_JOIN_KEY])
+        keys = pa.concat_arrays(allgather(env, keys)).unique()
+
+    left_table = left.to_arrow()
+    # null keys match nothing, as in a join
+    matches = pc.is_in(left_table.column(left_on), value_set=keys, skip_nulls=True)
+    return to_dataframe(env, left_table.filter(matches))
@@ -0,0 +1,97 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from pycylon import DataFrame, CylonEnv
+
+from cylon_xbb_tools.chunked import to_dataframe
+
+### direct lookup joins: the surrogate keys of dimension tables (d_date_sk, t_time_sk,
+## hd_demo_sk, cd_demo_sk...) are dense integer ranges. A local join of a fact table with such a
+## (replicated) dimension is then a gather: slot key - min key of a dense array holds the row of
+## the dimension with that key, and the dimension columns are taken at the rows of the fact keys
+
+# a dimension is indexed densely if its key range has at most
+# max(DENSE_SPAN_RATIO * rows, DENSE_MIN_SLOTS) slots
+DENSE_SPAN_RATIO = 16
+DENSE_MIN_SLOTS = 1 << 20
+
+
+class DenseKeyIndex:
+    """Dense index of the unique integer key column of pa_table"""
+
+    def __init__(self, pa_table, key):
+        self.table = pa_table
+        keys = pa_table.column(key)
+        min_max = pc.min_max(keys)
+        self.min_key = min_max["min"].as_py()
+        self.num_slots = min_max["max"].as_py() - self.min_key + 1
+
+        # rows[slot] is the row with key min_key + slot, or -1
+        self.rows = np.full(self.num_slots, -1, dtype=np.int64)
+        valid = np.asarray(pc.is_valid(keys).combine_chunks())
+        slots = self._get_slots(keys)
+        self.rows[slots[valid]] = np.arange(pa_table.num_rows)[valid]
+        self.unique = np.count_nonzero(self.rows >= 0) == np.count_nonzero(valid)
+
+    @staticmethod
+    def is_dense(pa_table, key):
+        keys = pa_table.column(key)
+        if not pa.types.is_integer(keys.type) or keys.null_count == keys.length():
+            return False
+        min_max = pc.min_max(keys)
+        num_slots = min_max["max"].as_py() - min_max["min"].as_py() + 1
+        return num_slots <= max(DENSE_SPAN_RATIO * pa_table.num_rows, DENSE_MIN_SLOTS)
+
+    def _get_slots(self, key_column):
+        """Slots of key_column, -1 for nulls"""
+        slots = pc.subtract(pc.cast(key_column, pa.int64()), self.min_key)
+        return np.asarray(pc.fill_null(slots, -1).combine_chunks())
+
+    def get_rows(self, key_column):
+        """Rows of the keys of key_column, -1 if there is no row with that key (or it is null)"""
+        slots = self._get_slots(key_column)
+        in_range = (slots >= 0) & (slots < self.num_slots)
+        rows = np.full(len(slots), -1, dtype=np.int64)
+        rows[in_range] = self.rows[slots[in_range]]
+        return rows
+
+    def join(self, pa_table, key, how="inner"):
+        """pa_table with the columns of the rows with its key column key (inner or left join)"""
+        rows = self.get_rows(pa_table.column(key))
+        if how == "inner":
+            matched = rows >= 0
+            pa_table, rows = pa_table.filter(matched), rows[matched]
+        # null indices take null rows, for the unmatched rows of a left join
+        looked_up = self.table.take(pa.array(rows, mask=(rows < 0)))
+        for name, column in zip(looked_up.column_names, looked_up.columns):
+            pa_table = pa_table.append_column(name, column)
+        return pa_table
+
+
+def lookup_merge(env: CylonEnv, left: DataFrame, right: DataFrame, left_on, right_on,
+                 how="inner") -> DataFrame:
+    """
+    Local join of left with the replicated dimension right on its unique right_on key, with a
+    DenseKeyIndex of right. Falls back to a local hash merge if the key is not dense or unique
+    """
+    assert how in ("inner", "left"), f"lookup join does not support how={how}"
+    right_table = right.to_arrow()
+    if DenseKeyIndex.is_dense(right_table, right_on):
+        index = DenseKeyIndex(right_table, right_on)
+        if index.unique:
+            return to_dataframe(env, index.join(left.to_arrow(), left_on, how=how))
+    return left.merge(right, how=how, algorithm="hash", left_on=[left_on], right_on=[right_on],
+                      suffixes=("", ""))
@@ -0,0 +1,103 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import os
+from functools import lru_cache
+
+# node local rank/size set by the common MPI launchers (OpenMPI, MPICH/Intel MPI, MVAPICH, slurm)
+LOCAL_RANK_ENV_VARS = [
+    "OMPI_COMM_WORLD_LOCAL_RANK",
+    "MPI_LOCALRANKID",
+    "MV2_COMM_WORLD_LOCAL_RANK",
+    "SLURM_LOCALID",
+]
+
+LOCAL_SIZE_ENV_VARS = [
+    "OMPI_COMM_WORLD_LOCAL_SIZE",
+    "MPI_LOCALNRANKS",
+    "MV2_COMM_WORLD_LOCAL_SIZE",
+]
+
+# filesystems shared between nodes. Files that coordinate the ranks of a node (locks, node
+# shared tables) must not be on them
+NETWORK_FS_TYPES = {
+    "nfs", "nfs4", "cifs", "smb3", "lustre", "gpfs", "beegfs", "ceph", "fuse.ceph",
+    "glusterfs", "fuse.glusterfs", "panfs", "pvfs2", "orangefs", "fuse.sshfs", "9p",
+}
+
+
+@lru_cache(maxsize=None)
+def _get_node_comm():
+    # NOTE: Split_type is collective. It is only reached if the launcher does not export the
+    # local rank, and must then be called by all ranks (ex: when constructing a reader)
+    try:
+        from mpi4py import MPI
+    except ImportError:
+        return None
+    return MPI.COMM_WORLD.Split_type(MPI.COMM_TYPE_SHARED)
+
+
+def _from_env(env_vars):
+    for var in env_vars:
+        if var in os.environ:
+            return int(os.environ[var])
+    return None
+
+
+def get_local_rank():
+    """
+    Returns the rank of this process among the ranks of its node, or None if it can not be
+    determined (no launcher env variables and no mpi4py)
+    """
+    local_rank = _from_env(LOCAL_RANK_ENV_VARS)
+    if local_rank is None and _get_node_comm() is not None:
+        local_rank = _get_node_comm().Get_rank()
+    return local_rank
+
+
+def get_local_size():
+    """Returns the number of ranks on this node, or None if it can not be determined"""
+    local_size = _from_env(LOCAL_SIZE_ENV_VARS)
+    if local_size is None and _get_node_comm() is not None:
+        local_size = _get_node_comm().Get_size()
+    return local_size
+
+
+def get_fs_type(path):
+    """
+    Returns the type of the filesystem path is on (ex: ext4, tmpfs, nfs4), from the longest
+    mount point of /proc/self/mounts that contains it, or None if it can not be determined
+    """
+    path = os.path.realpath(path)
+    fs_type, mount_len = None, -1
+    try:
+        with open("/proc/self/mounts") as fp:
+            for line in fp:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # spaces in mount points are escaped as \040
+                mount_point = fields[1].replace("\\040", " ")
+                prefix = mount_point.rstrip("/") + "/"
+                # >=: the last of several mounts on the same point is the visible one
+                if (path == mount_point or path.startswith(prefix)) and \
+                        len(mount_point) >= mount_len:
+                    fs_type, mount_len = fields[2], len(mount_point)
+    except OSError:
+        return None
+    return fs_type
+
+
+def is_node_local(path):
+    """False if path is on a filesystem shared between nodes (see NETWORK_FS_TYPES)"""
+    return get_fs_type(path) not in NETWORK_FS_TYPES
@@ -0,0 +1,60 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict
+
+from pycylon import DataFrame, CylonEnv
+
+from cylon_xbb_tools.readers import Reader
+
+
+class TablePrefetcher:
+    """
+    Reads the tables of a query concurrently on a bounded thread pool. Reads are local to the
+    rank (no communication), and pyarrow releases the GIL while reading, so small dimension
+    tables are loaded while the large fact tables are still being parsed.
+
+    tables is a list of (table, relevant_cols) or (table, relevant_cols, read_kwargs) tuples.
+    Reads are started in the given order, so list the largest tables first. Reads are looked up
+    by table, so a table may only be listed once.
+    """
+
+    def __init__(self, reader: Reader, env: CylonEnv, tables, max_parallel_reads=4):
+        names = [entry[0] for entry in tables]
+        duplicates = sorted({t for t in names if names.count(t) > 1})
+        if duplicates:
+            raise ValueError(f"tables listed more than once: {duplicates}. Read them once with "
+                             f"the union of their columns, or with separate prefetchers")
+
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel_reads)
+        self._futures: Dict[str, Future] = {}
+
+        for entry in tables:
+            table, relevant_cols = entry[0], entry[1]
+            read_kwargs = entry[2] if len(entry) > 2 else {}
+            self._futures[table] = self._executor.submit(reader.read, env, table,
+                                                         relevant_cols=relevant_cols,
+                                                         **read_kwargs)
+        # no more reads will be submitted. Threads exit once the queued reads are done
+        self._executor.shutdown(wait=False)
+
+    def future(self, table) -> Future:
+        return self._futures[table]
+
+    def get(self, table) -> DataFrame:
+        """Blocks until the table is read and returns it"""
+        return self._futures[table].result()
+
+    def get_all(self):
+        return tuple(f.result() for f in self._futures.values())
@@ -0,0 +1,102 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import json
+import time
+from threading import Lock
+
+from pycylon import CylonEnv
+
+METRICS = ["bytes", "rows", "wall_time", "cpu_time", "mb_per_s"]
+
+
+def start_timer():
+    return time.perf_counter(), time.process_time()
+
+
+class ReadStats:
+    """
+    Per table read statistics of this rank: input bytes, rows produced, wall time, CPU time
+    and throughput. Tables read more than once accumulate.
+
+    NOTE: CPU time is process wide. It includes arrow's parser threads, but also any read
+    running concurrently (ex: TablePrefetcher), so it is only exact for sequential reads
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._tables = {}
+
+    def record(self, table, timer, nbytes, rows):
+        """Records a read of table started at timer (see start_timer)"""
+        wall_time = time.perf_counter() - timer[0]
+        cpu_time = time.process_time() - timer[1]
+        with self._lock:
+            stats = self._tables.setdefault(table, {"bytes": 0, "rows": 0, "wall_time": 0.0,
+                                                    "cpu_time": 0.0})
+            stats["bytes"] += nbytes
+            stats["rows"] += rows
+            stats["wall_time"] += wall_time
+            stats["cpu_time"] += cpu_time
+
+    def reset(self):
+        with self._lock:
+            self._tables = {}
+
+    def to_dict(self):
+        """Returns {table: {metric: value}} for the tables read by this rank"""
+        with self._lock:
+            tables = {table: dict(stats) for table, stats in self._tables.items()}
+        for stats in tables.values():
+            stats["mb_per_s"] = stats["bytes"] / (1 << 20) / stats["wall_time"] \
+                if stats["wall_time"] > 0 else 0.0
+        return tables
+
+    def summarize(self, env: CylonEnv):
+        """
+        Collective. Returns {table: {metric: {"min", "max", "mean"}}} across all ranks. Ranks
+        that did not read a table count as 0 for it
+        """
+        local = self.to_dict()
+        if env.world_size > 1:
+            from mpi4py import MPI
+            all_stats = MPI.COMM_WORLD.allgather(local)
+        else:
+            all_stats = [local]
+
+        tables = sorted({table for stats in all_stats for table in stats})
+        summary = {}
+        for table in tables:
+            summary[table] = {}
+            for metric in METRICS:
+                values = [stats.get(table, {}).get(metric, 0) for stats in all_stats]
+                summary[table][metric] = {"min": min(values), "max": max(values),
+                                          "mean": sum(values) / len(values)}
+        return summary
+
+
+# stats of all the readers of this process
+READ_STATS = ReadStats()
+
+
+def print_read_summary(summary):
+    print(f"{'table':<24} {'metric':<10} {'min':>14} {'max':>14} {'mean':>14}")
+    for table, metrics in summary.items():
+        for metric, values in metrics.items():
+            print(f"{table:<24} {metric:<10} {values['min']:>14.3f} {values['max']:>14.3f} "
+                  f"{values['mean']:>14.3f}")
+
+
+def write_read_summary(summary, path):
+    with open(path, "w") as fp:
+        json.dump(summary, fp, indent=2)
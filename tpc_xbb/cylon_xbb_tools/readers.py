@@ -11,13 +11,43 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ##
+import glob
+import hashlib
+import json
 import os
+import time
+import warnings
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 from pyarrow.csv import ReadOptions, ParseOptions, ConvertOptions
 from pyarrow.csv import read_csv as pa_read_csv
-from pyarrow import concat_tables as pa_concat_tables
-from pycylon import Table, DataFrame, CylonEnv
+from pyarrow.csv import open_csv as pa_open_csv
+from pyarrow import schema as pa_schema
+from pyarrow import Table as pa_Table
+from pyarrow import memory_map as pa_memory_map
+from pyarrow import BufferReader as pa_BufferReader
+from pyarrow import input_stream as pa_input_stream
+from pyarrow import CompressedInputStream as pa_CompressedInputStream
+import pyarrow.ipc as ipc
+import pyarrow.types as pa_types
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.orc as orc
+import pyarrow.parquet as pq
+from pyarrow.fs import LocalFileSystem
+from pycylon import DataFrame, CylonEnv
+
+from cylon_xbb_tools import bucketing, zonemap
+from cylon_xbb_tools.chunked import concat_tables, to_dataframe
+from cylon_xbb_tools.collectives import barrier
+from cylon_xbb_tools.decimals import scale_decimal_columns
+from cylon_xbb_tools.io_coordinator import IOCoordinator
+from cylon_xbb_tools.node import get_local_rank
+from cylon_xbb_tools.read_stats import READ_STATS, start_timer
+from cylon_xbb_tools.schemas import get_arrow_schema, get_column_types, get_dictionary_columns, \
+    get_decimal_scales
+from cylon_xbb_tools.staging import Stager
 
 # from pycylon.io import read_csv, CSVReadOptions
 # from pycylon.frame import DataFrame
@@ -96,21 +126,177 @@ SINGLE_PARTITION_TABLES = [
     "time_dim",
 ]
 
-spark_schema_dir = f"{os.getcwd()}/spark_table_schemas/"
-
-
 def get_schema(table):
-    with open(f"{spark_schema_dir}{table}.schema") as fp:
-        schema = fp.read()
-        names = [line.replace(",", "").split()[0] for line in schema.split("\n")]
-        types = [
-            line.replace(",", "").split()[1].replace("bigint", "int").replace("string", "str")
-            for line in schema.split("\n")
-        ]
-        types = [
-            col_type.split("(")[0].replace("decimal", "float") for col_type in types
-        ]
-        return names, types
+    """Returns the column names and arrow types of a table from the schema registry"""
+    schema = get_arrow_schema(table)
+    return schema.names, schema.types
+
+
+def get_filter_expression(filters):
+    """
+    Converts read filters to a pyarrow compute expression. Filters can either be an expression
+    (ex: pc.field("d_year") == 2001) or a dask/pyarrow style DNF list of (column, op, value)
+    tuples (ex: [("d_year", "==", 2001), ("d_moy", "in", [1, 2])])
+    """
+    if filters is None or isinstance(filters, pc.Expression):
+        return filters
+    return pq.filters_to_expression(filters)
+
+
+def get_filter_columns(filters):
+    """
+    Returns the columns referenced by DNF filters. Returns None for expressions, as the
+    referenced fields can not be listed from a pyarrow expression
+    """
+    if filters is None:
+        return []
+    if isinstance(filters, pc.Expression):
+        return None
+
+    # DNF filters are either a list of (col, op, val) tuples or a list of such lists
+    conjunctions = filters if isinstance(filters[0], list) else [filters]
+    columns = []
+    for conjunction in conjunctions:
+        for col, _, _ in conjunction:
+            if col not in columns:
+                columns.append(col)
+    return columns
+
+
+def dictionary_encode_columns(pa_table, dictionary_cols):
+    """Dictionary encodes the dictionary_cols of pa_table (if present and not yet encoded)"""
+    for c in dictionary_cols:
+        if c in pa_table.column_names:
+            i = pa_table.column_names.index(c)
+            if not pa_types.is_dictionary(pa_table.schema.field(i).type):
+                pa_table = pa_table.set_column(i, c, pc.dictionary_encode(pa_table.column(i)))
+    return pa_table
+
+
+def glob_files(pattern, suffixes=("",)):
+    """
+    Returns the files matching the pattern glob (+ any of suffixes), sorted. If a file exists
+    with several suffixes (ex: item_1.dat and item_1.dat.gz), only the one with the first suffix
+    is returned, so that its rows are read once
+    """
+    files = {}
+    for suffix in suffixes:
+        for f in glob.glob(pattern + suffix):
+            files.setdefault(f[:len(f) - len(suffix)], f)
+    return [files[name] for name in sorted(files)]
+
+
+def get_table_files(filepath, table, suffixes=("",)):
+    """
+    Returns the files matching the filepath glob (+ any of suffixes, see glob_files). If table
+    is in refresh_tables list, the data_refresh files are appended, so that they are
+    partitioned along with the data files
+    """
+    files = glob_files(filepath, suffixes)
+    refresh_path = filepath.replace('/data/', '/data_refresh/')
+    # datasets that are not in a data/ dir have no data_refresh/ dir
+    if table in REFRESH_TABLES and refresh_path != filepath:
+        files += glob_files(refresh_path, suffixes)
+
+    if not files:
+        raise FileNotFoundError(f"no files found for {table}: {filepath}")
+    return files
+
+
+def get_rank_units(env: CylonEnv, units):
+    """Splits units (files, row groups, stripes...) into world_size contiguous blocks"""
+    start = (env.rank * len(units)) // env.world_size
+    end = ((env.rank + 1) * len(units)) // env.world_size
+    return units[start:end]
+
+
+class ArrowTableCache:
+    """
+    Caches tables read by a reader as Arrow IPC files in a (node local) cache_dir. A cached
+    table is memory mapped, so it is loaded zero-copy instead of being parsed again. Entries
+    are keyed on the source files and the read arguments, and are invalidated when the size or
+    the mtime of a source file changes.
+    """
+
+    SOURCES_KEY = b"cylon_xbb_sources"
+    # marker of an entry that could not be written, with the error
+    FAILED_SUFFIX = ".failed"
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _source_stats(sources):
+        stats = []
+        for path in sources:
+            st = os.stat(path)
+            stats.append([path, st.st_size, st.st_mtime_ns])
+        return json.dumps(stats).encode()
+
+    def _get_path(self, table, sources, key):
+        digest = hashlib.sha1(repr((sources, key)).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{table}-{digest}.arrow")
+
+    @staticmethod
+    def _map(path):
+        reader = ipc.open_file(pa_memory_map(path, 'r'))
+        return reader.schema.metadata or {}, reader.read_all().replace_schema_metadata(None)
+
+    def get(self, table, sources, key):
+        """Returns the cached table, or None if it is not cached or is stale"""
+        path = self._get_path(table, sources, key)
+        if not os.path.exists(path):
+            return None
+
+        metadata, pa_table = self._map(path)
+        if metadata.get(self.SOURCES_KEY) != self._source_stats(sources):
+            return None
+        return pa_table
+
+    def put(self, table, sources, key, pa_table):
+        """
+        Caches pa_table, and returns the cached copy, memory mapped: callers drop pa_table, so
+        that they do not hold the table twice
+        """
+        path = self._get_path(table, sources, key)
+        schema = pa_table.schema.with_metadata({self.SOURCES_KEY: self._source_stats(sources)})
+
+        # ranks of a node may share the cache dir. write to a temp file and rename it in place
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        # written as a single batch, so that the memory mapped table has contiguous columns and
+        # is passed to pycylon without a copy
+        with ipc.new_file(tmp_path, schema) as writer:
+            writer.write_table(pa_table.combine_chunks().replace_schema_metadata(schema.metadata))
+        # mapped before the rename, so that the entry can not be removed in between
+        _, cached = self._map(tmp_path)
+        os.replace(tmp_path, path)
+        return cached
+
+    def remove(self, table, sources, key):
+        """Removes an entry and its failure marker. Tables mapped from it stay valid"""
+        path = self._get_path(table, sources, key)
+        for p in (path, path + self.FAILED_SUFFIX):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+    def put_failure(self, table, sources, key, message):
+        """Marks an entry that could not be written, for the ranks waiting for it"""
+        with open(self._get_path(table, sources, key) + self.FAILED_SUFFIX, "w") as fp:
+            fp.write(message)
+
+    def get_failure(self, table, sources, key, since=0.0):
+        """Returns the message of a failure marked after since (a time.time()), or None"""
+        path = self._get_path(table, sources, key) + self.FAILED_SUFFIX
+        try:
+            if os.stat(path).st_mtime < since:
+                return None
+            with open(path) as fp:
+                return fp.read()
+        except FileNotFoundError:
+            return None
 
 
 class Reader(ABC):
@@ -118,75 +304,287 @@ class Reader(ABC):
 
     @abstractmethod
     def read(self, env: CylonEnv, filepath: str, **kwargs) -> DataFrame:
-        """"""
+        """
+        Reads the rank local partition of a table. Readers accept a `filters` kwarg (see
+        get_filter_expression) which is applied while scanning, so that rows failing the filter
+        are never materialized, and a `dictionary_cols` kwarg listing the string columns to read
+        dictionary encoded (defaults to schemas.DICTIONARY_COLUMNS for readers constructed with
+        dictionary_encode=True, else none). They are decoded when the table is handed to pycylon
+        (see chunked.to_dataframe).
+
+        Readers constructed with exact_decimals=True return decimal columns as int64s scaled by
+        10^scale (see decimals.py). Filters are applied before scaling, in decimal units.
+        """
 
     @abstractmethod
     def show_tables(self):
         """"""
 
+    def get_bucketing(self, table):
+        """Returns the (column, num_buckets) table is bucketed by, or None (see bucketing.py)"""
+        return None
+
 
 class ParquetReader(Reader):
     """Read TPCx-BB Parquet data"""
 
-    def __init__(
-            self, basepath, split_row_groups=False,
-    ):
+    def __init__(self, basepath, split_row_groups=True, exact_decimals=False,
+                 dictionary_encode=False):
+        # NOTE: partitioning is done at read time from env.rank/env.world_size
         self.table_path_mapping = {
             table: os.path.join(basepath, table, "*.parquet") for table in TABLE_NAMES
         }
         self.split_row_groups = split_row_groups
+        self.exact_decimals = exact_decimals
+        self.dictionary_encode = dictionary_encode
 
     def show_tables(self):
         return self.table_path_mapping.keys()
 
-    def read(self, ctx, table, relevant_cols=None, **kwargs):
-        # todo read from pyarrow and return the table
-        pass
-        # import dask_cudf
-        #
-        # filepath = self.table_path_mapping[table]
-        # # we ignore split_row_groups if gather_statistics=False
-        # if self.split_row_groups:
-        #
-        #     df = dask_cudf.read_parquet(
-        #         filepath,
-        #         columns=relevant_cols,
-        #         split_row_groups=self.split_row_groups,
-        #         gather_statistics=True,
-        #         **kwargs,
-        #     )
-        # else:
-        #     df = dask_cudf.read_parquet(
-        #         filepath,
-        #         columns=relevant_cols,
-        #         split_row_groups=self.split_row_groups,
-        #         gather_statistics=False,
-        #         **kwargs,
-        #     )
-        #
-        # ## Repartition small tables to a single partition to prevent
-        # ## distributed merges when possible
-        # ## Only matters when partition size<3GB
-        #
-        # if (table in SMALL_TABLES) or (table in SUPER_SMALL_TABLES):
-        #     df = df.repartition(npartitions=1)
-        # return df
+    def get_bucketing(self, table):
+        return bucketing.read_bucketing(os.path.dirname(self.table_path_mapping[table]))
+
+    def _get_pieces(self, env: CylonEnv, files, table_bucketing=None):
+        """
+        Returns the (file, row group indices) pieces assigned to this rank. Units (row groups, or
+        whole files if split_row_groups is False) are split into world_size contiguous blocks.
+        Files of bucketed tables are assigned by bucket instead, bucket i to rank i % world_size
+        """
+        if table_bucketing is not None:
+            rank_buckets = set(bucketing.get_rank_buckets(env.rank, env.world_size,
+                                                          table_bucketing[1]))
+            return [(f, None) for f in files if bucketing.get_bucket(f) in rank_buckets]
+
+        if self.split_row_groups:
+            units = [(f, [rg]) for f in files for rg in range(pq.ParquetFile(f).num_row_groups)]
+        else:
+            units = [(f, None) for f in files]
+
+        # merge consecutive row groups of the same file so that each file is opened only once
+        pieces = []
+        for f, rgs in get_rank_units(env, units):
+            if pieces and pieces[-1][0] == f and rgs is not None:
+                pieces[-1][1].extend(rgs)
+            else:
+                pieces.append((f, None if rgs is None else list(rgs)))
+        return pieces
+
+    @staticmethod
+    def _get_piece_bytes(f, rgs, columns):
+        """Returns the compressed bytes of the columns (all if None) of row groups rgs of f"""
+        metadata = pq.ParquetFile(f).metadata
+        nbytes = 0
+        for rg in (range(metadata.num_row_groups) if rgs is None else rgs):
+            row_group = metadata.row_group(rg)
+            for i in range(row_group.num_columns):
+                column = row_group.column(i)
+                if columns is None or column.path_in_schema in columns:
+                    nbytes += column.total_compressed_size
+        return nbytes
+
+    def read(self, env: CylonEnv, table, relevant_cols=None, filters=None, dictionary_cols=None,
+             **kwargs) -> DataFrame:
+        timer = start_timer()
+        files = get_table_files(self.table_path_mapping[table], table)
+        if table in SINGLE_PARTITION_TABLES:
+            # if table has only 1 partition, all ranks will load it!
+            pieces = [(f, None) for f in files]
+        else:
+            pieces = self._get_pieces(env, files, self.get_bucketing(table))
+        filter_expr = get_filter_expression(filters)
+        dictionary_cols = get_dictionary_columns(table, dictionary_cols, self.dictionary_encode)
+
+        read_opts = ds.ParquetReadOptions(dictionary_columns=set(dictionary_cols))
+        parquet_format = ds.ParquetFileFormat(read_options=read_opts)
+        tables = []
+        for f, rgs in pieces:
+            # row groups whose statistics can not satisfy the filter are skipped by the scanner
+            fragment = parquet_format.make_fragment(f, filesystem=LocalFileSystem(),
+                                                     row_groups=rgs)
+            tables.append(fragment.to_table(columns=relevant_cols, filter=filter_expr))
+
+        if tables:
+            pa_table = concat_tables(tables)
+        else:
+            # this rank got no row groups, return an empty table with the projected schema.
+            # dictionary_cols are encoded as on the ranks that read rows, so that the tables of
+            # all ranks have the same types
+            schema = pq.read_schema(files[0])
+            if relevant_cols is not None:
+                schema = pa_schema([schema.field(c) for c in relevant_cols])
+            pa_table = dictionary_encode_columns(schema.empty_table(), dictionary_cols)
+
+        filter_cols = get_filter_columns(filters)
+        read_cols = None if relevant_cols is None or filter_cols is None else \
+            set(relevant_cols + filter_cols)
+        if self.exact_decimals:
+            pa_table = scale_decimal_columns(pa_table, get_decimal_scales(table))
+        READ_STATS.record(table, timer, sum(self._get_piece_bytes(f, rgs, read_cols)
+                                            for f, rgs in pieces), pa_table.num_rows)
+        return to_dataframe(env, pa_table)
 
 
 class ORCReader(Reader):
     """Read TPCx-BB ORC data"""
 
-    # TODO
-    def __init__(self, basepath):
-        pass
+    def __init__(self, basepath, exact_decimals=False, dictionary_encode=False):
+        # NOTE: stripes are assigned to ranks at read time from env.rank/env.world_size
+        self.table_path_mapping = {
+            table: os.path.join(basepath, table, "*.orc") for table in TABLE_NAMES
+        }
+        self.exact_decimals = exact_decimals
+        self.dictionary_encode = dictionary_encode
+
+    def show_tables(self):
+        return self.table_path_mapping.keys()
+
+    def read(self, env: CylonEnv, table, relevant_cols=None, filters=None, dictionary_cols=None,
+             **kwargs) -> DataFrame:
+        timer = start_timer()
+        files = get_table_files(self.table_path_mapping[table], table)
+        filter_expr = get_filter_expression(filters)
+        dictionary_cols = get_dictionary_columns(table, dictionary_cols, self.dictionary_encode)
+
+        # stripes of all data and refresh files are split into contiguous blocks across ranks,
+        # except for single partition tables
+        orc_files = {f: orc.ORCFile(f) for f in files}
+        stripes = [(f, i) for f in files for i in range(orc_files[f].nstripes)]
+
+        # filter columns must be read along with relevant_cols. If they can not be listed
+        # (expression filters), all columns are read and projected after filtering
+        read_cols = relevant_cols
+        if filter_expr is not None and relevant_cols is not None:
+            filter_cols = get_filter_columns(filters)
+            read_cols = None if filter_cols is None else \
+                relevant_cols + [c for c in filter_cols if c not in relevant_cols]
+
+        # if table has only 1 partition, all ranks will load it!
+        rank_stripes = stripes if table in SINGLE_PARTITION_TABLES else \
+            get_rank_units(env, stripes)
+
+        tables = []
+        nbytes = 0
+        for f, i in rank_stripes:
+            # stripe sizes are not exposed by pyarrow, assume equally sized stripes
+            nbytes += orc_files[f].file_length // orc_files[f].nstripes
+            stripe_table = pa_Table.from_batches([orc_files[f].read_stripe(i, columns=read_cols)])
+            if filter_expr is not None:
+                stripe_table = stripe_table.filter(filter_expr)
+            if relevant_cols is not None:
+                stripe_table = stripe_table.select(relevant_cols)
+            tables.append(dictionary_encode_columns(stripe_table, dictionary_cols))
+
+        if tables:
+            pa_table = concat_tables(tables)
+        else:
+            # this rank got no stripes, return an empty table with the projected schema (and
+            # dictionary_cols encoded, as in the stripe tables)
+            schema = orc_files[files[0]].schema
+            if relevant_cols is not None:
+                schema = pa_schema([schema.field(c) for c in relevant_cols])
+            pa_table = dictionary_encode_columns(schema.empty_table(), dictionary_cols)
+
+        if self.exact_decimals:
+            pa_table = scale_decimal_columns(pa_table, get_decimal_scales(table))
+        READ_STATS.record(table, timer, nbytes, pa_table.num_rows)
+        return to_dataframe(env, pa_table)
+
+
+def align_to_line_start(mm, offset, size, chunk_size=(1 << 16)):
+    """
+    Returns the offset of the first line that starts at or after offset in a memory mapped
+    file. Ranks split a file at these offsets, so that every line is read by exactly one rank.
+    """
+    if offset <= 0 or offset >= size:
+        return min(max(offset, 0), size)
+
+    pos = offset - 1
+    while pos < size:
+        mm.seek(pos)
+        chunk = mm.read(min(chunk_size, size - pos))
+        idx = chunk.find(b'\n')
+        if idx >= 0:
+            return pos + idx + 1
+        pos += len(chunk)
+    return size
+
+
+# compressed partition files (ex: item_1.dat.gz) are decompressed while being parsed
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+COMPRESSION_CODECS = {".gz": "gzip", ".zst": "zstd"}
+
+
+def is_compressed(filepath):
+    return filepath.endswith(COMPRESSED_SUFFIXES)
+
+
+def resolve_compressed(filepath):
+    """Returns filepath, or its compressed variant if only that exists"""
+    if not os.path.exists(filepath):
+        for suffix in COMPRESSED_SUFFIXES:
+            if os.path.exists(filepath + suffix):
+                return filepath + suffix
+    return filepath
+
+
+def get_byte_ranges(files, rank, world_size):
+    """
+    Splits the total byte range of files evenly across world_size ranks and returns the
+    (file, start, end) ranges of this rank, aligned to line boundaries. A rank may get parts
+    of several files, and files may have any size. Compressed files can not be split, they
+    are read whole (start and end None) by the rank whose range holds their first byte.
+    """
+    sizes = [os.path.getsize(f) for f in files]
+    total = sum(sizes)
+    start = (rank * total) // world_size
+    end = ((rank + 1) * total) // world_size
+
+    ranges = []
+    offset = 0
+    for f, size in zip(files, sizes):
+        lo, hi = max(start, offset) - offset, min(end, offset + size) - offset
+        if is_compressed(f):
+            if start <= offset < end:
+                ranges.append((f, None, None))
+        elif lo < hi:
+            mm = pa_memory_map(f, 'r')
+            lo, hi = align_to_line_start(mm, lo, size), align_to_line_start(mm, hi, size)
+            mm.close()
+            if lo < hi:
+                ranges.append((f, lo, hi))
+        offset += size
+    return ranges
+
+
+def get_pieces_bytes(pieces):
+    """Returns the total size of (file, start, end) byte ranges. None ranges are whole files"""
+    return sum(os.path.getsize(f) if start is None else end - start for f, start, end in pieces)
 
 
 class CSVReader(Reader):
     """Read TPCx-BB CSV data"""
 
+    # seconds a rank waits for its node leader to publish a node shared table
+    NODE_SHARED_TIMEOUT = 1800
+    # failure markers older than the reader (by more than the start time skew of the ranks of a
+    # node) are left over from earlier runs
+    NODE_SHARED_FAILURE_SLACK = 60
+
     # TODO
-    def __init__(self, basepath, rank, file_type="dat"):
-        if rank is not None:
+    def __init__(self, basepath, rank, file_type="dat", cache_dir=None, world_size=None,
+                 node_shared_dir=None, zone_maps=False, zone_map_chunk_size=(1 << 26),
+                 zone_map_dir=None, exact_decimals=False, io_tokens_per_device=None,
+                 io_token_dir=None, stage_dir=None, dictionary_encode=False):
+        # if world_size is given, all partition files of a table are listed and their total
+        # byte range is split across ranks. Otherwise rank r reads the file $TABLE_{r+1}.
+        # Partition files may be compressed ($TABLE_{r+1}.dat.gz/.zst, see COMPRESSED_SUFFIXES)
+        self.rank = rank if rank is not None else 0
+        self.world_size = world_size
+        if world_size is not None:
+            self.table_path_mapping = {
+                table: os.path.join(basepath, table, f"*.{file_type}") for table in TABLE_NAMES
+            }
+        elif rank is not None:
             self.table_path_mapping = {}
             for t in TABLE_NAMES:
                 # if table has only 1 partition, all ranks will load it!
@@ -200,46 +598,366 @@ class CSVReader(Reader):
                 table: os.path.join(basepath, table, f"$TABLE.{file_type}") for table in
                 TABLE_NAMES
             }
-
-    def read(self, env: CylonEnv, table, relevant_cols=None, **kwargs) -> DataFrame:
-        filepath = self.table_path_mapping[table].replace('$TABLE', table)
-
+        # wall time (s) of the last data and data_refresh file reads of each table
+        self.read_times = {}
+        # opt-in Arrow IPC cache of parsed tables, for repeated runs on the same data
+        self.cache = ArrowTableCache(cache_dir) if cache_dir is not None else None
+
+        # single partition tables are read by every rank. With node_shared_dir (a tmpfs dir such
+        # as /dev/shm/cylon_xbb) only the node leader parses them, and writes them there as an
+        # Arrow IPC file that all ranks of the node (the leader included) memory map read-only.
+        # The leader removes the files it published in close_readers, at the end of the query
+        self.node_cache = None
+        self.node_published = []
+        if node_shared_dir is not None:
+            self.node_cache = ArrowTableCache(node_shared_dir)
+            local_rank = get_local_rank()
+            # if the node local rank is unknown, every rank parses and publishes the table
+            self.node_leader = local_rank is None or local_rank == 0
+            self.created = time.time()
+
+        # skip chunks of files whose surrogate key ranges can not match the filters. Zone maps
+        # of the pieces of the rank are built on their first filtered read, and stored in
+        # zone_map_dir (default: a node local temp dir)
+        self.zone_maps = zone_maps
+        self.zone_map_chunk_size = zone_map_chunk_size
+        self.zone_map_dir = zone_map_dir if zone_map_dir is not None else \
+            zonemap.DEFAULT_ZONE_MAP_DIR
+        self.exact_decimals = exact_decimals
+        self.dictionary_encode = dictionary_encode
+
+        # limit the concurrent reads of the ranks of a node from each disk (see IOCoordinator).
+        # Pieces are then read sequentially in readahead chunks, and parsed as they arrive
+        self.io = IOCoordinator(io_tokens_per_device, io_token_dir) \
+            if io_tokens_per_device is not None else None
+
+        # stage the partition files read by this rank to a node local stage_dir (ex: a local SSD)
+        # in the background, and read the staged copies once they are up to date (see Stager).
+        # Pieces keep the shared paths, so caches and zone maps do not depend on the staging
+        self.stager = Stager(stage_dir) if stage_dir is not None else None
+        _OPEN_READERS.add(self)
+
+    def close(self):
+        """
+        Stops the staging copies, and removes the node shared tables published by this rank.
+        Use close_readers, which first waits for all ranks to be done reading
+        """
+        if self.stager is not None:
+            self.stager.close()
+        for entry in self.node_published:
+            self.node_cache.remove(*entry)
+        self.node_published = []
+        _OPEN_READERS.discard(self)
+
+    def _get_pieces(self, table):
+        """
+        Returns the (file, start, end) byte ranges of the table read by this rank. start and
+        end are None when the whole file is read.
+        """
+        if self.world_size is None:
+            filepath = self.table_path_mapping[table].replace('$TABLE', table)
+            pieces = [(resolve_compressed(filepath), None, None)]
+            # if table is in refresh_tables list, read that table and concat
+            # NOTE: refresh tables have the same parallelism as its data tables
+            if table in REFRESH_TABLES:
+                pieces.append((resolve_compressed(filepath.replace('/data/', '/data_refresh/')),
+                               None, None))
+            return pieces
+
+        files = get_table_files(self.table_path_mapping[table], table,
+                                suffixes=("",) + COMPRESSED_SUFFIXES)
+        # if table has only 1 partition, all ranks will load it!
+        if table in SINGLE_PARTITION_TABLES:
+            return [(f, None, None) for f in files]
+        return get_byte_ranges(files, self.rank, self.world_size)
+
+    def _open_piece(self, filepath, start, end):
+        if self.stager is not None:
+            filepath = self.stager.resolve(filepath)
+
+        if self.io is not None:
+            source = self.io.open_range(filepath, start, end)
+            if is_compressed(filepath):
+                return pa_CompressedInputStream(source, COMPRESSION_CODECS[
+                    os.path.splitext(filepath)[1]])
+            return source
+
+        if is_compressed(filepath):
+            # arrow reads the input stream on its IO thread pool, so the blocks are decompressed
+            # there, overlapping with the parsing of the previous blocks on the CPU pool
+            return pa_input_stream(filepath, compression="detect", buffer_size=(1 << 24))
+        if start is None:
+            return filepath
+        # zero-copy slice of the memory mapped file
+        mm = pa_memory_map(filepath, 'r')
+        mm.seek(start)
+        return pa_BufferReader(mm.read_buffer(end - start))
+
+    def _read_piece(self, piece, read_opts, parse_opts, column_types, relevant_cols, filters):
+        t0 = time.time()
+        source = self._open_piece(*piece)
+        filter_expr = get_filter_expression(filters)
+        if filter_expr is None:
+            convert_opts = ConvertOptions(column_types=column_types,
+                                          include_columns=relevant_cols)
+            pa_table = pa_read_csv(source, read_options=read_opts, parse_options=parse_opts,
+                                   convert_options=convert_opts)
+        else:
+            # parse the file block by block and only keep the rows that pass the filter. Filter
+            # columns are parsed along with relevant_cols (all columns for expression filters)
+            read_cols = relevant_cols
+            if relevant_cols is not None:
+                filter_cols = get_filter_columns(filters)
+                read_cols = None if filter_cols is None else \
+                    relevant_cols + [c for c in filter_cols if c not in relevant_cols]
+            scan_read_opts = ReadOptions(column_names=read_opts.column_names,
+                                         block_size=(1 << 24))
+            convert_opts = ConvertOptions(column_types=column_types, include_columns=read_cols)
+
+            with pa_open_csv(source, read_options=scan_read_opts, parse_options=parse_opts,
+                             convert_options=convert_opts) as reader:
+                tables = [pa_Table.from_batches([batch]).filter(filter_expr) for batch in reader]
+                pa_table = concat_tables(tables) if tables else reader.schema.empty_table()
+            if relevant_cols is not None:
+                pa_table = pa_table.select(relevant_cols)
+        return pa_table, time.time() - t0
+
+    def read(self, env: CylonEnv, table, relevant_cols=None, filters=None, dictionary_cols=None,
+             **kwargs) -> DataFrame:
+        timer = start_timer()
+        pieces = self._get_pieces(table)
+        if self.zone_maps:
+            pieces = self._prune_pieces(table, pieces, filters)
+        dictionary_cols = get_dictionary_columns(table, dictionary_cols, self.dictionary_encode)
+        read_args = (relevant_cols, filters, dictionary_cols)
+
+        if self.node_cache is not None and table in SINGLE_PARTITION_TABLES:
+            pa_table = self._read_node_shared(table, pieces, *read_args)
+        elif self.cache is not None:
+            pa_table = self._read_cached(self.cache, table, pieces, *read_args)
+        else:
+            pa_table = self._read_table(table, pieces, *read_args)
+
+        if self.exact_decimals:
+            pa_table = scale_decimal_columns(pa_table, get_decimal_scales(table))
+        # bytes of the rank's input ranges, even if the table was served from a cache
+        READ_STATS.record(table, timer, get_pieces_bytes(pieces), pa_table.num_rows)
+        return to_dataframe(env, pa_table)
+
+    def _build_zone_map(self, table, filepath, start, end):
+        """Builds and writes the zone map of the [start, end) range of filepath"""
+        key_cols = zonemap.get_key_columns(get_arrow_schema(table))
+        read_opts = ReadOptions(column_names=get_arrow_schema(table).names,
+                                block_size=(1 << 30))
+        convert_opts = ConvertOptions(column_types=get_column_types(table, key_cols),
+                                      include_columns=key_cols)
+
+        mm = pa_memory_map(filepath, 'r')
+        chunks = []
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = align_to_line_start(mm, chunk_start + self.zone_map_chunk_size, end)
+            mm.seek(chunk_start)
+            chunk_table = pa_read_csv(pa_BufferReader(mm.read_buffer(chunk_end - chunk_start)),
+                                      read_options=read_opts,
+                                      parse_options=ParseOptions(delimiter='|'),
+                                      convert_options=convert_opts)
+            chunks.append((chunk_start, chunk_end, zonemap.get_min_max(chunk_table)))
+            chunk_start = chunk_end
+        mm.close()
+
+        zonemap.write_zone_map(self.zone_map_dir, filepath, start, end, chunks)
+        return chunks
+
+    def _prune_pieces(self, table, pieces, filters):
+        """Drops the parts of pieces whose zone map key ranges can not match DNF filters"""
+        if filters is None or isinstance(filters, pc.Expression):
+            return pieces
+        key_cols = zonemap.get_key_columns(get_arrow_schema(table))
+        if not any(c in key_cols for c in get_filter_columns(filters)):
+            return pieces
+
+        pruned = []
+        for filepath, start, end in pieces:
+            if is_compressed(filepath):
+                # compressed files can not be read by byte range, there is nothing to skip
+                pruned.append((filepath, start, end))
+                continue
+            if start is None:
+                start, end = 0, os.path.getsize(filepath)
+            chunks = zonemap.read_zone_map(self.zone_map_dir, filepath, start, end)
+            if chunks is None:
+                chunks = self._build_zone_map(table, filepath, start, end)
+            pruned += [(filepath, lo, hi) for lo, hi in
+                       zonemap.prune_range(chunks, start, end, filters)]
+        return pruned
+
+    @staticmethod
+    def _get_cache_key(pieces, relevant_cols, filters, dictionary_cols):
+        sources = sorted({f for f, _, _ in pieces})
+        return sources, (pieces, relevant_cols, str(get_filter_expression(filters)),
+                         list(dictionary_cols))
+
+    def _read_cached(self, cache, table, pieces, relevant_cols, filters, dictionary_cols):
+        sources, key = self._get_cache_key(pieces, relevant_cols, filters, dictionary_cols)
+
+        t0 = time.time()
+        pa_table = cache.get(table, sources, key)
+        if pa_table is None:
+            pa_table = cache.put(table, sources, key, self._read_table(
+                table, pieces, relevant_cols, filters, dictionary_cols))
+        else:
+            self.read_times[table] = {"cache": time.time() - t0}
+        return pa_table
+
+    def _read_node_shared(self, table, pieces, relevant_cols, filters, dictionary_cols):
+        sources, key = self._get_cache_key(pieces, relevant_cols, filters, dictionary_cols)
+        if self.node_leader:
+            try:
+                pa_table = self._read_cached(self.node_cache, table, pieces, relevant_cols,
+                                             filters, dictionary_cols)
+            except Exception as e:
+                # the other ranks of the node fail instead of waiting for the table
+                self.node_cache.put_failure(table, sources, key, repr(e))
+                raise
+            self.node_published.append((table, sources, key))
+            return pa_table
+
+        # wait for the node leader to publish the table. This does not use MPI, so it is safe
+        # to call from the reader threads of TablePrefetcher
+        t0 = time.time()
+        while True:
+            pa_table = self.node_cache.get(table, sources, key)
+            if pa_table is not None:
+                break
+            failure = self.node_cache.get_failure(
+                table, sources, key, since=self.created - self.NODE_SHARED_FAILURE_SLACK)
+            if failure is not None:
+                raise RuntimeError(f"node leader failed to read {table}: {failure}")
+            if time.time() - t0 > self.NODE_SHARED_TIMEOUT:
+                raise TimeoutError(f"node leader did not publish {table} in "
+                                   f"{self.node_cache.cache_dir}")
+            time.sleep(0.05)
+
+        self.read_times[table] = {"node_shared": time.time() - t0}
+        return pa_table
+
+    def _read_table(self, table, pieces, relevant_cols, filters, dictionary_cols):
         names, _ = get_schema(table)
         # csv_read_options = CSVReadOptions().use_threads(True).block_size(1 << 30)
         # .with_delimiter('|')
         read_opts = ReadOptions(column_names=names, block_size=(1 << 30))
         parse_opts = ParseOptions(delimiter='|')
-        convert_opts = ConvertOptions(include_columns=relevant_cols)
-
-        # if table is in refresh_tables list, read that table and concat
-        # NOTE: refresh tables have the same parallelism as its data tables
-        if table in REFRESH_TABLES:
-            data_table = pa_read_csv(filepath, read_options=read_opts, parse_options=parse_opts,
-                                     convert_options=convert_opts)
-            refresh_path = filepath.replace('/data/', '/data_refresh/')
-
-            refresh_table = pa_read_csv(refresh_path, read_options=read_opts,
-                                        parse_options=parse_opts, convert_options=convert_opts)
-
-            pa_table = pa_concat_tables([data_table, refresh_table])
-        else:
-            pa_table = pa_read_csv(filepath, read_options=read_opts, parse_options=parse_opts,
-                                   convert_options=convert_opts)
-
-        return DataFrame(Table.from_arrow(env.context, pa_table))
+        # exact types from the schema registry, so that pyarrow does not infer them
+        column_types = get_column_types(table, dictionary_cols=dictionary_cols)
+
+        if not pieces:
+            # this rank got no bytes of the table (ex: more ranks than lines)
+            self.read_times[table] = {}
+            return pa_schema([(c, column_types[c]) for c in relevant_cols or names]).empty_table()
+
+        # pyarrow releases the GIL while reading, so the pieces (ex: data and data_refresh
+        # files) are read concurrently
+        with ThreadPoolExecutor(max_workers=min(len(pieces), 8)) as executor:
+            futures = [executor.submit(self._read_piece, piece, read_opts, parse_opts,
+                                       column_types, relevant_cols, filters)
+                       for piece in pieces]
+            results = [f.result() for f in futures]
+
+        read_times = {}
+        for (filepath, _, _), (_, piece_time) in zip(pieces, results):
+            label = "data_refresh" if '/data_refresh/' in filepath else "data"
+            read_times[label] = read_times.get(label, 0) + piece_time
+        self.read_times[table] = read_times
+
+        # data and data_refresh pieces stay separate chunks until the table is handed to pycylon
+        return concat_tables([t for t, _ in results])
+
+    def read_batches(self, env: CylonEnv, table, relevant_cols=None, batch_rows=(1 << 20),
+                     block_size=(1 << 24), dictionary_cols=None):
+        """
+        Streams the rank local partition of a table (and its refresh partition) as pyarrow
+        RecordBatches of at most batch_rows rows. Only one block_size chunk of the file is
+        parsed at a time, so memory scales with the batch size and not with the partition size.
+        Decimal columns are scaled as in read if the reader was constructed with exact_decimals.
+        """
+        names, _ = get_schema(table)
+        read_opts = ReadOptions(column_names=names, block_size=block_size)
+        parse_opts = ParseOptions(delimiter='|')
+        column_types = get_column_types(
+            table, dictionary_cols=get_dictionary_columns(table, dictionary_cols,
+                                                          self.dictionary_encode))
+        convert_opts = ConvertOptions(column_types=column_types, include_columns=relevant_cols)
+        decimal_scales = get_decimal_scales(table, relevant_cols)
+
+        for piece in self._get_pieces(table):
+            with pa_open_csv(self._open_piece(*piece), read_options=read_opts,
+                             parse_options=parse_opts, convert_options=convert_opts) as reader:
+                for batch in reader:
+                    batch_table = pa_Table.from_batches([batch])
+                    if self.exact_decimals:
+                        batch_table = scale_decimal_columns(batch_table, decimal_scales)
+                    yield from batch_table.to_batches(max_chunksize=batch_rows)
 
     def show_tables(self):
         return self.table_path_mapping.keys()
 
 
+# CSVReaders that are not closed yet (see close_readers)
+_OPEN_READERS = set()
+
+
+def close_readers(env: CylonEnv):
+    """
+    Collective. Closes all open readers (see CSVReader.close) once all ranks are done reading,
+    so that no rank still waits for a node shared table that is removed. Called by the queries
+    before finalizing the env
+    """
+    barrier(env)
+    for reader in list(_OPEN_READERS):
+        reader.close()
+
+
+# CSVReader arguments (and their defaults) that the parquet and ORC readers do not have. rank
+# and world_size are taken from the env at read time by those readers
+CSV_ONLY_ARGS = {
+    "rank": None,
+    "world_size": None,
+    "file_type": "dat",
+    "cache_dir": None,
+    "node_shared_dir": None,
+    "zone_maps": False,
+    "zone_map_chunk_size": (1 << 26),
+    "zone_map_dir": None,
+    "io_tokens_per_device": None,
+    "io_token_dir": None,
+    "stage_dir": None,
+}
+
+
+def _pop_csv_only_args(data_format, kwargs):
+    """Drops the CSV only kwargs, with a warning for the ones set to a non default value"""
+    for arg, default in CSV_ONLY_ARGS.items():
+        value = kwargs.pop(arg, default)
+        # configs leave unset keys None (see utils.add_empty_config)
+        if arg not in ("rank", "world_size") and value is not None and value != default:
+            warnings.warn(f"{arg}={value!r} is ignored by the {data_format} reader, it only "
+                          f"applies to csv data")
+
+
 def build_reader(basepath, data_format="parquet", **kwargs) -> Reader:
     assert data_format in ("csv", "parquet", "orc")
 
     if data_format in ("csv",):
+        # row groups only exist in parquet files
+        kwargs.pop("split_row_groups", None)
         return CSVReader(basepath=basepath, **kwargs)
 
     elif data_format in ("parquet",):
+        _pop_csv_only_args(data_format, kwargs)
         return ParquetReader(basepath=basepath, **kwargs)
 
     elif data_format in ("orc",):
+        _pop_csv_only_args(data_format, kwargs)
+        kwargs.pop("split_row_groups", None)
         return ORCReader(basepath=basepath, **kwargs)
@@ -0,0 +1,120 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import glob
+import os
+
+import pyarrow as pa
+
+# spark_table_schemas/ lives next to the cylon_xbb_tools package. Fall back to the working
+# directory for installed copies of the package
+SPARK_SCHEMA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "spark_table_schemas")
+if not os.path.isdir(SPARK_SCHEMA_DIR):
+    SPARK_SCHEMA_DIR = os.path.join(os.getcwd(), "spark_table_schemas")
+
+# int columns are read as int64 as well, so that keys compare and join without casts.
+# decimals are read as float64
+SPARK_TYPES = {
+    "bigint": pa.int64(),
+    "int": pa.int64(),
+    "string": pa.string(),
+    "decimal": pa.float64(),
+}
+
+# low cardinality string columns that readers built with dictionary_encode=True parse
+# dictionary encoded, so that the scan filters and the cached/node shared IPC files of the
+# readers work on the integer codes. Opt-in: pycylon operators and some arrow kernels
+# (select_k, sort_by) do not take dictionary columns, chunked.to_dataframe decodes them
+DICTIONARY_COLUMNS = {
+    "customer_address": ["ca_state", "ca_country"],
+    "customer_demographics": ["cd_marital_status", "cd_education_status"],
+    "item": ["i_category"],
+    "warehouse": ["w_warehouse_name"],
+}
+
+DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+# decimal(p,s) columns keep their scale s in the field metadata, so that they can be read as
+# exact int64s scaled by 10^s (see get_decimal_scales)
+DECIMAL_SCALE_KEY = b"decimal_scale"
+
+
+def parse_spark_schema(path) -> pa.Schema:
+    """Parses a spark `.schema` file (`name type [--comment]` per line) to an arrow schema"""
+    fields = []
+    with open(path) as fp:
+        for line in fp.read().split("\n"):
+            tokens = line.replace(",", " ").split()
+            if len(tokens) < 2:
+                continue
+            name, spark_type = tokens[0], tokens[1].split("(")[0]
+            field = pa.field(name, SPARK_TYPES[spark_type])
+            if spark_type == "decimal":
+                # `decimal(p,s)` is split to `decimal(p` and `s)` by the comma replace
+                field = field.with_metadata({DECIMAL_SCALE_KEY: tokens[2].rstrip(")")})
+            fields.append(field)
+    return pa.schema(fields)
+
+
+def _build_registry(schema_dir):
+    registry = {}
+    for path in sorted(glob.glob(os.path.join(schema_dir, "*.schema"))):
+        table = os.path.basename(path)[:-len(".schema")]
+        registry[table] = parse_spark_schema(path)
+    return registry
+
+
+# table name -> arrow schema of all columns, in file order. Built once at import
+TABLE_SCHEMAS = _build_registry(SPARK_SCHEMA_DIR)
+
+
+def get_arrow_schema(table) -> pa.Schema:
+    return TABLE_SCHEMAS[table]
+
+
+def get_dictionary_columns(table, dictionary_cols=None, dictionary_encode=False):
+    """
+    Returns dictionary_cols, or if None the default dictionary encoded columns of table if
+    dictionary_encode is set (else none)
+    """
+    if dictionary_cols is None:
+        return DICTIONARY_COLUMNS.get(table, []) if dictionary_encode else []
+    return dictionary_cols
+
+
+def decode_dictionary_columns(pa_table):
+    """Casts the dictionary encoded columns of pa_table back to their value type"""
+    for i, field in enumerate(pa_table.schema):
+        if pa.types.is_dictionary(field.type):
+            pa_table = pa_table.set_column(i, field.name,
+                                           pa_table.column(i).cast(field.type.value_type))
+    return pa_table
+
+
+def get_decimal_scales(table, relevant_cols=None):
+    """Returns {column: scale} of the decimal columns of table among relevant_cols (or all)"""
+    schema = TABLE_SCHEMAS[table]
+    cols = schema.names if relevant_cols is None else relevant_cols
+    return {c: int(schema.field(c).metadata[DECIMAL_SCALE_KEY]) for c in cols
+            if schema.field(c).metadata and DECIMAL_SCALE_KEY in schema.field(c).metadata}
+
+
+def get_column_types(table, relevant_cols=None, dictionary_cols=()):
+    """
+    Returns {column: arrow type} for relevant_cols (all columns if None). dictionary_cols are
+    typed as dictionary encoded strings
+    """
+    schema = TABLE_SCHEMAS[table]
+    cols = schema.names if relevant_cols is None else relevant_cols
+    return {c: DICTIONARY_TYPE if c in dictionary_cols else schema.field(c).type for c in cols}
@@ -0,0 +1,167 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import fcntl
+import glob
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+
+# stagers that are not closed yet (see close_stagers)
+_OPEN_STAGERS = set()
+
+
+class Stager:
+    """
+    Stages input files to a node local stage_dir (ex: a local SSD), mirroring their absolute
+    paths. Staged copies keep the mtime of their source, and are reused across runs as long as
+    the size and mtime of the source do not change.
+
+    Files are staged in the background: readers use the staged copy if it is up to date, and
+    otherwise read the shared copy while it is being staged for the following reads/runs.
+    close() (or leaving a `with` block) cancels the pending copies and stops the running ones.
+    A stopped copy keeps its partial file, and the next run resumes it where it stopped, so
+    that files which take longer to stage than a query runs are still staged over a few runs.
+    """
+
+    def __init__(self, stage_dir, max_parallel_copies=1, copy_chunk_size=(1 << 24)):
+        self.stage_dir = stage_dir
+        os.makedirs(stage_dir, exist_ok=True)
+        self.copy_chunk_size = copy_chunk_size
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel_copies)
+        self._lock = Lock()
+        self._pending = {}
+        self._closed = Event()
+        _OPEN_STAGERS.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Cancels the pending copies, stops the running ones and waits for them to stop"""
+        with self._lock:
+            self._closed.set()
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self._executor.shutdown(wait=True)
+        _OPEN_STAGERS.discard(self)
+
+    def get_staged_path(self, path):
+        return os.path.join(self.stage_dir, os.path.abspath(path).lstrip(os.sep))
+
+    def is_staged(self, path):
+        staged_path = self.get_staged_path(path)
+        if not os.path.exists(staged_path):
+            return False
+        src, dst = os.stat(path), os.stat(staged_path)
+        return src.st_size == dst.st_size and src.st_mtime_ns == dst.st_mtime_ns
+
+    @staticmethod
+    def _lock_file(lock_path):
+        """
+        Returns the open lock_path, flock()ed. Lock files are removed by their holder once the
+        copy is done, so the lock is retried if the file was removed while waiting for it
+        """
+        while True:
+            lock_fp = open(lock_path, "a")
+            fcntl.flock(lock_fp, fcntl.LOCK_EX)
+            try:
+                if os.fstat(lock_fp.fileno()).st_ino == os.stat(lock_path).st_ino:
+                    return lock_fp
+            except FileNotFoundError:
+                pass
+            lock_fp.close()
+
+    @staticmethod
+    def _get_partial_path(path, staged_path):
+        """Partial copy of the current version (size and mtime) of path"""
+        st = os.stat(path)
+        return f"{staged_path}.{st.st_size}-{st.st_mtime_ns}.partial"
+
+    def _copy(self, path, partial_path):
+        """
+        Copies path to partial_path chunk by chunk, from the end of partial_path if it exists.
+        Returns False if stopped by close()
+        """
+        with open(path, "rb") as src, open(partial_path, "ab") as dst:
+            src.seek(dst.tell())
+            while not self._closed.is_set():
+                chunk = src.read(self.copy_chunk_size)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        if self._closed.is_set():
+            return False
+        shutil.copystat(path, partial_path)
+        return True
+
+    def stage(self, path):
+        """
+        Copies path to the stage dir unless it is up to date. Returns the staged path, or None
+        if the stager was closed before the copy completed
+        """
+        if self._closed.is_set():
+            return None
+        staged_path = self.get_staged_path(path)
+        os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+
+        # ranks of a node may stage the same file (ex: byte ranges of one file). The first one
+        # copies it, the others wait for it and then find it up to date
+        lock_path = staged_path + ".lock"
+        lock_fp = self._lock_file(lock_path)
+        try:
+            if not self.is_staged(path):
+                partial_path = self._get_partial_path(path, staged_path)
+                # partial copies of older versions of path can not be resumed
+                for stale_path in glob.glob(glob.escape(staged_path) + ".*.partial"):
+                    if stale_path != partial_path:
+                        os.remove(stale_path)
+                if not self._copy(path, partial_path):
+                    return None
+                os.replace(partial_path, staged_path)
+        finally:
+            # removed while it is still locked, see _lock_file
+            os.remove(lock_path)
+            lock_fp.close()
+        return staged_path
+
+    def _stage_async(self, path):
+        with self._lock:
+            if self._closed.is_set():
+                return
+            if path not in self._pending or self._pending[path].done():
+                self._pending[path] = self._executor.submit(self.stage, path)
+
+    def resolve(self, path):
+        """
+        Returns the staged path of path if it is up to date. Otherwise starts staging it in the
+        background and returns path
+        """
+        if self.is_staged(path):
+            return self.get_staged_path(path)
+        self._stage_async(path)
+        return path
+
+
+def close_stagers():
+    """
+    Closes all open stagers. Called by the queries before finalizing the env: the background
+    copies would otherwise keep the process alive
+    """
+    for stager in list(_OPEN_STAGERS):
+        stager.close()
@@ -0,0 +1,67 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow.compute as pc
+from pycylon import DataFrame, CylonEnv
+
+from cylon_xbb_tools.chunked import concat_tables, to_dataframe
+from cylon_xbb_tools.collectives import allgather, gather_tables
+from cylon_xbb_tools.schemas import decode_dictionary_columns
+
+### ORDER BY ... LIMIT k tails of the queries. Instead of a distributed sort of the whole
+## table, each rank selects its local top k (a partial sort), and the k * world_size candidates
+## are gathered and merged on root. Results are global, and only on root: the other ranks get an
+## empty DataFrame with the same columns. Dictionary encoded columns are decoded first, arrow
+## can not select or sort on them
+
+
+def get_sort_keys(by, ascending=True):
+    """[(column, order)] sort keys of pyarrow, from by and ascending as in sort_values"""
+    by = [by] if isinstance(by, str) else list(by)
+    if isinstance(ascending, bool):
+        ascending = [ascending] * len(by)
+    return [(col, "ascending" if asc else "descending") for col, asc in zip(by, ascending)]
+
+
+def select_k(pa_table, k, sort_keys):
+    """Top k rows of pa_table, in sort_keys order"""
+    if pa_table.num_rows > k:
+        pa_table = pa_table.take(pc.select_k_unstable(pa_table, k, sort_keys))
+    return pa_table.sort_by(sort_keys)
+
+
+def top_k(env: CylonEnv, df: DataFrame, k, by, ascending=True, root=0) -> DataFrame:
+    """Collective. Global ORDER BY by LIMIT k of df, on root"""
+    sort_keys = get_sort_keys(by, ascending)
+    pa_table = decode_dictionary_columns(df.to_arrow())
+
+    candidates = gather_tables(env, select_k(pa_table, k, sort_keys), root=root)
+    if env.rank != root:
+        return to_dataframe(env, pa_table.schema.empty_table())
+    return to_dataframe(env, select_k(concat_tables(candidates), k, sort_keys))
+
+
+def limit(env: CylonEnv, df: DataFrame, k, root=0) -> DataFrame:
+    """
+    Collective. Global LIMIT k of df (with no ordering), on root. Rows are taken in rank order,
+    and ranks after the first k rows send none
+    """
+    pa_table = decode_dictionary_columns(df.to_arrow())
+    counts = allgather(env, pa_table.num_rows)
+    offset = sum(counts[:env.rank])
+    rows = max(0, min(pa_table.num_rows, k - offset))
+
+    pieces = gather_tables(env, pa_table.slice(0, rows), root=root)
+    if env.rank != root:
+        return to_dataframe(env, pa_table.schema.empty_table())
+    return to_dataframe(env, concat_tables(pieces))
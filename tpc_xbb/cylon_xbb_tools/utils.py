@@ -18,10 +18,18 @@ import yaml
 
 def add_empty_config(args):
     keys = [
+        "cache_dir",
         "get_read_time",
-        "split_row_groups",
+        "io_tokens_per_device",
+        "stage_dir",
         "dask_profile",
+        "dictionary_encode",
+        "exact_decimals",
+        "node_shared_dir",
+        "verbose",
         "verify_results",
+        "zone_map_dir",
+        "zone_maps",
     ]
 
     for key in keys:
@@ -34,6 +42,12 @@ def add_empty_config(args):
     if "output_filetype" not in args:
         args["output_filetype"] = "parquet"
 
+    if "split_row_groups" not in args:
+        args["split_row_groups"] = True
+
+    if "max_parallel_reads" not in args:
+        args["max_parallel_reads"] = 4
+
     return args
 
 
@@ -0,0 +1,151 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import hashlib
+import json
+import os
+import tempfile
+
+import pyarrow.compute as pc
+
+### zone maps are sidecar indices with the min/max of the surrogate key columns of each chunk
+## of the byte range of a file read by a rank. Readers use them to skip chunks whose key ranges
+## can not satisfy the read filters. Parquet files do not need them, row group statistics do the
+## same. Zone maps are written to a zone map dir (the data dirs may be read-only), one per
+## (file, byte range), so that a rank only builds the zone maps of its own pieces
+
+ZONE_MAP_SUFFIX = ".zonemap.json"
+
+DEFAULT_ZONE_MAP_DIR = os.path.join(tempfile.gettempdir(), "cylon_xbb_zone_maps")
+
+
+def get_key_columns(schema):
+    """Surrogate key columns (*_sk) of a table schema are indexed"""
+    return [name for name in schema.names if name.endswith("_sk")]
+
+
+def get_zone_map_path(zone_map_dir, path, start, end):
+    digest = hashlib.sha1(repr((os.path.abspath(path), start, end)).encode()).hexdigest()
+    return os.path.join(zone_map_dir, f"{os.path.basename(path)}-{digest}{ZONE_MAP_SUFFIX}")
+
+
+def read_zone_map(zone_map_dir, path, start, end):
+    """
+    Returns the chunks of the zone map of the [start, end) range of path, or None if it is
+    missing, unreadable or stale
+    """
+    try:
+        with open(get_zone_map_path(zone_map_dir, path, start, end)) as fp:
+            zone_map = json.load(fp)
+    except (OSError, ValueError):
+        return None
+    st = os.stat(path)
+    if zone_map["size"] != st.st_size or zone_map["mtime_ns"] != st.st_mtime_ns:
+        return None
+    return zone_map["chunks"]
+
+
+def write_zone_map(zone_map_dir, path, start, end, chunks):
+    """
+    Writes the zone map of the [start, end) range of path. chunks is a list of (start, end,
+    {column: (min, max)}), min and max being None if the column is all null in the chunk.
+    Returns False if it could not be written: zone maps are only an optimization
+    """
+    st = os.stat(path)
+    zone_map = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "chunks": chunks}
+
+    zone_map_path = get_zone_map_path(zone_map_dir, path, start, end)
+    tmp_path = f"{zone_map_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(zone_map_dir, exist_ok=True)
+        with open(tmp_path, "w") as fp:
+            json.dump(zone_map, fp)
+        os.replace(tmp_path, zone_map_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+
+def get_min_max(pa_table):
+    """Returns {column: (min, max)} of all columns of pa_table"""
+    ranges = {}
+    for name in pa_table.column_names:
+        min_max = pc.min_max(pa_table.column(name))
+        ranges[name] = (min_max["min"].as_py(), min_max["max"].as_py())
+    return ranges
+
+
+def _predicate_may_match(col_range, op, val):
+    lo, hi = col_range
+    if lo is None:
+        # all null chunk. Nulls never satisfy comparisons
+        return op in ("!=", "not in")
+
+    if op in ("=", "=="):
+        return lo <= val <= hi
+    elif op == "<":
+        return lo < val
+    elif op == "<=":
+        return lo <= val
+    elif op == ">":
+        return hi > val
+    elif op == ">=":
+        return hi >= val
+    elif op == "in":
+        return any(lo <= v <= hi for v in val)
+    # !=, not in: can only be ruled out when every value in the chunk is excluded
+    return True
+
+
+def chunk_may_match(ranges, filters):
+    """
+    Returns False if the DNF filters can not be satisfied by any row of a chunk with the given
+    {column: (min, max)} ranges. Predicates on columns without ranges are assumed to match.
+    """
+    conjunctions = filters if isinstance(filters[0], list) else [filters]
+    for conjunction in conjunctions:
+        if all(col not in ranges or _predicate_may_match(ranges[col], op, val)
+               for col, op, val in conjunction):
+            return True
+    return False
+
+
+def prune_range(chunks, start, end, filters):
+    """
+    Returns the sub ranges of [start, end) covered by chunks that may match filters. Adjacent
+    ranges are merged. Chunk boundaries must be line aligned, as are start and end.
+    """
+    ranges = []
+    for chunk_start, chunk_end, col_ranges in chunks:
+        lo, hi = max(start, chunk_start), min(end, chunk_end)
+        if lo >= hi or not chunk_may_match(col_ranges, filters):
+            continue
+        if ranges and ranges[-1][1] == lo:
+            ranges[-1] = (ranges[-1][0], hi)
+        else:
+            ranges.append((lo, hi))
+    return ranges
+
+
+def get_key_range_filters(pa_table, key, column):
+    """
+    Returns DNF filters restricting column to the [min, max] range of key in pa_table. Ex: the
+    d_date_sk range of a filtered date_dim restricts ss_sold_date_sk of store_sales
+    """
+    min_max = pc.min_max(pa_table.column(key))
+    lo, hi = min_max["min"].as_py(), min_max["max"].as_py()
+    if lo is None:
+        return [(column, "in", [])]
+    return [(column, ">=", lo), (column, "<=", hi)]
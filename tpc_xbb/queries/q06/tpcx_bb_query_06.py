@@ -30,18 +30,37 @@ from cylon_xbb_tools.utils import (
     tpcxbb_argparser,
     # run_query,
 )
-from cylon_xbb_tools.readers import CSVReader
+from cylon_xbb_tools import bucketing, zonemap
+from cylon_xbb_tools.chunked import concat_dataframes
+from cylon_xbb_tools.lookup import lookup_merge
+from cylon_xbb_tools.read_stats import READ_STATS, print_read_summary, write_read_summary
+from cylon_xbb_tools.readers import build_reader, close_readers
+from cylon_xbb_tools.prefetch import TablePrefetcher
+from cylon_xbb_tools.topk import top_k
 
 from pycylon.net import MPIConfig
-from pycylon import CylonEnv, DataFrame, Table
-import pycylon as cy
+from pycylon import CylonEnv, DataFrame
 
 q06_YEAR = 2001
 q6_limit_rows = 100
 
 
 def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
-    table_reader = CSVReader(config["data_dir"], rank=None if env.world_size == 1 else env.rank)
+    table_reader = build_reader(
+        data_format=config["file_format"],
+        basepath=config["data_dir"],
+        rank=env.rank,
+        world_size=env.world_size,
+        cache_dir=config["cache_dir"],
+        node_shared_dir=config["node_shared_dir"],
+        dictionary_encode=config["dictionary_encode"],
+        zone_maps=config["zone_maps"],
+        zone_map_dir=config["zone_map_dir"],
+        exact_decimals=config["exact_decimals"],
+        io_tokens_per_device=config["io_tokens_per_device"],
+        split_row_groups=config["split_row_groups"],
+        stage_dir=config["stage_dir"],
+    )
 
     web_sales_cols = [
         "ws_bill_customer_sk",
@@ -71,15 +90,40 @@ def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
         "c_login",
     ]
 
-    ws_df = table_reader.read(env, "web_sales", relevant_cols=web_sales_cols)
-    ss_df = table_reader.read(env, "store_sales", relevant_cols=store_sales_cols)
-    date_df_1part = table_reader.read(env, "date_dim", relevant_cols=date_cols)
-    customer_df = table_reader.read(env, "customer", relevant_cols=customer_cols)
-
-    return ws_df, ss_df, date_df_1part, customer_df
-
-
-def get_sales_ratio(env: CylonEnv, df: DataFrame, table="store_sales") -> DataFrame:
+    # date_dim is read first, so that with zone maps the sales tables are restricted to the
+    # d_date_sk range of the two years
+    date_df_1part = table_reader.read(env, "date_dim", relevant_cols=date_cols,
+                                      filters=[("d_year", ">=", q06_YEAR),
+                                               ("d_year", "<=", q06_YEAR + 1)])
+    ws_date_filters, ss_date_filters = None, None
+    if config["zone_maps"]:
+        date_pa_table = date_df_1part.to_arrow()
+        ws_date_filters = zonemap.get_key_range_filters(date_pa_table, "d_date_sk",
+                                                        "ws_sold_date_sk")
+        ss_date_filters = zonemap.get_key_range_filters(date_pa_table, "d_date_sk",
+                                                        "ss_sold_date_sk")
+
+    prefetcher = TablePrefetcher(table_reader, env, [
+        ("web_sales", web_sales_cols, {"filters": ws_date_filters}),
+        ("store_sales", store_sales_cols, {"filters": ss_date_filters}),
+        ("customer", customer_cols),
+    ], max_parallel_reads=config["max_parallel_reads"])
+
+    ws_df = prefetcher.get("web_sales")
+    ss_df = prefetcher.get("store_sales")
+    customer_df = prefetcher.get("customer")
+
+    # with web_sales, store_sales and customer bucketed on the customer keys (csv_to_parquet
+    # --bucket_by), all rows of a customer are on the same rank
+    customer_bucketed = bucketing.co_bucketed(table_reader, [("web_sales", "ws_bill_customer_sk"),
+                                                             ("store_sales", "ss_customer_sk"),
+                                                             ("customer", "c_customer_sk")])
+
+    return ws_df, ss_df, date_df_1part, customer_df, customer_bucketed
+
+
+def get_sales_ratio(env: CylonEnv, df: DataFrame, table="store_sales",
+                    exact_decimals=False) -> DataFrame:
     assert table in ("store_sales", "web_sales")
 
     if table == "store_sales":
@@ -128,12 +172,17 @@ def get_sales_ratio(env: CylonEnv, df: DataFrame, table="store_sales") -> DataFr
     """
     # print(df.to_arrow().schema)
 
+    # with exact decimals, sales stay integer cents. The / 2 is left out then: it cancels in
+    # web_sales_increase_ratio and does not change the sign of the sales
+    zero_sales = 0 if exact_decimals else 0.0
+
     df_f_year = df[first_year_flag]
-    df_f_year["first_year_sales"] = (df_f_year[f"{column_prefix}ext_list_price"]
-                                     - df_f_year[f"{column_prefix}ext_wholesale_cost"]
-                                     - df_f_year[f"{column_prefix}ext_discount_amt"]
-                                     + df_f_year[f"{column_prefix}ext_sales_price"]) / 2
-    df_f_year["second_year_sales"] = 0.0
+    first_year_sales = (df_f_year[f"{column_prefix}ext_list_price"]
+                        - df_f_year[f"{column_prefix}ext_wholesale_cost"]
+                        - df_f_year[f"{column_prefix}ext_discount_amt"]
+                        + df_f_year[f"{column_prefix}ext_sales_price"])
+    df_f_year["first_year_sales"] = first_year_sales if exact_decimals else first_year_sales / 2
+    df_f_year["second_year_sales"] = zero_sales
     # ws_bill_customer_sk: int64
     # d_year: int64
     # ws_ext_list_price: double
@@ -145,11 +194,13 @@ def get_sales_ratio(env: CylonEnv, df: DataFrame, table="store_sales") -> DataFr
     # print('first', df_f_year.row_count)
 
     df_s_year = df[second_year_flag]
-    df_s_year['first_year_sales'] = 0.0
-    df_s_year["second_year_sales"] = (df_s_year[f"{column_prefix}ext_list_price"]
-                                      - df_s_year[f"{column_prefix}ext_wholesale_cost"]
-                                      - df_s_year[f"{column_prefix}ext_discount_amt"]
-                                      + df_s_year[f"{column_prefix}ext_sales_price"]) / 2
+    df_s_year['first_year_sales'] = zero_sales
+    second_year_sales = (df_s_year[f"{column_prefix}ext_list_price"]
+                         - df_s_year[f"{column_prefix}ext_wholesale_cost"]
+                         - df_s_year[f"{column_prefix}ext_discount_amt"]
+                         + df_s_year[f"{column_prefix}ext_sales_price"])
+    df_s_year["second_year_sales"] = second_year_sales if exact_decimals \
+        else second_year_sales / 2
     # print('second', df_s_year.row_count)
     # ws_bill_customer_sk: int64
     # d_year: int64
@@ -160,7 +211,7 @@ def get_sales_ratio(env: CylonEnv, df: DataFrame, table="store_sales") -> DataFr
     # first_year_sales: double
     # second_year_sales: double
 
-    return cy.concat([df_f_year, df_s_year], axis=0)
+    return concat_dataframes(env, [df_f_year, df_s_year])
 
 
 def main(env: CylonEnv, config):
@@ -172,22 +223,23 @@ def main(env: CylonEnv, config):
         dask_profile=config["dask_profile"],
     )
     """
-    ws_df, ss_df, date_df_1part, customer_df = read_tables(env, config)
+    ws_df, ss_df, date_df_1part, customer_df, customer_bucketed = read_tables(env, config)
+    # groupbys and joins on the customer keys are local if the tables are co-bucketed on them
+    customer_env = None if customer_bucketed else env
 
     """
     filtered_date_df = date_df.query(
         f"d_year >= {q06_YEAR} and d_year <= {q06_YEAR+1}", meta=date_df._meta
     ).reset_index(drop=True)"""
-    filtered_date_df_1part = date_df_1part[
-        (date_df_1part['d_year'] >= q06_YEAR) & (date_df_1part['d_year'] <= (q06_YEAR + 1))]
+    # d_year filter is pushed down to the reader
+    filtered_date_df_1part = date_df_1part
 
     """
     web_sales_df = ws_df.merge(
         filtered_date_df, left_on="ws_sold_date_sk", right_on="d_date_sk", how="inner"
     )"""
-    web_sales_df = ws_df.merge(filtered_date_df_1part, how="inner", algorithm='sort',
-                               left_on=["ws_sold_date_sk"], right_on=["d_date_sk"],
-                               suffixes=('', ''))  # local
+    web_sales_df = lookup_merge(env, ws_df, filtered_date_df_1part, left_on="ws_sold_date_sk",
+                                right_on="d_date_sk")  # local
     print(web_sales_df.to_arrow())
     # ws_bill_customer_sk: int64
     # ws_sold_date_sk: int64
@@ -212,7 +264,7 @@ def main(env: CylonEnv, config):
         )
             .reset_index()
     )"""
-    ws_grouped_df = web_sales_df.groupby(by=["ws_bill_customer_sk", "d_year"], env=env) \
+    ws_grouped_df = web_sales_df.groupby(by=["ws_bill_customer_sk", "d_year"], env=customer_env) \
         .agg({"ws_ext_list_price": "sum",
               "ws_ext_wholesale_cost": "sum",
               "ws_ext_discount_amt": "sum",
@@ -238,7 +290,8 @@ def main(env: CylonEnv, config):
     web_sales_ratio_df = ws_grouped_df.map_partitions(
         get_sales_ratio, table="web_sales"
     )"""
-    web_sales_ratio_df = get_sales_ratio(env, ws_grouped_df, table="web_sales")
+    web_sales_ratio_df = get_sales_ratio(env, ws_grouped_df, table="web_sales",
+                                         exact_decimals=config["exact_decimals"])
     #     print(web_sales_ratio_df, web_sales_ratio_df.row_count)
 
     """
@@ -249,7 +302,7 @@ def main(env: CylonEnv, config):
     )
         web_sales = web_sales.loc[web_sales["first_year_sales"] > 0].reset_index(drop=True)
     """
-    web_sales = web_sales_ratio_df.groupby(by=["ws_bill_customer_sk"], env=env) \
+    web_sales = web_sales_ratio_df.groupby(by=["ws_bill_customer_sk"], env=customer_env) \
         .agg({"first_year_sales": "sum",
               "second_year_sales": "sum"})
     web_sales = web_sales[web_sales["sum_first_year_sales"] > 0]
@@ -271,9 +324,8 @@ def main(env: CylonEnv, config):
     store_sales_df = ss_df.merge(
         filtered_date_df, left_on="ss_sold_date_sk", right_on="d_date_sk", how="inner"
     )"""
-    store_sales_df = ss_df.merge(filtered_date_df_1part, how="inner", algorithm='sort',
-                                 left_on=["ss_sold_date_sk"], right_on=["d_date_sk"],
-                                 suffixes=('', ''))  # local
+    store_sales_df = lookup_merge(env, ss_df, filtered_date_df_1part, left_on="ss_sold_date_sk",
+                                  right_on="d_date_sk")  # local
     #     print(store_sales_df.to_arrow())
     # store_sales_df.rename([x.split('-')[1] for x in store_sales_df.column_names])
     # ss_customer_sk: int64
@@ -300,7 +352,7 @@ def main(env: CylonEnv, config):
             .reset_index()
     )
     """
-    ss_grouped_df = store_sales_df.groupby(by=["ss_customer_sk", "d_year"], env=env). \
+    ss_grouped_df = store_sales_df.groupby(by=["ss_customer_sk", "d_year"], env=customer_env). \
         agg({
         "ss_ext_list_price": "sum",
         "ss_ext_wholesale_cost": "sum",
@@ -313,7 +365,8 @@ def main(env: CylonEnv, config):
         get_sales_ratio, table="store_sales"
     )
     """
-    store_sales_ratio_df = get_sales_ratio(env, ss_grouped_df, table="store_sales")
+    store_sales_ratio_df = get_sales_ratio(env, ss_grouped_df, table="store_sales",
+                                           exact_decimals=config["exact_decimals"])
     #     print(store_sales_ratio_df, store_sales_ratio_df.row_count)
 
     # ss_customer_sk: int64
@@ -340,7 +393,7 @@ def main(env: CylonEnv, config):
             "second_year_sales": "second_year_total_store",
         }
     )"""
-    store_sales = store_sales_ratio_df.groupby(by=["ss_customer_sk"], env=env) \
+    store_sales = store_sales_ratio_df.groupby(by=["ss_customer_sk"], env=customer_env) \
         .agg({"first_year_sales": "sum", "second_year_sales": "sum"})
     store_sales = store_sales[store_sales["sum_first_year_sales"] > 0]
     store_sales.rename({"sum_first_year_sales": "first_year_total_store",
@@ -364,10 +417,14 @@ def main(env: CylonEnv, config):
     # print(store_sales)
     sales_df = web_sales.merge(store_sales, how="inner", algorithm='sort',
                                left_on=["ws_bill_customer_sk"],
-                               right_on=["ss_customer_sk"], suffixes=('', ''), env=env)
+                               right_on=["ss_customer_sk"], suffixes=('', ''), env=customer_env)
     # sales_df.rename([x.split('-')[1] for x in sales_df.column_names])
     # print(sales_df.to_arrow())
-    sales_df["web_sales_increase_ratio"] = sales_df["second_year_total_web"] \
+    second_year_total_web = sales_df["second_year_total_web"]
+    if config["exact_decimals"]:
+        # exact integer cents, converted to float only for the ratio
+        second_year_total_web = second_year_total_web * 1.0
+    sales_df["web_sales_increase_ratio"] = second_year_total_web \
                                            / sales_df["first_year_total_web"]
     # print(sales_df.to_arrow())
     # ws_bill_customer_sk: int64
@@ -390,7 +447,7 @@ def main(env: CylonEnv, config):
     ).reset_index(drop=True)"""
     sales_df = sales_df.merge(customer_df, how="inner", algorithm='sort',
                               left_on=["ws_bill_customer_sk"],
-                              right_on=["c_customer_sk"], suffixes=('', ''), env=env)
+                              right_on=["c_customer_sk"], suffixes=('', ''), env=customer_env)
     # sales_df.rename([x.split('-')[1] for x in sales_df.column_names])
 
     keep_cols = [
@@ -427,17 +484,16 @@ def main(env: CylonEnv, config):
             ascending=False,
         )
     )"""
-    result_df = sales_df.sort_values(["web_sales_increase_ratio",
-                                      "c_customer_sk",
-                                      "c_first_name",
-                                      "c_last_name",
-                                      "c_preferred_cust_flag",
-                                      "c_birth_country",
-                                      "c_login"],
-                                     ascending=False, num_bins=1024, num_samples=128)
-    # print(env.get_rank(), result_df.row_count)
-
-    filtered_res = result_df[0:q6_limit_rows]
+    # global top q6_limit_rows on rank 0, instead of a full sort of sales_df
+    filtered_res = top_k(env, sales_df, q6_limit_rows,
+                         by=["web_sales_increase_ratio",
+                             "c_customer_sk",
+                             "c_first_name",
+                             "c_last_name",
+                             "c_preferred_cust_flag",
+                             "c_birth_country",
+                             "c_login"],
+                         ascending=False)
     #     print(filtered_res)
     return filtered_res
 
@@ -457,13 +513,20 @@ if __name__ == "__main__":
     env: CylonEnv = CylonEnv(config=mpi_config, distributed=True)
 
     res = main(env, config)
+    # collective, all ranks take part
+    read_summary = READ_STATS.summarize(env) if config["get_read_time"] else None
 
     if env.rank == 0:
         import os
 
         os.makedirs(config['output_dir'], exist_ok=True)
         res.to_pandas().to_csv(f"{config['output_dir']}/q06_results.csv", index=False)
+        if read_summary is not None:
+            print_read_summary(read_summary)
+            write_read_summary(read_summary, f"{config['output_dir']}/q06_read_stats.json")
 
         # print(res)
 
+    # collective: stop the background staging copies and remove the node shared tables, if any
+    close_readers(env)
     env.finalize()
@@ -18,7 +18,12 @@ from cylon_xbb_tools.utils import (
     tpcxbb_argparser,
     # run_query,
 )
-from cylon_xbb_tools.readers import CSVReader
+from cylon_xbb_tools import zonemap
+from cylon_xbb_tools.joins import broadcast_merge, semi_join, smart_merge
+from cylon_xbb_tools.read_stats import READ_STATS, print_read_summary, write_read_summary
+from cylon_xbb_tools.readers import build_reader, close_readers
+from cylon_xbb_tools.prefetch import TablePrefetcher
+from cylon_xbb_tools.topk import top_k
 
 from pycylon.net import MPIConfig
 from pycylon import CylonEnv, DataFrame
@@ -31,7 +36,7 @@ q07_HAVING_COUNT_GE = 10
 q07_LIMIT = 10
 
 
-def create_high_price_items_df(env: CylonEnv, item_df: DataFrame) -> DataFrame:
+def create_high_price_items_df(env: CylonEnv, item_df: DataFrame, verbose=False) -> DataFrame:
     """
     grouped_item_df = (
         item_df[["i_category", "i_current_price"]]
@@ -58,8 +63,8 @@ def create_high_price_items_df(env: CylonEnv, item_df: DataFrame) -> DataFrame:
     # [i_category, avg_price]
 
     # todo: this join has unbalanced work & can create empty tables
-    item_df = item_df.merge(grouped_item_df, how='inner', algorithm='sort',
-                            on=['i_category'], suffixes=("", "rt-"), env=env) \
+    item_df = smart_merge(item_df, grouped_item_df, how='inner', algorithm='sort',
+                          on=['i_category'], suffixes=("", "rt-"), env=env, verbose=verbose) \
         .drop(['rt-i_category'])
     item_df.rename({"rt-avg_price": "avg_price"})
     # [i_item_sk, i_current_price, i_category, avg_price]
@@ -73,13 +78,21 @@ def create_high_price_items_df(env: CylonEnv, item_df: DataFrame) -> DataFrame:
 
 
 def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
-    # table_reader = build_reader(
-    #     data_format=config["file_format"],
-    #     basepath=config["data_dir"],
-    #     split_row_groups=config["split_row_groups"],
-    # )
-    # table_reader = CSVReader(config["data_dir"], ctx.get_rank())
-    table_reader = CSVReader(config["data_dir"], rank=None if env.world_size == 1 else env.rank)
+    table_reader = build_reader(
+        data_format=config["file_format"],
+        basepath=config["data_dir"],
+        rank=env.rank,
+        world_size=env.world_size,
+        cache_dir=config["cache_dir"],
+        node_shared_dir=config["node_shared_dir"],
+        dictionary_encode=config["dictionary_encode"],
+        zone_maps=config["zone_maps"],
+        zone_map_dir=config["zone_map_dir"],
+        exact_decimals=config["exact_decimals"],
+        io_tokens_per_device=config["io_tokens_per_device"],
+        split_row_groups=config["split_row_groups"],
+        stage_dir=config["stage_dir"],
+    )
 
     item_cols = ["i_item_sk", "i_current_price", "i_category"]
     store_sales_cols = ["ss_item_sk", "ss_customer_sk", "ss_sold_date_sk"]
@@ -88,13 +101,29 @@ def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
     customer_cols = ["c_customer_sk", "c_current_addr_sk"]
     customer_address_cols = ["ca_address_sk", "ca_state"]
 
-    item_df = table_reader.read(env, "item", relevant_cols=item_cols)
-    store_sales_df = table_reader.read(env, "store_sales", relevant_cols=store_sales_cols)
-    store_df = table_reader.read(env, "store", relevant_cols=store_cols)
-    date_dim_df_1part = table_reader.read(env, "date_dim", relevant_cols=date_cols)
-    customer_df = table_reader.read(env, "customer", relevant_cols=customer_cols)
-    customer_address_df = table_reader.read(env, "customer_address",
-                                            relevant_cols=customer_address_cols)
+    # date_dim is read first, so that with zone maps store_sales is restricted to the d_date_sk
+    # range of the month
+    date_dim_df_1part = table_reader.read(env, "date_dim", relevant_cols=date_cols,
+                                          filters=[("d_year", "==", q07_YEAR),
+                                                   ("d_moy", "==", q07_MONTH)])
+    ss_date_filters = zonemap.get_key_range_filters(
+        date_dim_df_1part.to_arrow(), "d_date_sk", "ss_sold_date_sk") \
+        if config["zone_maps"] else None
+
+    prefetcher = TablePrefetcher(table_reader, env, [
+        ("store_sales", store_sales_cols, {"filters": ss_date_filters}),
+        ("customer", customer_cols),
+        ("customer_address", customer_address_cols,
+         {"filters": [("ca_state", "!=", "")]}),
+        ("item", item_cols),
+        ("store", store_cols),
+    ], max_parallel_reads=config["max_parallel_reads"])
+
+    item_df = prefetcher.get("item")
+    store_sales_df = prefetcher.get("store_sales")
+    store_df = prefetcher.get("store")
+    customer_df = prefetcher.get("customer")
+    customer_address_df = prefetcher.get("customer_address")
 
     return (
         item_df,
@@ -131,7 +160,7 @@ def main(env: CylonEnv, config):
     ) = read_tables(env, config)
 
     # i_item_sk  i_current_price                i_category  avg_price
-    high_price_items_df = create_high_price_items_df(env, item_df)
+    high_price_items_df = create_high_price_items_df(env, item_df, verbose=config["verbose"])
     del item_df
 
     # Query 0. Date Time Filteration Logic
@@ -141,8 +170,8 @@ def main(env: CylonEnv, config):
         f"d_year == {q07_YEAR} and d_moy == {q07_MONTH}", meta=date_dim_df._meta
     ).reset_index(drop=True)
     """
-    filtered_date_df_1part = date_dim_df_1part[
-        (date_dim_df_1part['d_year'] == q07_YEAR) & (date_dim_df_1part['d_moy'] == q07_MONTH)]
+    # d_year and d_moy filters are pushed down to the reader
+    filtered_date_df_1part = date_dim_df_1part
 
     # filtering store sales to above dates
     # ss_item_sk  ss_customer_sk  ss_sold_date_sk
@@ -154,11 +183,11 @@ def main(env: CylonEnv, config):
         how="inner",
     )
     """
-    # local merge
-    store_sales_df = store_sales_df.merge(filtered_date_df_1part, how='inner', algorithm='sort',
-                                          left_on=["ss_sold_date_sk"], right_on=["d_date_sk"],
-                                          suffixes=("", ""))
-    # ss_item_sk  ss_customer_sk  ss_sold_date_sk  d_date_sk  d_year  d_moy
+    # local semi join, date_dim columns are not needed
+    store_sales_df = semi_join(store_sales_df, filtered_date_df_1part, env,
+                               left_on="ss_sold_date_sk", right_on="d_date_sk",
+                               right_replicated=True)
+    # ss_item_sk  ss_customer_sk  ss_sold_date_sk
 
     # cols 2 keep after merge
     """
@@ -175,12 +204,12 @@ def main(env: CylonEnv, config):
         high_price_items_df, left_on=["ss_item_sk"], right_on=["i_item_sk"], how="inner"
     )
     """
-    store_sales_high_price_items_join_df = store_sales_df.merge(high_price_items_df,
-                                                                how='inner', algorithm='sort',
-                                                                left_on=["ss_item_sk"],
-                                                                right_on=["i_item_sk"],
-                                                                suffixes=("", ""),
-                                                                env=env)
+    # only a few items survive the price filter, broadcast them instead of shuffling store_sales
+    store_sales_high_price_items_join_df = broadcast_merge(env, store_sales_df,
+                                                           high_price_items_df, how='inner',
+                                                           left_on=["ss_item_sk"],
+                                                           right_on=["i_item_sk"],
+                                                           suffixes=("", ""))
 
     # Query 2. `Customer` Merge `store_sales_highPriceItems_join_df`
     """
@@ -188,21 +217,24 @@ def main(env: CylonEnv, config):
         customer_df, left_on=["ss_customer_sk"], right_on=["c_customer_sk"], how="inner"
     )
     """
-    store_sales_high_price_items_customer_join_df = store_sales_high_price_items_join_df \
-        .merge(customer_df, how='inner', algorithm='sort', left_on=["ss_customer_sk"],
-               right_on=["c_customer_sk"], suffixes=("", ""), env=env)
+    store_sales_high_price_items_customer_join_df = smart_merge(
+        store_sales_high_price_items_join_df, customer_df, how='inner', algorithm='sort',
+        left_on=["ss_customer_sk"], right_on=["c_customer_sk"], suffixes=("", ""), env=env,
+        verbose=config["verbose"])
 
     # Query 3. `store_sales_highPriceItems_customer_join_df` Merge `Customer Address`
-    customer_address_df = customer_address_df[customer_address_df["ca_state"].notnull()]
+    # ca_state notnull filter is pushed down to the reader. Missing states are empty strings in
+    # the CSV data (and in parquet converted from it), not nulls: `!= ""` drops both
 
     """
     final_merged_df = store_sales_high_price_items_customer_join_df.merge(
         customer_address_df, left_on=["c_current_addr_sk"], right_on=["ca_address_sk"]
     )
     """
-    final_merged_df = store_sales_high_price_items_customer_join_df.merge(
-        customer_address_df, how='inner', algorithm='sort', left_on=["c_current_addr_sk"],
-        right_on=["ca_address_sk"], suffixes=("", ""), env=env)
+    final_merged_df = smart_merge(
+        store_sales_high_price_items_customer_join_df, customer_address_df, how='inner',
+        algorithm='sort', left_on=["c_current_addr_sk"], right_on=["ca_address_sk"],
+        suffixes=("", ""), env=env, verbose=config["verbose"])
 
     # Query 4. Final State Grouped Query
     """
@@ -226,9 +258,9 @@ def main(env: CylonEnv, config):
     """
     count_df = count_df[count_df["cnt"] >= q07_HAVING_COUNT_GE]
 
-    sorted_df = count_df.sort_values(1, ascending=False, env=env)
-
-    result_df = sorted_df[0:q07_LIMIT]
+    # ORDER BY cnt DESC, ca_state: ties on cnt are ordered by state, so that the LIMIT returns the
+    # same rows for any number of ranks
+    result_df = top_k(env, count_df, q07_LIMIT, by=["cnt", "ca_state"], ascending=[False, True])
 
     return result_df
 
@@ -240,11 +272,18 @@ if __name__ == "__main__":
     ctx: CylonEnv = CylonEnv(config=mpi_config, distributed=True)
 
     res = main(ctx, config)
+    # collective, all ranks take part
+    read_summary = READ_STATS.summarize(ctx) if config["get_read_time"] else None
 
     if ctx.rank == 0:
         import os
 
         os.makedirs(config['output_dir'], exist_ok=True)
         res.to_pandas().to_csv(f"{config['output_dir']}/q07_results.csv", index=False)
+        if read_summary is not None:
+            print_read_summary(read_summary)
+            write_read_summary(read_summary, f"{config['output_dir']}/q07_read_stats.json")
 
+    # collective: stop the background staging copies and remove the node shared tables, if any
+    close_readers(ctx)
     ctx.finalize()
@@ -21,18 +21,35 @@ from cylon_xbb_tools.utils import (
     tpcxbb_argparser,
     # run_query,
 )
-from cylon_xbb_tools.readers import CSVReader
+from cylon_xbb_tools import zonemap
+from cylon_xbb_tools.decimals import decimal_constant
+from cylon_xbb_tools.joins import broadcast_merge, semi_join, smart_merge
+from cylon_xbb_tools.lookup import lookup_merge
+from cylon_xbb_tools.read_stats import READ_STATS, print_read_summary, write_read_summary
+from cylon_xbb_tools.readers import build_reader, close_readers
+from cylon_xbb_tools.prefetch import TablePrefetcher
 from pycylon.net import MPIConfig
 from pycylon import CylonEnv, DataFrame
 
+q09_year = 2001
+
 
 def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
-    # table_reader = build_reader(
-    #     data_format=config["file_format"],
-    #     basepath=config["data_dir"],
-    #     split_row_groups=config["split_row_groups"],
-    # )
-    table_reader = CSVReader(config["data_dir"], rank=None if env.world_size == 1 else env.rank)
+    table_reader = build_reader(
+        data_format=config["file_format"],
+        basepath=config["data_dir"],
+        rank=env.rank,
+        world_size=env.world_size,
+        cache_dir=config["cache_dir"],
+        node_shared_dir=config["node_shared_dir"],
+        dictionary_encode=config["dictionary_encode"],
+        zone_maps=config["zone_maps"],
+        zone_map_dir=config["zone_map_dir"],
+        exact_decimals=config["exact_decimals"],
+        io_tokens_per_device=config["io_tokens_per_device"],
+        split_row_groups=config["split_row_groups"],
+        stage_dir=config["stage_dir"],
+    )
 
     ss_columns = [
         "ss_quantity",
@@ -44,20 +61,30 @@ def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
         "ss_net_profit",
     ]
 
-    store_sales = table_reader.read(env, "store_sales", relevant_cols=ss_columns)
-
     ca_columns = ["ca_address_sk", "ca_country", "ca_state"]
-    customer_address = table_reader.read(env, "customer_address", relevant_cols=ca_columns)
-
     cd_columns = ["cd_demo_sk", "cd_marital_status", "cd_education_status"]
-    customer_demographics_1part = table_reader.read(env, "customer_demographics",
-                                                    relevant_cols=cd_columns)
-
     dd_columns = ["d_year", "d_date_sk"]
-    date_dim_1part = table_reader.read(env, "date_dim", relevant_cols=dd_columns)
-
     s_columns = ["s_store_sk"]
-    store = table_reader.read(env, "store", relevant_cols=s_columns)
+
+    # date_dim is read first, so that with zone maps store_sales is restricted to the d_date_sk
+    # range of the year
+    date_dim_1part = table_reader.read(env, "date_dim", relevant_cols=dd_columns,
+                                       filters=[("d_year", "==", q09_year)])
+    ss_date_filters = zonemap.get_key_range_filters(
+        date_dim_1part.to_arrow(), "d_date_sk", "ss_sold_date_sk") \
+        if config["zone_maps"] else None
+
+    prefetcher = TablePrefetcher(table_reader, env, [
+        ("store_sales", ss_columns, {"filters": ss_date_filters}),
+        ("customer_address", ca_columns),
+        ("customer_demographics", cd_columns),
+        ("store", s_columns),
+    ], max_parallel_reads=config["max_parallel_reads"])
+
+    store_sales = prefetcher.get("store_sales")
+    customer_address = prefetcher.get("customer_address")
+    customer_demographics_1part = prefetcher.get("customer_demographics")
+    store = prefetcher.get("store")
 
     return store_sales, customer_address, customer_demographics_1part, date_dim_1part, store
 
@@ -67,37 +94,40 @@ def main(env, config):
 
     # Conf variables
 
-    q09_year = 2001
+    # decimal bounds are in the units of ss_net_profit/ss_sales_price (ie: cents with
+    # exact_decimals)
+    def dec(value):
+        return decimal_constant(value, config["exact_decimals"])
 
     q09_part1_ca_country = "United States"
     # q09_part1_ca_state_IN = "KY", "GA", "NM"
     q09_part1_ca_state_IN = ["KY", "GA", "NM"]
-    q09_part1_net_profit_min = 0
-    q09_part1_net_profit_max = 2000
+    q09_part1_net_profit_min = dec(0)
+    q09_part1_net_profit_max = dec(2000)
     q09_part1_education_status = "4 yr Degree"
     q09_part1_marital_status = "M"
-    q09_part1_sales_price_min = 100
-    q09_part1_sales_price_max = 150
+    q09_part1_sales_price_min = dec(100)
+    q09_part1_sales_price_max = dec(150)
 
     q09_part2_ca_country = "United States"
     # q09_part2_ca_state_IN = "MT", "OR", "IN"
     q09_part2_ca_state_IN = ["MT", "OR", "IN"]
-    q09_part2_net_profit_min = 150
-    q09_part2_net_profit_max = 3000
+    q09_part2_net_profit_min = dec(150)
+    q09_part2_net_profit_max = dec(3000)
     q09_part2_education_status = "4 yr Degree"
     q09_part2_marital_status = "M"
-    q09_part2_sales_price_min = 50
-    q09_part2_sales_price_max = 200
+    q09_part2_sales_price_min = dec(50)
+    q09_part2_sales_price_max = dec(200)
 
     q09_part3_ca_country = "United States"
     # q09_part3_ca_state_IN = "WI", "MO", "WV"
     q09_part3_ca_state_IN = ["WI", "MO", "WV"]
-    q09_part3_net_profit_min = 50
-    q09_part3_net_profit_max = 25000
+    q09_part3_net_profit_min = dec(50)
+    q09_part3_net_profit_max = dec(25000)
     q09_part3_education_status = "4 yr Degree"
     q09_part3_marital_status = "M"
-    q09_part3_sales_price_min = 150
-    q09_part3_sales_price_max = 200
+    q09_part3_sales_price_min = dec(150)
+    q09_part3_sales_price_max = dec(200)
 
     """
     (
@@ -126,7 +156,7 @@ def main(env, config):
         "d_year==@q09_year", meta=date_dim._meta, local_dict={"q09_year": q09_year}
     ).reset_index(drop=True)
    """
-    date_dim_1part = date_dim_1part[date_dim_1part['d_year'] == q09_year]
+    # d_year filter is pushed down to the reader
     # d_year: int64 d_date_sk: int64
 
     """
@@ -134,9 +164,8 @@ def main(env, config):
         date_dim, left_on=["ss_sold_date_sk"], right_on=["d_date_sk"], how="inner"
     )
     """
-    output_table = store_sales.merge(date_dim_1part, how="inner", algorithm='sort',
-                                     left_on=["ss_sold_date_sk"], right_on=["d_date_sk"],
-                                     suffixes=('', ''))  # local 
+    output_table = semi_join(store_sales, date_dim_1part, env, left_on="ss_sold_date_sk",
+                             right_on="d_date_sk", right_replicated=True)  # local
     # output_table.rename([x.split('-')[1] for x in output_table.column_names])
     # ss_quantity: int64
     # ss_sold_date_sk: int64
@@ -145,8 +174,6 @@ def main(env, config):
     # ss_cdemo_sk: int64
     # ss_sales_price: double
     # ss_net_profit: double
-    # d_year: int64
-    # d_date_sk: int64
 
     """
     output_table = output_table.drop(
@@ -154,7 +181,7 @@ def main(env, config):
     )  # Drop the columns that are not needed
     """
     # Drop the columns that are not needed
-    output_table = output_table.drop(["d_year", "d_date_sk", "ss_sold_date_sk"])
+    output_table = output_table.drop(["ss_sold_date_sk"])
 
     """
     output_table = output_table.merge(
@@ -162,8 +189,9 @@ def main(env, config):
     )
     output_table = output_table.drop(columns=["ss_store_sk", "s_store_sk"])
     """
-    output_table = output_table.merge(store, how="inner", algorithm='sort', left_on=["ss_store_sk"],
-                                      right_on=["s_store_sk"], suffixes=('', ''), env=env)
+    output_table = broadcast_merge(env, output_table, store, how="inner",
+                                   left_on=["ss_store_sk"], right_on=["s_store_sk"],
+                                   suffixes=('', ''))
     output_table = output_table.drop(["ss_store_sk", "s_store_sk"])
     # output_table.rename([x.split('-')[1] for x in output_table.column_names])
     # ss_quantity: int64
@@ -180,9 +208,8 @@ def main(env, config):
         how="inner",
     )
     """
-    output_table = output_table.merge(customer_demographics_1part, how="inner", algorithm='sort',
-                                      left_on=["ss_cdemo_sk"], right_on=["cd_demo_sk"],
-                                      suffixes=('', ''))  # local
+    output_table = lookup_merge(env, output_table, customer_demographics_1part,
+                                left_on="ss_cdemo_sk", right_on="cd_demo_sk")  # local
     # output_table.rename([x.split('-')[1] for x in output_table.column_names])
     # ss_quantity: int64
     # ss_addr_sk: int64
@@ -262,9 +289,9 @@ def main(env, config):
         right_on=["ca_address_sk"],
         how="inner",
     )"""
-    output_table = output_table.merge(customer_address, how="inner", algorithm='sort',
-                                      left_on=["ss_addr_sk"], right_on=["ca_address_sk"],
-                                      suffixes=('', ''), env=env)
+    output_table = smart_merge(output_table, customer_address, how="inner", algorithm='sort',
+                               left_on=["ss_addr_sk"], right_on=["ca_address_sk"],
+                               suffixes=('', ''), env=env, verbose=config["verbose"])
     # output_table.rename([x.split('-')[1] for x in output_table.column_names])
     """
     output_table = output_table[
@@ -352,11 +379,18 @@ if __name__ == "__main__":
     ctx: CylonEnv = CylonEnv(config=mpi_config, distributed=True)
 
     res = main(ctx, config)
+    # collective, all ranks take part
+    read_summary = READ_STATS.summarize(ctx) if config["get_read_time"] else None
 
     if ctx.rank == 0:
         import os
 
         os.makedirs(config['output_dir'], exist_ok=True)
         res.to_pandas().to_csv(f"{config['output_dir']}/q09_results.csv", index=False)
+        if read_summary is not None:
+            print_read_summary(read_summary)
+            write_read_summary(read_summary, f"{config['output_dir']}/q09_read_stats.json")
 
+    # collective: stop the background staging copies and remove the node shared tables, if any
+    close_readers(ctx)
     ctx.finalize()
@@ -16,7 +16,11 @@ from typing import Iterable
 import numpy as np
 import sys
 
-from cylon_xbb_tools.readers import CSVReader
+from cylon_xbb_tools.joins import broadcast_merge
+from cylon_xbb_tools.lookup import lookup_merge
+from cylon_xbb_tools.read_stats import READ_STATS, print_read_summary, write_read_summary
+from cylon_xbb_tools.readers import build_reader, close_readers
+from cylon_xbb_tools.prefetch import TablePrefetcher
 from cylon_xbb_tools.utils import (
     tpcxbb_argparser
 )
@@ -24,28 +28,46 @@ from cylon_xbb_tools.utils import (
 from pycylon.net import MPIConfig
 from pycylon import CylonEnv, DataFrame
 
+q14_dependents = 5
+
 
 def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
-    table_reader = CSVReader(config["data_dir"], rank=None if env.world_size == 1 else env.rank)
+    table_reader = build_reader(
+        data_format=config["file_format"],
+        basepath=config["data_dir"],
+        rank=env.rank,
+        world_size=env.world_size,
+        cache_dir=config["cache_dir"],
+        node_shared_dir=config["node_shared_dir"],
+        dictionary_encode=config["dictionary_encode"],
+        exact_decimals=config["exact_decimals"],
+        io_tokens_per_device=config["io_tokens_per_device"],
+        split_row_groups=config["split_row_groups"],
+        stage_dir=config["stage_dir"],
+    )
 
     ws_columns = ["ws_ship_hdemo_sk", "ws_web_page_sk", "ws_sold_time_sk"]
-    web_sales = table_reader.read(env, "web_sales", relevant_cols=ws_columns)
-
     hd_columns = ["hd_demo_sk", "hd_dep_count"]
-    household_demographics_1part = table_reader.read(env, "household_demographics",
-                                                     relevant_cols=hd_columns)
-
     wp_columns = ["wp_web_page_sk", "wp_char_count"]
-    web_page = table_reader.read(env, "web_page", relevant_cols=wp_columns)
-
     td_columns = ["t_time_sk", "t_hour"]
-    time_dim_1part = table_reader.read(env, "time_dim", relevant_cols=td_columns)
+
+    prefetcher = TablePrefetcher(table_reader, env, [
+        ("web_sales", ws_columns),
+        ("household_demographics", hd_columns,
+         {"filters": [("hd_dep_count", "==", q14_dependents)]}),
+        ("web_page", wp_columns),
+        ("time_dim", td_columns),
+    ], max_parallel_reads=config["max_parallel_reads"])
+
+    web_sales = prefetcher.get("web_sales")
+    household_demographics_1part = prefetcher.get("household_demographics")
+    web_page = prefetcher.get("web_page")
+    time_dim_1part = prefetcher.get("time_dim")
 
     return web_sales, household_demographics_1part, web_page, time_dim_1part
 
 
 def main(env: CylonEnv, config):
-    q14_dependents = 5
     q14_morning_startHour = 7
     q14_morning_endHour = 8
     q14_evening_startHour = 19
@@ -68,15 +90,10 @@ def main(env: CylonEnv, config):
     # print("time_dim")
     # print(time_dim[0:10])
 
-    household_demographics_1part = household_demographics_1part[
-        ("hd_dep_count" == q14_dependents)
-        # meta=household_demographics._meta,
-        # local_dict={"q14_dependents": q14_dependents},
-    ]
+    # hd_dep_count filter is pushed down to the reader
 
-    output_table = web_sales.merge(household_demographics_1part, how="inner", algorithm="sort",
-                                   left_on=["ws_ship_hdemo_sk"], right_on=["hd_demo_sk"],
-                                   suffixes=('', ''))  # local
+    output_table = lookup_merge(env, web_sales, household_demographics_1part,
+                                left_on="ws_ship_hdemo_sk", right_on="hd_demo_sk")  # local
 
     # print("####", output_table.row_count)
 
@@ -91,9 +108,9 @@ def main(env: CylonEnv, config):
                         (web_page["wp_char_count"] >= q14_content_len_min) &
                         (web_page["wp_char_count"] <= q14_content_len_max)]
 
-    output_table = output_table.merge(web_page, how="inner", algorithm="sort",
-                                      left_on=["ws_web_page_sk"], right_on=["wp_web_page_sk"],
-                                      suffixes=('', ''), env=env)
+    output_table = broadcast_merge(env, output_table, web_page, how="inner",
+                                   left_on=["ws_web_page_sk"], right_on=["wp_web_page_sk"],
+                                   suffixes=('', ''))
 
     output_table = output_table.drop(["ws_web_page_sk", "wp_web_page_sk", "wp_char_count"])
 
@@ -102,9 +119,8 @@ def main(env: CylonEnv, config):
                                     (time_dim_1part["t_hour"] == q14_evening_startHour) |
                                     (time_dim_1part["t_hour"] == q14_evening_endHour)]
 
-    output_table = output_table.merge(time_dim_1part, how="inner", algorithm="sort",
-                                      left_on=["ws_sold_time_sk"], right_on=["t_time_sk"],
-                                      suffixes=('', ''))  # local
+    output_table = lookup_merge(env, output_table, time_dim_1part, left_on="ws_sold_time_sk",
+                                right_on="t_time_sk")  # local
 
     output_table = output_table.drop(["ws_sold_time_sk", "t_time_sk"])
 
@@ -140,11 +156,18 @@ if __name__ == "__main__":
     ctx: CylonEnv = CylonEnv(config=mpi_config, distributed=True)
 
     res = main(ctx, config)
+    # collective, all ranks take part
+    read_summary = READ_STATS.summarize(ctx) if config["get_read_time"] else None
 
     if ctx.rank == 0:
         import os
 
         os.makedirs(config['output_dir'], exist_ok=True)
         res.to_pandas().to_csv(f"{config['output_dir']}/q14_results.csv", index=False)
+        if read_summary is not None:
+            print_read_summary(read_summary)
+            write_read_summary(read_summary, f"{config['output_dir']}/q14_read_stats.json")
 
+    # collective: stop the background staging copies and remove the node shared tables, if any
+    close_readers(ctx)
     ctx.finalize()
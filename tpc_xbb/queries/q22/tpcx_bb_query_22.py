@@ -13,7 +13,12 @@
 ##
 from typing import Iterable
 
-from cylon_xbb_tools.readers import CSVReader
+from cylon_xbb_tools.joins import broadcast_merge, smart_merge
+from cylon_xbb_tools.lookup import lookup_merge
+from cylon_xbb_tools.read_stats import READ_STATS, print_read_summary, write_read_summary
+from cylon_xbb_tools.readers import build_reader, close_readers
+from cylon_xbb_tools.prefetch import TablePrefetcher
+from cylon_xbb_tools.topk import top_k
 from cylon_xbb_tools.utils import (
     # benchmark,
     tpcxbb_argparser,
@@ -24,6 +29,9 @@ import numpy as np
 from pycylon.net import MPIConfig
 from pycylon import CylonEnv, DataFrame
 
+q22_i_current_price_min = 0.98
+q22_i_current_price_max = 1.5
+
 
 def inventory_before_after(df: DataFrame, date) -> DataFrame:
     df["inv_before"] = df["inv_quantity_on_hand"].copy()
@@ -34,7 +42,19 @@ def inventory_before_after(df: DataFrame, date) -> DataFrame:
 
 
 def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
-    table_reader = CSVReader(config["data_dir"], rank=None if env.world_size == 1 else env.rank)
+    table_reader = build_reader(
+        data_format=config["file_format"],
+        basepath=config["data_dir"],
+        rank=env.rank,
+        world_size=env.world_size,
+        cache_dir=config["cache_dir"],
+        node_shared_dir=config["node_shared_dir"],
+        dictionary_encode=config["dictionary_encode"],
+        exact_decimals=config["exact_decimals"],
+        io_tokens_per_device=config["io_tokens_per_device"],
+        split_row_groups=config["split_row_groups"],
+        stage_dir=config["stage_dir"],
+    )
 
     inv_columns = [
         "inv_item_sk",
@@ -43,35 +63,37 @@ def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
         "inv_quantity_on_hand",
     ]
 
-    inventory = table_reader.read(env, "inventory", relevant_cols=inv_columns)
-
     item_columns = ["i_item_id", "i_current_price", "i_item_sk"]
-    item = table_reader.read(env, "item", relevant_cols=item_columns)
-
     warehouse_columns = ["w_warehouse_sk", "w_warehouse_name"]
-    warehouse = table_reader.read(
-        env, "warehouse", relevant_cols=warehouse_columns)
-
     dd_columns = ["d_date_sk", "d_date"]
-    date_dim_1part = table_reader.read(env, "date_dim", relevant_cols=dd_columns)
+
+    prefetcher = TablePrefetcher(table_reader, env, [
+        ("inventory", inv_columns),
+        ("item", item_columns, {"filters": [("i_current_price", ">=", q22_i_current_price_min),
+                                            ("i_current_price", "<=", q22_i_current_price_max)]}),
+        ("warehouse", warehouse_columns),
+        ("date_dim", dd_columns),
+    ], max_parallel_reads=config["max_parallel_reads"])
+
+    inventory = prefetcher.get("inventory")
+    item = prefetcher.get("item")
+    warehouse = prefetcher.get("warehouse")
+    date_dim_1part = prefetcher.get("date_dim")
 
     return inventory, item, warehouse, date_dim_1part
 
 
 def main(env, config):
     q22_date = "2001-05-08"
-    q22_i_current_price_min = 0.98
-    q22_i_current_price_max = 1.5
 
     inventory, item, warehouse, date_dim_1part = read_tables(env, config)
 
-    item = item[(item["i_current_price"] >= q22_i_current_price_min) &
-                (item["i_current_price"] <= q22_i_current_price_max)]
-
+    # i_current_price filter is pushed down to the reader
     item = item[["i_item_id", "i_item_sk"]]
 
-    output_table = inventory.merge(item, left_on=["inv_item_sk"], right_on=["i_item_sk"],
-                                   how='inner', algorithm='sort', suffixes=('', ''), env=env)
+    output_table = smart_merge(inventory, item, left_on=["inv_item_sk"], right_on=["i_item_sk"],
+                               how='inner', algorithm='sort', suffixes=('', ''), env=env,
+                               verbose=config["verbose"])
 
     keep_columns = ["inv_warehouse_sk",
                     "inv_date_sk",
@@ -90,16 +112,15 @@ def main(env, config):
     date_dim_1part = date_dim_1part[
         (date_dim_1part["d_date"] >= min_date) and (date_dim_1part["d_date"] <= max_date)]
 
-    output_table = output_table.merge(date_dim_1part, left_on=["inv_date_sk"],
-                                      right_on=["d_date_sk"], how='inner',
-                                      algorithm='sort', suffixes=('', ''))  # local 
+    output_table = lookup_merge(env, output_table, date_dim_1part, left_on="inv_date_sk",
+                                right_on="d_date_sk")  # local
 
     keep_columns = ["i_item_id", "inv_quantity_on_hand", "inv_warehouse_sk", "d_date"]
     output_table = output_table[keep_columns]
 
-    output_table = output_table.merge(warehouse, left_on=["inv_warehouse_sk"],
-                                      right_on=["w_warehouse_sk"], how='inner',
-                                      algorithm='sort', suffixes=('', ''), env=env)
+    output_table = broadcast_merge(env, output_table, warehouse, how='inner',
+                                   left_on=["inv_warehouse_sk"], right_on=["w_warehouse_sk"],
+                                   suffixes=('', ''))
 
     keep_columns = ["i_item_id", "inv_quantity_on_hand",
                     "d_date", "w_warehouse_name"]
@@ -141,7 +162,8 @@ def main(env, config):
     output_table = output_table[keep_columns]
 
     # for query 22 the results vary after 6 th decimal place
-    return output_table[0:100]  #todo use head operation here
+    # ORDER BY w_warehouse_name, i_item_id LIMIT 100
+    return top_k(env, output_table, 100, by=["w_warehouse_name", "i_item_id"])
 
 
 if __name__ == "__main__":
@@ -151,11 +173,18 @@ if __name__ == "__main__":
     ctx: CylonEnv = CylonEnv(config=mpi_config, distributed=True)
 
     res = main(ctx, config)
+    # collective, all ranks take part
+    read_summary = READ_STATS.summarize(ctx) if config["get_read_time"] else None
 
     if ctx.rank == 0:
         import os
 
         os.makedirs(config['output_dir'], exist_ok=True)
         res.to_pandas().to_csv(f"{config['output_dir']}/q22_results.csv", index=False)
+        if read_summary is not None:
+            print_read_summary(read_summary)
+            write_read_summary(read_summary, f"{config['output_dir']}/q22_read_stats.json")
 
+    # collective: stop the background staging copies and remove the node shared tables, if any
+    close_readers(ctx)
     ctx.finalize()
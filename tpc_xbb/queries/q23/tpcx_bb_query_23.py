@@ -19,20 +19,37 @@ from cylon_xbb_tools.utils import (
     tpcxbb_argparser,
     # run_query,
 )
-from cylon_xbb_tools.readers import CSVReader
+from cylon_xbb_tools import bucketing, zonemap
+from cylon_xbb_tools.lookup import lookup_merge
+from cylon_xbb_tools.read_stats import READ_STATS, print_read_summary, write_read_summary
+from cylon_xbb_tools.readers import build_reader, close_readers
 
 from pycylon.net import MPIConfig
 from pycylon import CylonEnv, DataFrame
 
+q23_year = 2001
+q23_month = 1
+
 
 def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
-    table_reader = CSVReader(config["data_dir"], rank=None if env.world_size == 1 else env.rank)
+    table_reader = build_reader(
+        data_format=config["file_format"],
+        basepath=config["data_dir"],
+        rank=env.rank,
+        world_size=env.world_size,
+        cache_dir=config["cache_dir"],
+        node_shared_dir=config["node_shared_dir"],
+        dictionary_encode=config["dictionary_encode"],
+        zone_maps=config["zone_maps"],
+        zone_map_dir=config["zone_map_dir"],
+        exact_decimals=config["exact_decimals"],
+        io_tokens_per_device=config["io_tokens_per_device"],
+        split_row_groups=config["split_row_groups"],
+        stage_dir=config["stage_dir"],
+    )
 
     ddim_columns = ["d_date_sk", "d_year", "d_moy"]
 
-    date_dim_table_1part = table_reader.read(
-        env, "date_dim", relevant_cols=ddim_columns)
-
     inv_columns = [
         "inv_warehouse_sk",
         "inv_item_sk",
@@ -40,23 +57,37 @@ def read_tables(env: CylonEnv, config) -> Iterable[DataFrame]:
         "inv_quantity_on_hand",
     ]
 
-    inventory_table = table_reader.read(env, "inventory", relevant_cols=inv_columns)
+    # date_dim is read first, so that with zone maps inventory is restricted to the d_date_sk
+    # range of the two months
+    date_dim_table_1part = table_reader.read(env, "date_dim", relevant_cols=ddim_columns,
+                                             filters=[("d_year", "==", q23_year),
+                                                      ("d_moy", ">=", q23_month),
+                                                      ("d_moy", "<=", q23_month + 1)])
+    inv_date_filters = zonemap.get_key_range_filters(
+        date_dim_table_1part.to_arrow(), "d_date_sk", "inv_date_sk") \
+        if config["zone_maps"] else None
+
+    inventory_table = table_reader.read(env, "inventory", relevant_cols=inv_columns,
+                                        filters=inv_date_filters)
+
+    # with inventory bucketed on inv_item_sk (csv_to_parquet --bucket_by), all rows of an item
+    # are on the same rank
+    item_bucketed = bucketing.co_bucketed(table_reader, [("inventory", "inv_item_sk")])
 
-    return date_dim_table_1part, inventory_table
+    return date_dim_table_1part, inventory_table, item_bucketed
 
 
 def main(env: CylonEnv, config) -> DataFrame:
-    q23_year = 2001
-    q23_month = 1
     q23_coefficient = 1.3
 
-    date_dim_table_1part, inventory_table = read_tables(env, config)
+    date_dim_table_1part, inventory_table, item_bucketed = read_tables(env, config)
+    # groupbys and joins on keys including inv_item_sk are local if inventory is bucketed on it
+    item_env = None if item_bucketed else env
 
     # Query Set 1
 
-    inventory_data_dim_joined = inventory_table.merge(date_dim_table_1part, how='inner',
-                                                      algorithm='sort', left_on=['inv_date_sk'],
-                                                      right_on=['d_date_sk'], suffixes=('', ''))
+    inventory_data_dim_joined = lookup_merge(env, inventory_table, date_dim_table_1part,
+                                             left_on='inv_date_sk', right_on='d_date_sk')
 
     q23_month_plus_one = q23_month + 1
     inv_dates_result = inventory_data_dim_joined[
@@ -70,7 +101,7 @@ def main(env: CylonEnv, config) -> DataFrame:
     # Query Set 2
 
     grouped_inv_dates = inv_dates_result.groupby(by=["inv_warehouse_sk", "inv_item_sk", "d_moy"],
-                                                 env=env) \
+                                                 env=item_env) \
         .agg({"inv_quantity_on_hand": ["mean", "std"]})
 
     # todo remove this indeixng call
@@ -106,7 +137,7 @@ def main(env: CylonEnv, config) -> DataFrame:
     result_df = inv1_df.merge(inv2_df, how='inner', algorithm='sort',
                               left_on=['inv_warehouse_sk', 'inv_item_sk'],
                               right_on=['inv_warehouse_sk', 'inv_item_sk'],
-                              suffixes=('l_', 'r_'), env=env)
+                              suffixes=('l_', 'r_'), env=item_env)
 
     print("Before rename")
     print(result_df[0:10])
@@ -136,11 +167,18 @@ if __name__ == "__main__":
     ctx: CylonEnv = CylonEnv(config=mpi_config, distributed=True)
 
     res = main(ctx, config)
+    # collective, all ranks take part
+    read_summary = READ_STATS.summarize(ctx) if config["get_read_time"] else None
 
     if ctx.rank == 0:
         import os
 
         os.makedirs(config['output_dir'], exist_ok=True)
         res.to_pandas().to_csv(f"{config['output_dir']}/q23_results.csv", index=False)
+        if read_summary is not None:
+            print_read_summary(read_summary)
+            write_read_summary(read_summary, f"{config['output_dir']}/q23_read_stats.json")
 
+    # collective: stop the background staging copies and remove the node shared tables, if any
+    close_readers(ctx)
     ctx.finalize()
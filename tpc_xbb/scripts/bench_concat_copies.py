@@ -0,0 +1,83 @@
+import argparse
+import gc
+import os
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pycylon as cy
+from pycylon import CylonEnv
+
+from cylon_xbb_tools.chunked import concat_dataframes, concat_tables, to_dataframe
+
+parser = argparse.ArgumentParser(description='Measure the bytes copied by table concat paths')
+
+parser.add_argument('-r', '--rows', type=int, nargs='+',
+                    help='total rows of the concatenated table', default=[1 << 20, 1 << 24])
+parser.add_argument('-p', '--pieces', type=int, help='pieces (ex: data + data_refresh)',
+                    default=2)
+parser.add_argument('-c', '--columns', type=int, help='float64 columns', default=4)
+
+
+def make_pieces(rows, pieces, columns):
+    piece_rows = rows // pieces
+    return [pa.table({f"c{i}": pc.random(piece_rows) for i in range(columns)})
+            for _ in range(pieces)]
+
+
+def read_memory_mapped(path):
+    return ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def measure(label, func, *args):
+    """Prints the bytes allocated from the arrow memory pool (ie: copied) and the time of func"""
+    gc.collect()
+    before = pa.total_allocated_bytes()
+    t0 = time.time()
+    result = func(*args)
+    elapsed = time.time() - t0
+    copied = pa.total_allocated_bytes() - before
+    print(f"  {label:<42} copied: {copied / (1 << 20):10.2f} MB  time: {elapsed:.4f} s")
+    del result
+
+
+def main(_args):
+    env = CylonEnv(config=None, distributed=False)
+
+    for rows in _args['rows']:
+        pieces = make_pieces(rows, _args['pieces'], _args['columns'])
+        print(f"rows:{rows} pieces:{_args['pieces']} "
+              f"table:{sum(t.nbytes for t in pieces) / (1 << 20):.2f} MB")
+
+        measure("concat_tables (chunked)", concat_tables, pieces)
+        measure("concat_tables + combine_chunks", lambda: concat_tables(pieces).combine_chunks())
+        measure("to_dataframe(concat_tables)", lambda: to_dataframe(env, concat_tables(pieces)))
+
+        # a single batch IPC file, as written by readers.ArrowTableCache
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "table.arrow")
+            combined = concat_tables(pieces).combine_chunks()
+            with ipc.new_file(path, combined.schema) as writer:
+                writer.write_table(combined)
+            del combined
+            measure("to_dataframe(memory mapped cache)",
+                    lambda: to_dataframe(env, read_memory_mapped(path)))
+
+        dfs = [to_dataframe(env, t) for t in pieces]
+        measure("to_dataframe per piece + cy.concat", lambda: cy.concat(dfs, axis=0))
+        measure("to_dataframe per piece + concat_dataframes",
+                lambda: concat_dataframes(env, dfs))
+        del dfs
+        print(f"=====================")
+
+    env.finalize()
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    args = vars(args)
+
+    print("args:", args)
+    main(args)
@@ -0,0 +1,238 @@
+import argparse
+import glob
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pyarrow.parquet as pq
+from pyarrow import Table as pa_Table
+from pyarrow import concat_tables as pa_concat_tables
+from pyarrow import input_stream as pa_input_stream
+from pyarrow.csv import ReadOptions, ParseOptions, ConvertOptions
+from pyarrow.csv import open_csv as pa_open_csv
+
+from cylon_xbb_tools import bucketing
+from cylon_xbb_tools.schemas import TABLE_SCHEMAS
+
+parser = argparse.ArgumentParser(description='Convert TPCx-BB .dat files to parquet')
+
+parser.add_argument('-s', '--scale', type=int, nargs='+',
+                    help='scale in GBs', default=[1, 10, 100])
+parser.add_argument('-p', '--parts', type=int, nargs='+',
+                    help='partitions', default=[1, 2, 4, 8])
+parser.add_argument('-t', '--tables', type=str, nargs='+',
+                    help='tables (default: all tables with a schema)', default=None)
+parser.add_argument('--data_d', type=str, help='data dir',
+                    default=f"{os.getenv('HOME')}/bigbench")
+parser.add_argument('--out_d', type=str, help='output dir (default: data dir)', default=None)
+parser.add_argument('--row_group_size', type=int, help='rows per parquet row group',
+                    default=(1 << 20))
+parser.add_argument('--compression', type=str, help='parquet compression codec',
+                    default="snappy")
+parser.add_argument('-w', '--workers', type=int, help='conversion processes',
+                    default=os.cpu_count())
+parser.add_argument('--bucket_by', type=str, nargs='+',
+                    help='table:column pairs of tables to write hash bucketed on column '
+                         '(ex: store_sales:ss_customer_sk customer:c_customer_sk). Use an out_d '
+                         'separate from unbucketed outputs', default=[])
+parser.add_argument('--num_buckets', type=int, help='buckets of bucketed tables. A multiple of '
+                                                    'the number of ranks', default=64)
+
+CHECKSUM_SUFFIX = ".src-checksum"
+
+
+def is_empty(path):
+    """True if path has no data once decompressed"""
+    with pa_input_stream(path, compression="detect") as stream:
+        return len(stream.read(1)) == 0
+
+
+def is_converted(checksum_path, checksum):
+    """
+    True if checksum_path records checksum, and the output files written along with it (listed
+    after it, one per line) all still exist
+    """
+    if not os.path.exists(checksum_path):
+        return False
+    with open(checksum_path) as fp:
+        recorded, newline, outputs = fp.read().partition("\n")
+    # checksum files without the list of outputs can not be checked, convert the file again
+    if recorded.strip() != checksum or not newline:
+        return False
+    out_dir = os.path.dirname(checksum_path)
+    return all(os.path.exists(os.path.join(out_dir, f)) for f in outputs.split("\n") if f)
+
+
+def file_checksum(path, chunk_size=(1 << 24)):
+    digest = hashlib.blake2b()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RowGroupWriter:
+    """
+    Writes tables to a parquet file in row groups of row_group_size rows. The file is written to
+    a temp file and moved in place on close
+    """
+
+    def __init__(self, path, schema, row_group_size, compression):
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.writer = pq.ParquetWriter(path + ".tmp", schema, compression=compression,
+                                       write_statistics=True)
+        # buffer tables so that row groups have row_group_size rows
+        self.tables, self.rows = [], 0
+
+    def _flush(self):
+        self.writer.write_table(pa_concat_tables(self.tables), row_group_size=self.row_group_size)
+        self.tables, self.rows = [], 0
+
+    def write(self, pa_table):
+        self.tables.append(pa_table)
+        self.rows += pa_table.num_rows
+        if self.rows >= self.row_group_size:
+            self._flush()
+
+    def close(self):
+        if self.tables:
+            self._flush()
+        self.writer.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+def read_batches(src, schema):
+    """
+    Yields the batches of the .dat file src as tables with schema. Empty files (TPCx-BB writes 0
+    byte partitions of small tables at high partition counts) have no batches
+    """
+    if is_empty(src):
+        return
+    read_opts = ReadOptions(column_names=schema.names, block_size=(1 << 26))
+    parse_opts = ParseOptions(delimiter='|')
+    convert_opts = ConvertOptions(column_types=schema)
+    with pa_open_csv(src, read_options=read_opts, parse_options=parse_opts,
+                     convert_options=convert_opts) as reader:
+        for batch in reader:
+            yield pa_Table.from_batches([batch], schema=schema)
+
+
+def convert_file(table, src, dst, row_group_size, compression, bucket_by=None, num_buckets=1):
+    """
+    Converts a single .dat file to parquet with the typed table schema, unless its outputs were
+    already written from a source with the same checksum. Returns True if the file was converted.
+
+    If bucket_by is set, rows are hash bucketed on it and written to one file per bucket,
+    <dst name>_bucket_<bucket>.parquet (see bucketing.py)
+    """
+    checksum = file_checksum(src)
+    if bucket_by is not None:
+        # re-bucketing with another column or bucket count converts the file again
+        checksum += f" {bucket_by}:{num_buckets}"
+    checksum_path = dst + CHECKSUM_SUFFIX
+    if is_converted(checksum_path, checksum):
+        return False
+
+    schema = TABLE_SCHEMAS[table]
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    name = os.path.splitext(dst)[0]
+    if bucket_by is not None:
+        # drop the buckets of a previous conversion, they may not all be written again
+        for path in glob.glob(f"{name}_bucket_*.parquet"):
+            os.remove(path)
+
+    writers = {}
+    for batch_table in read_batches(src, schema):
+        if bucket_by is None:
+            parts = [(None, batch_table)]
+        else:
+            parts = bucketing.split_by_bucket(batch_table, bucket_by, num_buckets)
+
+        for bucket, part in parts:
+            if bucket not in writers:
+                path = dst if bucket is None else \
+                    os.path.join(os.path.dirname(dst),
+                                 bucketing.get_bucket_file_name(os.path.basename(name), bucket))
+                writers[bucket] = RowGroupWriter(path, schema, row_group_size, compression)
+            writers[bucket].write(part)
+
+    if bucket_by is None and not writers:
+        # empty source, write an empty file with the schema. Empty buckets are not written
+        writers[None] = RowGroupWriter(dst, schema, row_group_size, compression)
+
+    for writer in writers.values():
+        writer.close()
+
+    with open(checksum_path, "w") as fp:
+        fp.write(checksum + "\n")
+        fp.writelines(os.path.basename(w.path) + "\n" for w in writers.values())
+    return True
+
+
+def get_tasks(data_d, out_d, tables):
+    """
+    Returns (table, src, dst) for every .dat (or compressed .dat.gz/.dat.zst) file in
+    data_d/data and data_d/data_refresh. Compression is detected from the extension when reading.
+    If a file exists both plain and compressed, the plain file is converted
+    """
+    tasks = []
+    for upper_dir in ("data", "data_refresh"):
+        for table in tables:
+            sources = {}
+            for pattern in ("*.dat", "*.dat.gz", "*.dat.zst"):
+                for src in glob.glob(f"{data_d}/{upper_dir}/{table}/{pattern}"):
+                    sources.setdefault(os.path.basename(src).split(".dat")[0], src)
+            for name in sorted(sources):
+                tasks.append((table, sources[name],
+                              f"{out_d}/{upper_dir}/{table}/{name}.parquet"))
+    return tasks
+
+
+def main(_args):
+    tables = _args['tables'] if _args['tables'] is not None else sorted(TABLE_SCHEMAS.keys())
+    out_d = _args['out_d'] if _args['out_d'] is not None else _args['data_d']
+    bucket_by = dict(spec.split(":") for spec in _args['bucket_by'])
+    failed = []
+
+    for s in _args['scale']:
+        for p in _args['parts']:
+            print(f"converting scale:{s} partitions:{p}")
+            tasks = get_tasks(f"{_args['data_d']}/{p}/sf{s}", f"{out_d}/{p}/sf{s}", tables)
+
+            converted = 0
+            with ProcessPoolExecutor(max_workers=_args['workers']) as executor:
+                futures = {executor.submit(convert_file, table, src, dst,
+                                           _args['row_group_size'], _args['compression'],
+                                           bucket_by.get(table), _args['num_buckets']): src
+                           for table, src, dst in tasks}
+                for f in as_completed(futures):
+                    # a failed file does not stop the conversion of the others
+                    try:
+                        if f.result():
+                            converted += 1
+                        else:
+                            print("unchanged, skipping:", futures[f])
+                    except Exception as e:
+                        print("failed:", futures[f], repr(e))
+                        failed.append(futures[f])
+
+            # bucketed tables are read by bucket (see bucketing.py)
+            for table, dst_dir in sorted({(t, os.path.dirname(dst)) for t, _, dst in tasks}):
+                if table in bucket_by:
+                    bucketing.write_bucketing(dst_dir, bucket_by[table], _args['num_buckets'])
+
+            print(f"scale:{s} partitions:{p} done. converted {converted}/{len(tasks)} files")
+            print("=====================")
+
+    if failed:
+        raise SystemExit(f"{len(failed)} files failed to convert: {failed}")
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    args = vars(args)
+
+    print("args:", args)
+    main(args)
@@ -0,0 +1,112 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import os
+import sys
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from cylon_xbb_tools.schemas import get_arrow_schema
+
+
+@pytest.fixture(scope="session")
+def local_env():
+    """A single process (non distributed) CylonEnv"""
+    pycylon = pytest.importorskip("pycylon")
+    env = pycylon.CylonEnv(config=None, distributed=False)
+    yield env
+    env.finalize()
+
+
+@pytest.fixture
+def rank_env(local_env):
+    """
+    Returns env(rank, world_size): the env of one rank of world_size, for the rank local parts of
+    the readers and operators, run in a single process
+    """
+    def env(rank, world_size):
+        return SimpleNamespace(rank=rank, world_size=world_size, context=local_env.context)
+    return env
+
+
+@pytest.fixture
+def write_dat():
+    """
+    Returns write(path, table, rows): writes rows ({column: value} dicts) as a TPCx-BB `|`
+    delimited file, with the columns of table in schema order. Missing columns are left empty
+    """
+    def write(path, table, rows):
+        names = get_arrow_schema(table).names
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as fp:
+            for row in rows:
+                fp.write("|".join("" if row.get(c) is None else str(row[c]) for c in names))
+                fp.write("\n")
+        return path
+    return write
+
+
+class ThreadComm:
+    """The allgather/gather of mpi4py's COMM_WORLD, between threads that play the ranks"""
+
+    def __init__(self, size):
+        self.size = size
+        self.barrier = threading.Barrier(size, timeout=30)
+        self.slots = [None] * size
+        self.local = threading.local()
+
+    def allgather(self, obj):
+        self.slots[self.local.rank] = obj
+        self.barrier.wait()
+        gathered = list(self.slots)
+        self.barrier.wait()
+        return gathered
+
+    def Barrier(self):
+        self.barrier.wait()
+
+    def gather(self, obj, root=0):
+        gathered = self.allgather(obj)
+        return gathered if self.local.rank == root else None
+
+
+@pytest.fixture
+def run_ranks(rank_env, monkeypatch):
+    """
+    Returns run(world_size, func): calls func(env) for every rank of world_size, each on its
+    own thread, and returns the results in rank order. The mpi4py collectives of
+    cylon_xbb_tools go through a ThreadComm; cylon operators stay local
+    """
+    def run(world_size, func):
+        comm = ThreadComm(world_size)
+        mpi4py = types.ModuleType("mpi4py")
+        mpi4py.MPI = SimpleNamespace(COMM_WORLD=comm)
+        monkeypatch.setitem(sys.modules, "mpi4py", mpi4py)
+
+        def run_rank(rank):
+            comm.local.rank = rank
+            try:
+                return func(rank_env(rank, world_size))
+            except BaseException:
+                # do not leave the other ranks waiting in a collective
+                comm.barrier.abort()
+                raise
+
+        with ThreadPoolExecutor(max_workers=world_size) as executor:
+            futures = [executor.submit(run_rank, rank) for rank in range(world_size)]
+            return [f.result() for f in futures]
+    return run
@@ -0,0 +1,59 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+
+from cylon_xbb_tools import bucketing
+
+
+class SpecReader:
+    def __init__(self, specs):
+        self.specs = specs
+
+    def get_bucketing(self, table):
+        return self.specs.get(table)
+
+
+def test_split_by_bucket():
+    table = pa.table({"k": [5, -3, None, 8, 1, 4], "v": list("abcdef")})
+    buckets = bucketing.split_by_bucket(table, "k", 4)
+    assert [(b, t.column("k").to_pylist()) for b, t in buckets] == \
+        [(0, [None, 8, 4]), (1, [5, 1]), (3, [-3])]
+
+
+def test_bucket_files(tmp_path):
+    name = bucketing.get_bucket_file_name("store_sales_1", 7)
+    assert bucketing.get_bucket(str(tmp_path / name)) == 7
+    assert bucketing.get_bucket("store_sales_1.parquet") is None
+
+    assert bucketing.read_bucketing(str(tmp_path)) is None
+    bucketing.write_bucketing(str(tmp_path), "ss_customer_sk", 8)
+    assert bucketing.read_bucketing(str(tmp_path)) == ("ss_customer_sk", 8)
+
+
+def test_rank_buckets():
+    assert bucketing.get_rank_buckets(1, 3, 8) == [1, 4, 7]
+    assert sorted(b for r in range(3) for b in bucketing.get_rank_buckets(r, 3, 8)) == \
+        list(range(8))
+
+
+def test_co_bucketed():
+    reader = SpecReader({"store_sales": ("ss_customer_sk", 8), "customer": ("c_customer_sk", 8),
+                         "web_sales": ("ws_bill_customer_sk", 4)})
+    assert bucketing.co_bucketed(reader, [("store_sales", "ss_customer_sk"),
+                                          ("customer", "c_customer_sk")])
+    # other bucket counts, other columns, unbucketed tables
+    assert not bucketing.co_bucketed(reader, [("store_sales", "ss_customer_sk"),
+                                              ("web_sales", "ws_bill_customer_sk")])
+    assert not bucketing.co_bucketed(reader, [("store_sales", "ss_item_sk")])
+    assert not bucketing.co_bucketed(reader, [("customer", "c_customer_sk"), ("item", "i_item_sk")])
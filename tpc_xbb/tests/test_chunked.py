@@ -0,0 +1,64 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools.chunked import concat_dataframes, concat_tables, to_dataframe
+
+
+def make_pieces():
+    return [pa.table({"k": list(range(i * 10, (i + 1) * 10))}) for i in range(3)]
+
+
+def test_concat_tables_zero_copy():
+    pieces = make_pieces()
+    before = pa.total_allocated_bytes()
+    table = concat_tables(pieces + [pieces[0].schema.empty_table()])
+    assert pa.total_allocated_bytes() == before
+    # empty tables add no chunks
+    assert table.column("k").num_chunks == 3
+    assert table.column("k").to_pylist() == list(range(30))
+
+
+def test_concat_tables_single_or_empty():
+    piece = make_pieces()[0]
+    empty = piece.schema.empty_table()
+    assert concat_tables([piece, empty]) is piece
+    assert concat_tables([empty, empty]).num_rows == 0
+
+
+def test_to_dataframe_keeps_chunks(local_env):
+    table = concat_tables(make_pieces())
+    before = pa.total_allocated_bytes()
+    df = to_dataframe(local_env, table)
+    assert pa.total_allocated_bytes() == before
+    assert df.to_arrow().column("k").to_pylist() == list(range(30))
+
+
+def test_to_dataframe_decodes_dictionary_columns(local_env):
+    table = pa.table({"k": [1, 2, 3], "s": pc.dictionary_encode(pa.array(["a", "b", "a"]))})
+    out = to_dataframe(local_env, table).to_arrow()
+    assert out.schema == pa.schema([("k", pa.int64()), ("s", pa.string())])
+    assert out.column("s").to_pylist() == ["a", "b", "a"]
+
+
+def test_concat_dataframes(local_env):
+    dfs = [to_dataframe(local_env, t) for t in make_pieces()]
+    before = pa.total_allocated_bytes()
+    df = concat_dataframes(local_env, dfs)
+    assert pa.total_allocated_bytes() == before
+    assert df.to_arrow().column("k").to_pylist() == list(range(30))
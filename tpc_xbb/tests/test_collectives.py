@@ -0,0 +1,49 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools.collectives import _serialize, allgather, allgather_tables, gather_tables
+
+
+def make_table(rank):
+    return pa.table({"rank": [rank] * (rank + 1)})
+
+
+def test_single_rank(local_env):
+    table = make_table(0)
+    assert allgather(local_env, 5) == [5]
+    assert gather_tables(local_env, table) == [table]
+    assert allgather_tables(local_env, table) == [table]
+
+
+def test_collectives(run_ranks):
+    assert run_ranks(3, lambda env: allgather(env, env.rank * 10)) == [[0, 10, 20]] * 3
+
+    gathered = run_ranks(3, lambda env: gather_tables(env, make_table(env.rank), root=1))
+    assert gathered[0] is None and gathered[2] is None
+    assert [t.equals(make_table(r)) for r, t in enumerate(gathered[1])] == [True] * 3
+
+    for tables in run_ranks(3, lambda env: allgather_tables(env, make_table(env.rank))):
+        assert [t.num_rows for t in tables] == [1, 2, 3]
+
+
+def test_sliced_tables(run_ranks):
+    """sliced tables are sent without the rest of their buffers"""
+    table = pa.table({"v": list(range(1000))})
+    assert len(_serialize(table.slice(0, 10))) < len(_serialize(table)) / 10
+    tables = run_ranks(2, lambda env: allgather_tables(env, table.slice(env.rank * 10, 10)))
+    assert tables[0][1].column("v").to_pylist() == list(range(10, 20))
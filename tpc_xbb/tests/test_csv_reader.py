@@ -0,0 +1,315 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import os
+
+import pyarrow as pa
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools import zonemap
+from cylon_xbb_tools.readers import CSVReader, close_readers, get_byte_ranges
+from cylon_xbb_tools.schemas import get_arrow_schema
+
+COLS = ["ss_item_sk", "ss_net_paid"]
+
+
+@pytest.fixture
+def sales_dir(tmp_path, write_dat):
+    """store_sales in 2 partition files of 10 rows, ss_net_paid = ss_item_sk + 0.01"""
+    for part in range(2):
+        write_dat(str(tmp_path / "store_sales" / f"store_sales_{part + 1}.dat"), "store_sales",
+                  [{"ss_item_sk": k, "ss_net_paid": f"{k}.01"}
+                   for k in range(part * 10, (part + 1) * 10)])
+    return str(tmp_path)
+
+
+def test_read_batches(sales_dir, local_env):
+    reader = CSVReader(sales_dir, rank=0, world_size=1)
+    batches = list(reader.read_batches(local_env, "store_sales", relevant_cols=COLS,
+                                       batch_rows=3))
+    assert all(b.num_rows <= 3 for b in batches)
+    table = pa.Table.from_batches(batches)
+    assert table.column_names == COLS
+    assert table.column("ss_item_sk").to_pylist() == list(range(20))
+    assert table.column("ss_net_paid").to_pylist()[:2] == [0.01, 1.01]
+
+
+def test_exact_decimals(sales_dir, local_env):
+    reader = CSVReader(sales_dir, rank=0, world_size=1, exact_decimals=True)
+    expected = [k * 100 + 1 for k in range(20)]
+
+    read = reader.read(local_env, "store_sales", relevant_cols=COLS).to_arrow()
+    assert read.schema.field("ss_net_paid").type == pa.int64()
+    assert read.column("ss_net_paid").to_pylist() == expected
+
+    batches = list(reader.read_batches(local_env, "store_sales", relevant_cols=COLS,
+                                       batch_rows=7))
+    assert all(b.schema.field("ss_net_paid").type == pa.int64() for b in batches)
+    assert pa.Table.from_batches(batches).column("ss_net_paid").to_pylist() == expected
+
+
+def test_zone_maps_prune_rank_pieces(tmp_path, rank_env, write_dat):
+    """store_sales sorted on ss_sold_date_sk, 2 files of 200 rows split across 2 ranks"""
+    for part in range(2):
+        write_dat(str(tmp_path / "data" / "store_sales" / f"store_sales_{part + 1}.dat"),
+                  "store_sales", [{"ss_sold_date_sk": k, "ss_item_sk": k}
+                                  for k in range(part * 200, (part + 1) * 200)])
+    zone_map_dir = str(tmp_path / "zone_maps")
+    filters = [("ss_sold_date_sk", ">=", 150), ("ss_sold_date_sk", "<", 250)]
+
+    keys, all_pieces = [], []
+    for rank in range(2):
+        reader = CSVReader(str(tmp_path / "data"), rank=rank, world_size=2, zone_maps=True,
+                           zone_map_chunk_size=256, zone_map_dir=zone_map_dir)
+        pieces = reader._get_pieces("store_sales")
+        all_pieces += pieces
+        pruned = reader._prune_pieces("store_sales", pieces, filters)
+        # only the chunks of the rank's own pieces are indexed
+        for filepath, start, end in pieces:
+            chunks = zonemap.read_zone_map(zone_map_dir, filepath, start, end)
+            assert chunks[0][0] == start and chunks[-1][1] == end
+        assert sum(e - s for _, s, e in pruned) < sum(e - s for _, s, e in pieces)
+
+        df = reader.read(rank_env(rank, 2), "store_sales", relevant_cols=["ss_sold_date_sk"],
+                         filters=filters)
+        keys += df.to_arrow().column(0).to_pylist()
+    assert sorted(keys) == list(range(150, 250))
+    # one zone map per piece, not per file
+    assert len(os.listdir(zone_map_dir)) == len(all_pieces) == 3
+
+
+def test_zone_maps_off_by_default(tmp_path, local_env, write_dat):
+    write_dat(str(tmp_path / "store_sales" / "store_sales_1.dat"), "store_sales",
+              [{"ss_sold_date_sk": k} for k in range(10)])
+    zone_map_dir = str(tmp_path / "zone_maps")
+    reader = CSVReader(str(tmp_path), rank=0, world_size=1, zone_map_dir=zone_map_dir)
+    df = reader.read(local_env, "store_sales", relevant_cols=["ss_sold_date_sk"],
+                     filters=[("ss_sold_date_sk", ">", 7)])
+    assert df.to_arrow().column(0).to_pylist() == [8, 9]
+    assert not os.path.exists(zone_map_dir)
+
+
+@pytest.mark.parametrize("world_size", [1, 2])
+def test_compressed_files(tmp_path, rank_env, write_dat, world_size):
+    """item_1 is plain only, item_2 compressed only, item_3 both: each is read once"""
+    table_dir = tmp_path / "data" / "item"
+    for part, suffixes in ((1, [""]), (2, [".gz"]), (3, ["", ".zst"])):
+        path = write_dat(str(table_dir / f"item_{part}.dat"), "item",
+                         [{"i_item_sk": part * 10 + k} for k in range(5)])
+        for suffix in suffixes:
+            if suffix:
+                with open(path, "rb") as src, pa.CompressedOutputStream(
+                        path + suffix, {".gz": "gzip", ".zst": "zstd"}[suffix]) as dst:
+                    dst.write(src.read())
+        if "" not in suffixes:
+            os.remove(path)
+
+    keys = []
+    for rank in range(world_size):
+        reader = CSVReader(str(tmp_path / "data"), rank=rank, world_size=world_size)
+        df = reader.read(rank_env(rank, world_size), "item", relevant_cols=["i_item_sk"])
+        keys += df.to_arrow().column(0).to_pylist()
+    assert sorted(keys) == [p * 10 + k for p in (1, 2, 3) for k in range(5)]
+
+
+def test_not_empty_filter(tmp_path, local_env, write_dat):
+    """q07: missing ca_state values are empty strings, not nulls"""
+    write_dat(str(tmp_path / "customer_address" / "customer_address_1.dat"), "customer_address",
+              [{"ca_address_sk": k, "ca_state": "CA" if k % 2 else None, "ca_city": "x"}
+               for k in range(6)])
+    reader = CSVReader(str(tmp_path), rank=0, world_size=1)
+    filters = [("ca_state", "!=", "")]
+
+    table = reader.read(local_env, "customer_address", relevant_cols=["ca_address_sk", "ca_state"],
+                        filters=filters).to_arrow()
+    assert table.column_names == ["ca_address_sk", "ca_state"]
+    assert table.column("ca_address_sk").to_pylist() == [1, 3, 5]
+
+    # filter columns are parsed, but not returned
+    table = reader.read(local_env, "customer_address", relevant_cols=["ca_address_sk"],
+                        filters=filters).to_arrow()
+    assert table.column_names == ["ca_address_sk"]
+    assert table.column(0).to_pylist() == [1, 3, 5]
+
+
+def test_refresh_partitions(tmp_path, local_env, write_dat):
+    """rank r reads $TABLE_{r+1} of data and data_refresh"""
+    for data_dir, offset in (("data", 0), ("data_refresh", 100)):
+        for part in range(2):
+            write_dat(str(tmp_path / data_dir / "store_sales" / f"store_sales_{part + 1}.dat"),
+                      "store_sales", [{"ss_item_sk": offset + part * 10 + k} for k in range(3)])
+
+    reader = CSVReader(str(tmp_path / "data"), rank=1)
+    df = reader.read(local_env, "store_sales", relevant_cols=["ss_item_sk"])
+    assert sorted(df.to_arrow().column(0).to_pylist()) == [10, 11, 12, 110, 111, 112]
+    assert set(reader.read_times["store_sales"]) == {"data", "data_refresh"}
+
+
+def test_cache(sales_dir, local_env, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    reader = CSVReader(sales_dir, rank=0, world_size=1, cache_dir=cache_dir)
+
+    def read(**kwargs):
+        return reader.read(local_env, "store_sales", relevant_cols=COLS, **kwargs).to_arrow()
+
+    first = read()
+    assert "cache" not in reader.read_times["store_sales"]
+    assert read().equals(first)
+    assert "cache" in reader.read_times["store_sales"]
+
+    # other read arguments are other entries
+    assert read(filters=[("ss_item_sk", "<", 5)]).num_rows == 5
+    assert len(os.listdir(cache_dir)) == 2
+
+    # a changed source invalidates the entry
+    with open(os.path.join(sales_dir, "store_sales", "store_sales_1.dat"), "a") as fp:
+        fp.write("|".join(["99"] * len(get_arrow_schema("store_sales").names)) + "\n")
+    assert read().num_rows == 21
+    assert "cache" not in reader.read_times["store_sales"]
+
+
+def test_byte_ranges(tmp_path):
+    paths = []
+    for part, rows in enumerate((7, 30, 1)):
+        path = tmp_path / f"t_{part}.dat"
+        path.write_text("".join(f"{part}|{k}|{'x' * (k % 5)}\n" for k in range(rows)))
+        paths.append(str(path))
+
+    for world_size in (1, 2, 3, 5, 64):
+        lines = []
+        for rank in range(world_size):
+            for f, start, end in get_byte_ranges(paths, rank, world_size):
+                with open(f, "rb") as fp:
+                    fp.seek(start)
+                    data = fp.read(end - start).decode()
+                assert data.endswith("\n")
+                lines += data.splitlines()
+        # every line is read exactly once
+        assert sorted(lines) == sorted(line for p in paths for line in open(p).read().split())
+
+
+@pytest.mark.parametrize("world_size", [1, 3, 50])
+def test_split_across_ranks(sales_dir, rank_env, world_size):
+    keys = []
+    for rank in range(world_size):
+        reader = CSVReader(sales_dir, rank=rank, world_size=world_size)
+        table = reader.read(rank_env(rank, world_size), "store_sales", relevant_cols=COLS) \
+            .to_arrow()
+        # ranks without bytes get an empty table with the schema
+        assert table.schema.names == COLS
+        keys += table.column("ss_item_sk").to_pylist()
+    assert sorted(keys) == list(range(20))
+
+
+def test_node_shared(tmp_path, local_env, write_dat, monkeypatch):
+    """the node leader parses date_dim and publishes it, the other ranks of the node map it"""
+    write_dat(str(tmp_path / "date_dim" / "date_dim_1.dat"), "date_dim",
+              [{"d_date_sk": k, "d_year": 2001} for k in range(10)])
+    node_shared_dir = str(tmp_path / "shm")
+    cols = ["d_date_sk", "d_year"]
+
+    monkeypatch.setenv("OMPI_COMM_WORLD_LOCAL_RANK", "1")
+    follower = CSVReader(str(tmp_path), rank=1, world_size=2, node_shared_dir=node_shared_dir)
+    follower.NODE_SHARED_TIMEOUT = 0
+    with pytest.raises(TimeoutError):
+        follower.read(local_env, "date_dim", relevant_cols=cols)
+
+    monkeypatch.setenv("OMPI_COMM_WORLD_LOCAL_RANK", "0")
+    leader = CSVReader(str(tmp_path), rank=0, world_size=2, node_shared_dir=node_shared_dir)
+    published = leader.read(local_env, "date_dim", relevant_cols=cols).to_arrow()
+    assert published.num_rows == 10
+
+    assert follower.read(local_env, "date_dim", relevant_cols=cols).to_arrow().equals(published)
+    assert "node_shared" in follower.read_times["date_dim"]
+
+
+def node_shared_readers(tmp_path, monkeypatch, write_dat, rows):
+    write_dat(str(tmp_path / "date_dim" / "date_dim_1.dat"), "date_dim", rows)
+    readers = []
+    for local_rank in range(2):
+        monkeypatch.setenv("OMPI_COMM_WORLD_LOCAL_RANK", str(local_rank))
+        readers.append(CSVReader(str(tmp_path), rank=local_rank, world_size=2,
+                                 node_shared_dir=str(tmp_path / "shm")))
+    return readers
+
+
+def test_node_leader_maps_the_published_table(tmp_path, local_env, write_dat, monkeypatch):
+    leader, _ = node_shared_readers(tmp_path, monkeypatch, write_dat,
+                                    [{"d_date_sk": k, "d_year": 2001} for k in range(1000)])
+    before = pa.total_allocated_bytes()
+    df = leader.read(local_env, "date_dim", relevant_cols=["d_date_sk", "d_year"])
+    # the parsed table is dropped, the leader keeps the memory mapped copy only
+    assert pa.total_allocated_bytes() == before
+    assert df.to_arrow().num_rows == 1000
+
+
+def test_node_leader_failure(tmp_path, local_env, write_dat, monkeypatch):
+    leader, follower = node_shared_readers(tmp_path, monkeypatch, write_dat,
+                                           [{"d_date_sk": "not_an_int"}])
+    with pytest.raises(pa.ArrowInvalid):
+        leader.read(local_env, "date_dim")
+    # the other ranks of the node fail too, instead of waiting for the table
+    with pytest.raises(RuntimeError, match="node leader failed to read date_dim"):
+        follower.read(local_env, "date_dim")
+
+    # failure markers of earlier runs are ignored
+    follower.created += 2 * follower.NODE_SHARED_FAILURE_SLACK
+    follower.NODE_SHARED_TIMEOUT = 0
+    with pytest.raises(TimeoutError):
+        follower.read(local_env, "date_dim")
+
+
+def test_close_readers_removes_node_shared_tables(tmp_path, local_env, write_dat, monkeypatch):
+    leader, follower = node_shared_readers(tmp_path, monkeypatch, write_dat,
+                                           [{"d_date_sk": k} for k in range(10)])
+    leader_df = leader.read(local_env, "date_dim")
+    follower_df = follower.read(local_env, "date_dim")
+    assert len(os.listdir(tmp_path / "shm")) == 1
+
+    close_readers(local_env)
+    assert os.listdir(tmp_path / "shm") == []
+    # the tables mapped from the removed file stay valid
+    assert leader_df.to_arrow().equals(follower_df.to_arrow())
+    assert follower_df.to_arrow().column("d_date_sk").to_pylist() == list(range(10))
+
+
+def test_io_tokens(sales_dir, rank_env, tmp_path):
+    keys = []
+    for rank in range(2):
+        reader = CSVReader(sales_dir, rank=rank, world_size=2, io_tokens_per_device=1,
+                           io_token_dir=str(tmp_path / "tokens"))
+        df = reader.read(rank_env(rank, 2), "store_sales", relevant_cols=COLS)
+        keys += df.to_arrow().column("ss_item_sk").to_pylist()
+    assert sorted(keys) == list(range(20))
+
+
+def test_io_tokens_read_batches(sales_dir, tmp_path):
+    reader = CSVReader(sales_dir, rank=0, world_size=1, io_tokens_per_device=1,
+                       io_token_dir=str(tmp_path / "tokens"))
+    batches = list(reader.read_batches(None, "store_sales", relevant_cols=COLS, batch_rows=3))
+    assert sorted(k for b in batches for k in b.column(0).to_pylist()) == list(range(20))
+
+
+def test_staged_reads(sales_dir, local_env, tmp_path):
+    reader = CSVReader(sales_dir, rank=0, world_size=1, stage_dir=str(tmp_path / "stage"))
+    with reader.stager:
+        expected = reader.read(local_env, "store_sales", relevant_cols=COLS).to_arrow()
+        for future in list(reader.stager._pending.values()):
+            future.result()
+        pieces = reader._get_pieces("store_sales")
+        assert all(reader.stager.is_staged(f) for f, _, _ in pieces)
+        # staged copies are read with the same result
+        assert reader.read(local_env, "store_sales", relevant_cols=COLS).to_arrow() \
+            .equals(expected)
@@ -0,0 +1,111 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import os
+import sys
+
+import pyarrow.parquet as pq
+import pytest
+
+from cylon_xbb_tools import bucketing
+from cylon_xbb_tools.schemas import get_arrow_schema
+
+# scripts are not a package. Conversion processes import the script by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "scripts"))
+import csv_to_parquet  # noqa: E402
+
+
+def get_args(data_d, **kwargs):
+    args = {"scale": [1], "parts": [2], "tables": ["item"], "data_d": str(data_d),
+            "out_d": None, "row_group_size": 1000, "compression": "snappy", "workers": 1,
+            "bucket_by": [], "num_buckets": 4}
+    args.update(kwargs)
+    return args
+
+
+@pytest.fixture
+def item_dir(tmp_path, write_dat):
+    """item partitions: item_1 with 10 rows, item_2 empty (0 bytes)"""
+    table_dir = tmp_path / "2" / "sf1" / "data" / "item"
+    write_dat(str(table_dir / "item_1.dat"), "item",
+              [{"i_item_sk": k, "i_item_id": f"id{k}", "i_current_price": 1.5} for k in range(10)])
+    open(table_dir / "item_2.dat", "w").close()
+    return tmp_path
+
+
+def test_convert_with_typed_schema(item_dir):
+    csv_to_parquet.main(get_args(item_dir))
+    out_dir = item_dir / "2" / "sf1" / "data" / "item"
+    table = pq.read_table(out_dir / "item_1.parquet")
+    assert table.schema.equals(get_arrow_schema("item"), check_metadata=False)
+    assert table.column("i_item_sk").to_pylist() == list(range(10))
+
+    # empty sources are converted to empty files with the schema
+    empty = pq.read_table(out_dir / "item_2.parquet")
+    assert empty.num_rows == 0 and empty.schema.names == get_arrow_schema("item").names
+
+    # unchanged sources are not converted again
+    assert not csv_to_parquet.convert_file("item", str(out_dir / "item_1.dat"),
+                                           str(out_dir / "item_1.parquet"), 1000, "snappy")
+
+
+def test_bucketed_with_empty_source(item_dir):
+    csv_to_parquet.main(get_args(item_dir, bucket_by=["item:i_item_sk"]))
+    out_dir = str(item_dir / "2" / "sf1" / "data" / "item")
+    assert bucketing.read_bucketing(out_dir) == ("i_item_sk", 4)
+    files = sorted(os.listdir(out_dir))
+    assert [f for f in files if f.endswith(".parquet")] == \
+        [bucketing.get_bucket_file_name("item_1", b) for b in range(4)]
+    for b in range(4):
+        keys = pq.read_table(os.path.join(out_dir, bucketing.get_bucket_file_name("item_1", b)))\
+            .column("i_item_sk").to_pylist()
+        assert all(k % 4 == b for k in keys)
+
+
+@pytest.mark.parametrize("bucket_by", [[], ["item:i_item_sk"]])
+def test_missing_outputs_are_converted_again(item_dir, bucket_by):
+    args = get_args(item_dir, bucket_by=bucket_by)
+    csv_to_parquet.main(args)
+    out_dir = item_dir / "2" / "sf1" / "data" / "item"
+    outputs = sorted(f for f in os.listdir(out_dir) if f.endswith(".parquet"))
+    src, dst = str(out_dir / "item_1.dat"), str(out_dir / "item_1.parquet")
+    convert_args = (1000, "snappy", "i_item_sk", 4) if bucket_by else (1000, "snappy")
+    assert not csv_to_parquet.convert_file("item", src, dst, *convert_args)
+
+    os.remove(out_dir / [f for f in outputs if f.startswith("item_1")][-1])
+    assert csv_to_parquet.convert_file("item", src, dst, *convert_args)
+    assert sorted(f for f in os.listdir(out_dir) if f.endswith(".parquet")) == outputs
+
+
+def test_failed_file_does_not_stop_conversion(item_dir):
+    table_dir = item_dir / "2" / "sf1" / "data" / "item"
+    with open(table_dir / "item_3.dat", "w") as fp:
+        fp.write("not_an_int|x\n")
+
+    with pytest.raises(SystemExit):
+        csv_to_parquet.main(get_args(item_dir, bucket_by=["item:i_item_sk"]))
+    # the bucketing of the converted files is written anyway
+    assert bucketing.read_bucketing(str(table_dir)) == ("i_item_sk", 4)
+    assert os.path.exists(table_dir / bucketing.get_bucket_file_name("item_1", 0))
+
+
+def test_tasks_prefer_plain_files(tmp_path):
+    table_dir = tmp_path / "data" / "item"
+    os.makedirs(table_dir)
+    for name in ("item_1.dat", "item_1.dat.gz", "item_2.dat.zst"):
+        open(table_dir / name, "w").close()
+    tasks = csv_to_parquet.get_tasks(str(tmp_path), "out", ["item"])
+    assert [(os.path.basename(src), dst) for _, src, dst in tasks] == [
+        ("item_1.dat", "out/data/item/item_1.parquet"),
+        ("item_2.dat.zst", "out/data/item/item_2.parquet")]
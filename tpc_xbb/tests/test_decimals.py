@@ -0,0 +1,37 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+from decimal import Decimal
+
+import pyarrow as pa
+
+from cylon_xbb_tools.decimals import decimal_constant, scale_decimal_columns, to_scaled
+
+
+def test_scale_decimal_columns():
+    table = pa.table({"price": [0.29, 1.15, None, -12.34], "qty": [1, 2, 3, 4],
+                      "dec": pa.array([Decimal("1.00"), Decimal("2.05"), None, Decimal("0.01")],
+                                      pa.decimal128(7, 2))})
+    scaled = scale_decimal_columns(table, {"price": 2, "qty": 2, "dec": 2})
+    # 0.29 * 100 is 28.999999999999996 in floats
+    assert scaled.column("price").to_pylist() == [29, 115, None, -1234]
+    assert scaled.column("price").type == pa.int64()
+    assert scaled.column("dec").to_pylist() == [100, 205, None, 1]
+    # integer columns are left as they are
+    assert scaled.column("qty").to_pylist() == [1, 2, 3, 4]
+
+
+def test_constants():
+    assert to_scaled(1.15) == 115
+    assert decimal_constant(100, True) == 10000
+    assert decimal_constant(100, False) == 100
@@ -0,0 +1,92 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import os
+import threading
+import time
+
+import pytest
+
+from cylon_xbb_tools import io_coordinator, node
+from cylon_xbb_tools.io_coordinator import IOCoordinator
+
+
+def read_all(stream):
+    chunks = []
+    while True:
+        chunk = stream.read(1 << 12)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def test_open_range(tmp_path):
+    path = tmp_path / "data.dat"
+    data = os.urandom(10000)
+    path.write_bytes(data)
+    io = IOCoordinator(token_dir=str(tmp_path / "tokens"), readahead=1000)
+    assert read_all(io.open_range(str(path))) == data
+    assert read_all(io.open_range(str(path), 1234, 5678)) == data[1234:5678]
+
+
+def test_open_range_streams_chunks(tmp_path, monkeypatch):
+    path = tmp_path / "data.dat"
+    data = os.urandom(10000)
+    path.write_bytes(data)
+    io = IOCoordinator(token_dir=str(tmp_path / "tokens"), readahead=1000)
+
+    # one token (and one readahead chunk in memory) per chunk, not one for the whole range
+    tokens = []
+    token = io.token
+    monkeypatch.setattr(io, "token", lambda p: tokens.append(p) or token(p))
+    stream = io.open_range(str(path), 500, 9500)
+    assert stream.read(10) == data[500:510]
+    assert len(tokens) == 1
+    assert read_all(stream) == data[510:9500]
+    assert len(tokens) == 9
+
+
+def test_token_dir_must_be_node_local(tmp_path, monkeypatch):
+    monkeypatch.setattr(io_coordinator, "is_node_local", lambda path: False)
+    with pytest.raises(ValueError, match="network filesystem"):
+        IOCoordinator(token_dir=str(tmp_path / "tokens"))
+
+
+def test_fs_types():
+    assert node.get_fs_type("/proc/self") == "proc"
+    assert node.is_node_local("/proc/self")
+
+
+def test_tokens_per_device(tmp_path):
+    path = tmp_path / "data.dat"
+    path.write_bytes(b"x")
+    io = IOCoordinator(tokens_per_device=2, token_dir=str(tmp_path / "tokens"),
+                       poll_interval=0.001)
+    lock = threading.Lock()
+    holders, max_holders = [0], [0]
+
+    def hold():
+        with io.token(str(path)):
+            with lock:
+                holders[0] += 1
+                max_holders[0] = max(max_holders[0], holders[0])
+            time.sleep(0.02)
+            with lock:
+                holders[0] -= 1
+
+    threads = [threading.Thread(target=hold) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max_holders[0] == 2
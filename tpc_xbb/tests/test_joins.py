@@ -0,0 +1,105 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools.chunked import to_dataframe
+from cylon_xbb_tools.joins import broadcast, broadcast_merge, semi_join, smart_merge
+
+WORLD_SIZE = 3
+
+
+def sales(env):
+    """rank local partition of a fact table: 10 rows per rank, item keys 0..9"""
+    return to_dataframe(env, pa.table({"ss_item_sk": list(range(10)),
+                                       "ss_rank": [env.rank] * 10}))
+
+
+def items(env):
+    """rank local partition of a dimension: item r, r + 3, r + 6... on rank r"""
+    return to_dataframe(env, pa.table({"i_item_sk": list(range(env.rank, 12, WORLD_SIZE))}))
+
+
+def sorted_keys(df, column):
+    return sorted(df.to_arrow().column(column).to_pylist())
+
+
+def test_broadcast(run_ranks):
+    for df in run_ranks(WORLD_SIZE, lambda env: broadcast(env, items(env))):
+        assert sorted_keys(df, "i_item_sk") == list(range(12))
+
+
+def test_broadcast_merge(run_ranks):
+    results = run_ranks(WORLD_SIZE, lambda env: broadcast_merge(
+        env, sales(env), items(env), left_on=["ss_item_sk"], right_on=["i_item_sk"],
+        suffixes=("", "")))
+    # every rank joins all of its rows, with the items of all ranks
+    for df in results:
+        assert sorted_keys(df, "ss_item_sk") == list(range(10))
+
+
+@pytest.mark.parametrize("threshold, strategy", [(1 << 20, "broadcast right"), (0, "shuffle")])
+def test_smart_merge_strategy(run_ranks, capsys, monkeypatch, threshold, strategy):
+    def shuffle_merge(left, right, env=None, **kwargs):
+        # a shuffle join needs a distributed cylon env, only check that it was picked
+        assert env is not None
+        return "shuffled"
+
+    def rank_merge(env):
+        left = sales(env)
+        if strategy == "shuffle":
+            monkeypatch.setattr(type(left), "merge", shuffle_merge)
+        return smart_merge(left, items(env), env=env, left_on=["ss_item_sk"],
+                           right_on=["i_item_sk"], suffixes=("", ""),
+                           broadcast_threshold=threshold, verbose=True)
+
+    results = run_ranks(WORLD_SIZE, rank_merge)
+    assert f"smart_merge: {strategy} left: 30 rows" in capsys.readouterr().out
+    if strategy == "shuffle":
+        assert results == ["shuffled"] * WORLD_SIZE
+    else:
+        assert all(sorted_keys(df, "ss_item_sk") == list(range(10)) for df in results)
+
+
+def test_smart_merge_local(local_env):
+    # replicated sides and env=None are joined locally, without any collective
+    df = smart_merge(sales(local_env), items(local_env), env=local_env, right_replicated=True,
+                     left_on=["ss_item_sk"], right_on=["i_item_sk"], suffixes=("", ""))
+    assert sorted_keys(df, "ss_item_sk") == [0, 3, 6, 9]
+
+
+@pytest.mark.parametrize("right_replicated", [False, True])
+def test_semi_join(run_ranks, right_replicated):
+    def rank_semi_join(env):
+        keys = to_dataframe(env, pa.table({"k": [5, 5, None, 7] if env.rank == 1 else [2]}))
+        left = to_dataframe(env, pa.table({"ss_item_sk": [1, 2, None, 5, 7, 7]}))
+        return semi_join(left, keys, env, left_on="ss_item_sk", right_on="k",
+                         right_replicated=right_replicated)
+
+    for rank, df in enumerate(run_ranks(WORLD_SIZE, rank_semi_join)):
+        assert df.to_arrow().column_names == ["ss_item_sk"]
+        if right_replicated:
+            # only the rank local keys are used
+            assert sorted_keys(df, "ss_item_sk") == ([5, 7, 7] if rank == 1 else [2])
+        else:
+            assert sorted_keys(df, "ss_item_sk") == [2, 5, 7, 7]
+
+
+def test_smart_merge_quiet_by_default(run_ranks, capsys):
+    run_ranks(WORLD_SIZE, lambda env: smart_merge(sales(env), items(env), env=env,
+                                                  left_on=["ss_item_sk"],
+                                                  right_on=["i_item_sk"], suffixes=("", "")))
+    assert "smart_merge" not in capsys.readouterr().out
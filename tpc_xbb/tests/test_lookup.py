@@ -0,0 +1,55 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools.chunked import to_dataframe
+from cylon_xbb_tools.lookup import DenseKeyIndex, lookup_merge
+
+
+def date_dim():
+    return pa.table({"d_date_sk": [12, 10, 11, 14], "d_year": [2001, 2000, 2000, 2002]})
+
+
+def test_dense_key_index():
+    assert DenseKeyIndex.is_dense(date_dim(), "d_date_sk")
+    assert not DenseKeyIndex.is_dense(pa.table({"k": ["a"]}), "k")
+    assert not DenseKeyIndex.is_dense(pa.table({"k": pa.array([None], pa.int64())}), "k")
+
+    index = DenseKeyIndex(date_dim(), "d_date_sk")
+    assert index.unique and index.min_key == 10 and index.num_slots == 5
+    keys = pa.chunked_array([[10, 13, None], [14, 99, -5]])
+    assert index.get_rows(keys).tolist() == [1, -1, -1, 3, -1, -1]
+    assert not DenseKeyIndex(pa.table({"k": [1, 2, 1]}), "k").unique
+
+
+@pytest.mark.parametrize("how, years", [("inner", [2000, 2001, 2002]),
+                                        ("left", [2000, 2001, None, 2002, None])])
+def test_lookup_merge(local_env, how, years):
+    sales = to_dataframe(local_env, pa.table({"ss_sold_date_sk": [10, 12, 13, 14, None],
+                                              "ss_net_paid": [1.0, 2.0, 3.0, 4.0, 5.0]}))
+    out = lookup_merge(local_env, sales, to_dataframe(local_env, date_dim()),
+                       left_on="ss_sold_date_sk", right_on="d_date_sk", how=how).to_arrow()
+    assert out.column("d_year").to_pylist() == years
+    assert out.column_names == ["ss_sold_date_sk", "ss_net_paid", "d_date_sk", "d_year"]
+
+
+def test_lookup_merge_falls_back_to_hash_merge(local_env):
+    # duplicate dimension keys can not be indexed densely
+    dim = to_dataframe(local_env, pa.table({"d_date_sk": [10, 10], "d_year": [2000, 2001]}))
+    sales = to_dataframe(local_env, pa.table({"ss_sold_date_sk": [10, 11]}))
+    out = lookup_merge(local_env, sales, dim, left_on="ss_sold_date_sk", right_on="d_date_sk")
+    assert out.row_count == 2
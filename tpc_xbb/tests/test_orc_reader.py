@@ -0,0 +1,80 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import os
+
+import pyarrow as pa
+import pyarrow.orc as orc
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools.readers import ORCReader, get_table_files
+
+WORLD_SIZE = 2
+
+
+@pytest.fixture
+def orc_dir(tmp_path):
+    """date_dim (replicated) and store_sales, 3 files of 400 rows (one stripe each)"""
+    for table, key in (("date_dim", "d_date_sk"), ("store_sales", "ss_sold_date_sk")):
+        os.makedirs(tmp_path / "data" / table)
+        for i in range(3):
+            keys = list(range(i * 400, (i + 1) * 400))
+            orc.write_table(pa.table({key: keys, "v": [k % 5 for k in keys]}),
+                            str(tmp_path / "data" / table / f"part_{i}.orc"),
+                            batch_size=100)
+    return str(tmp_path / "data")
+
+
+def read_all_ranks(reader, rank_env, table, **kwargs):
+    return [reader.read(rank_env(r, WORLD_SIZE), table, **kwargs).to_arrow()
+            for r in range(WORLD_SIZE)]
+
+
+def test_stripes_split_across_ranks(orc_dir, rank_env):
+    tables = read_all_ranks(ORCReader(orc_dir), rank_env, "store_sales")
+    assert sorted(k for t in tables for k in t.column("ss_sold_date_sk").to_pylist()) == \
+        list(range(1200))
+
+
+def test_single_partition_table_replicated(orc_dir, rank_env):
+    tables = read_all_ranks(ORCReader(orc_dir), rank_env, "date_dim")
+    assert [t.num_rows for t in tables] == [1200] * WORLD_SIZE
+
+
+def test_filters_and_projection(orc_dir, rank_env):
+    tables = read_all_ranks(ORCReader(orc_dir), rank_env, "store_sales",
+                            relevant_cols=["ss_sold_date_sk"], filters=[("v", "==", 0)])
+    assert all(t.column_names == ["ss_sold_date_sk"] for t in tables)
+    assert sorted(k for t in tables for k in t.column(0).to_pylist()) == \
+        list(range(0, 1200, 5))
+
+
+def test_table_files_without_data_dir(tmp_path):
+    # no data/ dir in the path, so there is no data_refresh/ dir to list
+    os.makedirs(tmp_path / "store_sales")
+    open(tmp_path / "store_sales" / "part_0.orc", "w").close()
+    files = get_table_files(os.path.join(str(tmp_path), "store_sales", "*.orc"), "store_sales")
+    assert len(files) == 1
+
+
+def test_empty_rank_has_the_dictionary_types(tmp_path, rank_env):
+    # a single stripe, so that the first rank reads none
+    os.makedirs(tmp_path / "warehouse")
+    orc.write_table(pa.table({"w_warehouse_sk": [1, 2], "w_warehouse_name": ["a", "b"]}),
+                    str(tmp_path / "warehouse" / "part_0.orc"))
+    tables = read_all_ranks(ORCReader(str(tmp_path), dictionary_encode=True), rank_env,
+                            "warehouse")
+    assert [t.num_rows for t in tables] == [0, 2]
+    assert tables[0].schema == tables[1].schema
@@ -0,0 +1,121 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import os
+import warnings
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools import bucketing
+from cylon_xbb_tools.readers import ParquetReader, build_reader
+
+WORLD_SIZE = 4
+
+
+@pytest.fixture
+def parquet_dir(tmp_path):
+    """
+    date_dim (replicated) and store_sales, 1000 rows each in 2 files of 5 row groups. The second
+    store_sales file is its data_refresh file
+    """
+    for table, key in (("date_dim", "d_date_sk"), ("store_sales", "ss_sold_date_sk")):
+        for i in range(2):
+            data_dir = "data_refresh" if table == "store_sales" and i == 1 else "data"
+            os.makedirs(tmp_path / data_dir / table, exist_ok=True)
+            keys = list(range(i * 500, (i + 1) * 500))
+            pq.write_table(pa.table({key: keys, "v": [k % 7 for k in keys]}),
+                           tmp_path / data_dir / table / f"part_{i}.parquet",
+                           row_group_size=100)
+    return str(tmp_path / "data")
+
+
+def read_all_ranks(reader, rank_env, table, **kwargs):
+    return [reader.read(rank_env(r, WORLD_SIZE), table, **kwargs).to_arrow()
+            for r in range(WORLD_SIZE)]
+
+
+@pytest.mark.parametrize("split_row_groups", [True, False])
+def test_partitioned_table_split_across_ranks(parquet_dir, rank_env, split_row_groups):
+    reader = ParquetReader(parquet_dir, split_row_groups=split_row_groups)
+    keys = [k for t in read_all_ranks(reader, rank_env, "store_sales")
+            for k in t.column("ss_sold_date_sk").to_pylist()]
+    assert sorted(keys) == list(range(1000))
+
+
+def test_single_partition_table_replicated(parquet_dir, rank_env):
+    reader = ParquetReader(parquet_dir)
+    tables = read_all_ranks(reader, rank_env, "date_dim")
+    assert [t.num_rows for t in tables] == [1000] * WORLD_SIZE
+
+
+def test_projection_and_filters(parquet_dir, rank_env):
+    reader = ParquetReader(parquet_dir)
+    tables = read_all_ranks(reader, rank_env, "store_sales", relevant_cols=["ss_sold_date_sk"],
+                            filters=[("v", "==", 3)])
+    assert all(t.column_names == ["ss_sold_date_sk"] for t in tables)
+    keys = sorted(k for t in tables for k in t.column(0).to_pylist())
+    assert keys == [k for k in range(1000) if k % 7 == 3]
+
+
+def test_build_reader_ignores_split_row_groups_for_csv(tmp_path):
+    reader = build_reader(str(tmp_path), data_format="csv", rank=0, world_size=1,
+                          split_row_groups=False)
+    assert "store_sales" in reader.show_tables()
+
+
+def test_bucketed_table_read_by_bucket(tmp_path, rank_env):
+    table_dir = tmp_path / "store_sales"
+    os.makedirs(table_dir)
+    for part in range(2):
+        keys = pa.array(range(part * 100, (part + 1) * 100))
+        for bucket, t in bucketing.split_by_bucket(pa.table({"ss_customer_sk": keys}),
+                                                   "ss_customer_sk", 4):
+            pq.write_table(t, table_dir / bucketing.get_bucket_file_name(f"part_{part}", bucket))
+    bucketing.write_bucketing(str(table_dir), "ss_customer_sk", 4)
+
+    reader = ParquetReader(str(tmp_path))
+    assert reader.get_bucketing("store_sales") == ("ss_customer_sk", 4)
+    tables = read_all_ranks(reader, rank_env, "store_sales")
+    # bucket b is read by rank b % world_size
+    for rank, t in enumerate(tables):
+        assert all(k % 4 % WORLD_SIZE == rank for k in t.column(0).to_pylist())
+    assert sorted(k for t in tables for k in t.column(0).to_pylist()) == list(range(200))
+
+
+def test_empty_rank_has_the_dictionary_types(tmp_path, rank_env):
+    # a single row group, so that all ranks but the last read none
+    os.makedirs(tmp_path / "warehouse")
+    pq.write_table(pa.table({"w_warehouse_sk": [1, 2], "w_warehouse_name": ["a", "b"]}),
+                   tmp_path / "warehouse" / "part_0.parquet")
+    reader = ParquetReader(str(tmp_path), dictionary_encode=True)
+    tables = read_all_ranks(reader, rank_env, "warehouse")
+    assert [t.num_rows for t in tables] == [0] * (WORLD_SIZE - 1) + [2]
+    assert all(t.schema == tables[-1].schema for t in tables)
+
+
+@pytest.mark.parametrize("data_format", ["parquet", "orc"])
+def test_build_reader_warns_about_csv_only_args(tmp_path, data_format):
+    # the queries pass every reader argument, unset config keys are None
+    args = dict(rank=1, world_size=2, cache_dir=None, zone_maps=None, split_row_groups=True)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        build_reader(str(tmp_path), data_format=data_format, **args)
+
+    with pytest.warns(UserWarning, match="stage_dir='/stage' is ignored"):
+        build_reader(str(tmp_path), data_format=data_format, stage_dir="/stage", **args)
+    with pytest.raises(TypeError):
+        build_reader(str(tmp_path), data_format=data_format, not_an_arg=1)
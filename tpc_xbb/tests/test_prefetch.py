@@ -0,0 +1,52 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import threading
+
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools.prefetch import TablePrefetcher
+
+
+class RecordingReader:
+    def __init__(self):
+        self.reads = []
+        self.lock = threading.Lock()
+
+    def read(self, env, table, relevant_cols=None, **kwargs):
+        with self.lock:
+            self.reads.append((table, relevant_cols, kwargs))
+        return table, relevant_cols, kwargs
+
+
+def test_prefetch(local_env):
+    reader = RecordingReader()
+    prefetcher = TablePrefetcher(reader, local_env, [
+        ("store_sales", ["ss_item_sk"], {"filters": [("ss_item_sk", ">", 1)]}),
+        ("item", ["i_item_sk"]),
+    ], max_parallel_reads=2)
+    assert prefetcher.get("item") == ("item", ["i_item_sk"], {})
+    assert prefetcher.get("store_sales") == \
+        ("store_sales", ["ss_item_sk"], {"filters": [("ss_item_sk", ">", 1)]})
+    assert [r[0] for r in prefetcher.get_all()] == ["store_sales", "item"]
+    assert len(reader.reads) == 2
+
+
+def test_duplicate_tables_rejected(local_env):
+    reader = RecordingReader()
+    with pytest.raises(ValueError, match="item"):
+        TablePrefetcher(reader, local_env, [("item", ["i_item_sk"]), ("store", None),
+                                            ("item", ["i_category"])])
+    assert reader.reads == []
@@ -0,0 +1,50 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import json
+import os
+
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools.read_stats import READ_STATS, ReadStats, start_timer, write_read_summary
+from cylon_xbb_tools.readers import CSVReader
+
+
+def test_record_and_summarize(local_env, tmp_path):
+    stats = ReadStats()
+    stats.record("item", start_timer(), 1 << 20, 10)
+    stats.record("item", start_timer(), 1 << 20, 5)
+    tables = stats.to_dict()
+    assert tables["item"]["bytes"] == 2 << 20 and tables["item"]["rows"] == 15
+    assert tables["item"]["mb_per_s"] > 0
+
+    summary = stats.summarize(local_env)
+    assert summary["item"]["rows"] == {"min": 15, "max": 15, "mean": 15}
+    write_read_summary(summary, str(tmp_path / "stats.json"))
+    assert json.load(open(tmp_path / "stats.json"))["item"]["bytes"]["max"] == 2 << 20
+
+    stats.reset()
+    assert stats.to_dict() == {}
+
+
+def test_reader_records_reads(tmp_path, local_env, write_dat):
+    path = write_dat(str(tmp_path / "item" / "item_1.dat"), "item",
+                     [{"i_item_sk": k} for k in range(4)])
+    READ_STATS.reset()
+    CSVReader(str(tmp_path), rank=0, world_size=1).read(local_env, "item",
+                                                        relevant_cols=["i_item_sk"])
+    stats = READ_STATS.to_dict()["item"]
+    assert stats["rows"] == 4
+    assert stats["bytes"] == os.path.getsize(path)
@@ -0,0 +1,44 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from cylon_xbb_tools.schemas import DICTIONARY_COLUMNS, DICTIONARY_TYPE, \
+    decode_dictionary_columns, get_arrow_schema, get_column_types, get_decimal_scales, \
+    get_dictionary_columns
+
+
+def test_registry_types():
+    schema = get_arrow_schema("store_sales")
+    assert schema.field("ss_item_sk").type == pa.int64()
+    assert schema.field("ss_net_paid").type == pa.float64()
+    assert get_decimal_scales("store_sales", ["ss_item_sk", "ss_net_paid"]) == {"ss_net_paid": 2}
+
+
+def test_dictionary_columns_opt_in():
+    assert get_dictionary_columns("warehouse") == []
+    assert get_dictionary_columns("warehouse", dictionary_encode=True) == \
+        DICTIONARY_COLUMNS["warehouse"]
+    # explicit columns are always encoded
+    assert get_dictionary_columns("warehouse", ["w_state"]) == ["w_state"]
+    types = get_column_types("warehouse", ["w_warehouse_sk", "w_warehouse_name"],
+                             dictionary_cols=["w_warehouse_name"])
+    assert types == {"w_warehouse_sk": pa.int64(), "w_warehouse_name": DICTIONARY_TYPE}
+
+
+def test_decode_dictionary_columns():
+    table = pa.table({"k": [1, 2], "s": pc.dictionary_encode(pa.array(["a", "b"]))})
+    decoded = decode_dictionary_columns(table)
+    assert decoded.schema == pa.schema([("k", pa.int64()), ("s", pa.string())])
+    assert decoded.column("s").to_pylist() == ["a", "b"]
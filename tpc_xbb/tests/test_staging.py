@@ -0,0 +1,119 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import os
+from threading import Event
+
+from cylon_xbb_tools import staging
+from cylon_xbb_tools.staging import Stager, close_stagers
+
+
+def list_files(root):
+    return sorted(os.path.relpath(os.path.join(d, f), root) for d, _, files in os.walk(root)
+                  for f in files)
+
+
+def make_source(tmp_path, size=1000):
+    path = tmp_path / "data" / "store_sales_1.dat"
+    os.makedirs(path.parent, exist_ok=True)
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+def test_stage(tmp_path):
+    src = make_source(tmp_path)
+    with Stager(str(tmp_path / "stage"), copy_chunk_size=64) as stager:
+        staged = stager.stage(src)
+        assert staged == stager.get_staged_path(src)
+        assert stager.is_staged(src)
+        assert open(staged, "rb").read() == open(src, "rb").read()
+        assert os.stat(staged).st_mtime_ns == os.stat(src).st_mtime_ns
+    # no lock or temp files are left behind
+    assert list_files(str(tmp_path / "stage")) == [os.path.relpath(staged, tmp_path / "stage")]
+
+
+def test_resolve_in_background(tmp_path):
+    src = make_source(tmp_path)
+    with Stager(str(tmp_path / "stage")) as stager:
+        assert stager.resolve(src) == src
+        stager._pending[src].result()
+        assert stager.resolve(src) == stager.get_staged_path(src)
+
+
+def test_close_aborts_copies(tmp_path):
+    src = make_source(tmp_path)
+    stager = Stager(str(tmp_path / "stage"), copy_chunk_size=64)
+    stager.close()
+    assert stager.stage(src) is None
+    assert stager.resolve(src) == src
+    assert list_files(str(tmp_path / "stage")) == []
+
+
+class StopAfter:
+    """An Event that is set after calls is_set() checks, to close a stager mid-copy"""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def is_set(self):
+        self.calls -= 1
+        return self.calls < 0
+
+
+def test_stopped_copy_is_resumed(tmp_path):
+    src = make_source(tmp_path)
+    stager = Stager(str(tmp_path / "stage"), copy_chunk_size=100)
+    stager._closed = StopAfter(4)
+    assert stager.stage(src) is None
+    partial = stager._get_partial_path(src, stager.get_staged_path(src))
+    assert os.path.getsize(partial) == 300
+    stager._closed = Event()
+    stager.close()
+
+    # the next run copies the remaining 7 chunks only: a copy from the start would be stopped
+    stager = Stager(str(tmp_path / "stage"), copy_chunk_size=100)
+    stager._closed = StopAfter(10)
+    assert stager.stage(src) == stager.get_staged_path(src)
+    assert open(stager.get_staged_path(src), "rb").read() == open(src, "rb").read()
+    assert not os.path.exists(partial)
+    stager._closed = Event()
+    stager.close()
+
+
+def test_stale_partial_copy_is_dropped(tmp_path):
+    src = make_source(tmp_path)
+    with Stager(str(tmp_path / "stage")) as stager:
+        stale = stager.get_staged_path(src) + ".1-2.partial"
+        os.makedirs(os.path.dirname(stale))
+        open(stale, "wb").write(b"x" * 10)
+        assert open(stager.stage(src), "rb").read() == open(src, "rb").read()
+    assert not os.path.exists(stale)
+
+
+def test_close_stagers(tmp_path):
+    stagers = [Stager(str(tmp_path / f"stage_{i}")) for i in range(2)]
+    assert all(s in staging._OPEN_STAGERS for s in stagers)
+    close_stagers()
+    assert not any(s in staging._OPEN_STAGERS for s in stagers)
+    assert all(s._closed.is_set() for s in stagers)
+
+
+def test_concurrent_stage(tmp_path):
+    """ranks of a node staging the same file"""
+    src = make_source(tmp_path, size=1 << 20)
+    stagers = [Stager(str(tmp_path / "stage"), copy_chunk_size=4096) for _ in range(4)]
+    futures = [s._executor.submit(s.stage, src) for s in stagers for _ in range(4)]
+    assert {f.result() for f in futures} == {stagers[0].get_staged_path(src)}
+    for s in stagers:
+        s.close()
+    assert len(list_files(str(tmp_path / "stage"))) == 1
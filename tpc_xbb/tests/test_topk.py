@@ -0,0 +1,111 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pytest
+
+pytest.importorskip("pycylon")
+
+from cylon_xbb_tools.chunked import to_dataframe
+from cylon_xbb_tools.readers import CSVReader
+from cylon_xbb_tools.topk import get_sort_keys, limit, select_k, top_k
+
+
+def test_get_sort_keys():
+    assert get_sort_keys("a") == [("a", "ascending")]
+    assert get_sort_keys(["a", "b"], [True, False]) == [("a", "ascending"), ("b", "descending")]
+
+
+def test_select_k():
+    table = pa.table({"a": [5, 3, 9, 1, 7], "b": list("vwxyz")})
+    assert select_k(table, 3, get_sort_keys("a")).column("a").to_pylist() == [1, 3, 5]
+    assert select_k(table, 2, get_sort_keys("a", False)).column("b").to_pylist() == ["x", "z"]
+
+
+def test_top_k_and_limit(local_env):
+    df = to_dataframe(local_env, pa.table({"a": list(range(100, 0, -1))}))
+    assert top_k(local_env, df, 5, by="a").to_arrow().column("a").to_pylist() == [1, 2, 3, 4, 5]
+    assert limit(local_env, df, 3).to_arrow().column("a").to_pylist() == [100, 99, 98]
+    assert limit(local_env, df, 1000).row_count == 100
+
+
+def test_top_k_dictionary_columns(local_env):
+    table = pa.table({"name": pc.dictionary_encode(pa.array(["b", "a", "c", "a"])),
+                      "id": ["2", "9", "1", "3"]})
+    out = top_k(local_env, to_dataframe(local_env, table), 3, by=["name", "id"]).to_arrow()
+    assert out.schema.field("name").type == pa.string()
+    assert list(zip(*out.to_pydict().values())) == [("a", "3"), ("a", "9"), ("b", "2")]
+
+
+def test_dictionary_encoded_read_to_top_k(tmp_path, local_env, write_dat):
+    """q22 tail: ORDER BY w_warehouse_name LIMIT of a dictionary encoded read"""
+    write_dat(str(tmp_path / "warehouse" / "warehouse_1.dat"), "warehouse",
+              [{"w_warehouse_sk": k, "w_warehouse_name": f"wh{k % 3}"} for k in range(6)])
+    cols = ["w_warehouse_sk", "w_warehouse_name"]
+
+    plain = CSVReader(str(tmp_path), rank=0, world_size=1)
+    assert plain.read(local_env, "warehouse", relevant_cols=cols).to_arrow() \
+        .schema.field("w_warehouse_name").type == pa.string()
+
+    # the cached table keeps the encoding, the DataFrame handed to pycylon is decoded
+    cache_dir = tmp_path / "cache"
+    reader = CSVReader(str(tmp_path), rank=0, world_size=1, dictionary_encode=True,
+                       cache_dir=str(cache_dir))
+    df = reader.read(local_env, "warehouse", relevant_cols=cols)
+    cached = ipc.open_file(str(next(cache_dir.iterdir()))).schema
+    assert pa.types.is_dictionary(cached.field("w_warehouse_name").type)
+    assert df.to_arrow().schema.field("w_warehouse_name").type == pa.string()
+    out = top_k(local_env, df, 3, by=["w_warehouse_name", "w_warehouse_sk"]).to_arrow()
+    assert out.column("w_warehouse_name").to_pylist() == ["wh0", "wh0", "wh1"]
+    assert out.column("w_warehouse_sk").to_pylist() == [0, 3, 1]
+
+
+def test_top_k_across_ranks(run_ranks):
+    def rank_top_k(env):
+        # rank r has the keys r, r + 4, r + 8...
+        table = pa.table({"a": list(range(env.rank, 40, 4))[::-1]})
+        return top_k(env, to_dataframe(env, table), 6, by="a", ascending=False).to_arrow()
+
+    results = run_ranks(4, rank_top_k)
+    assert results[0].column("a").to_pylist() == [39, 38, 37, 36, 35, 34]
+    assert all(t.num_rows == 0 and t.column_names == ["a"] for t in results[1:])
+
+
+def test_limit_across_ranks(run_ranks):
+    def rank_limit(env):
+        table = pa.table({"rank": [env.rank] * 3})
+        return limit(env, to_dataframe(env, table), 7).to_arrow()
+
+    results = run_ranks(4, rank_limit)
+    # rows are taken in rank order
+    assert results[0].column("rank").to_pylist() == [0, 0, 0, 1, 1, 1, 2]
+    assert all(t.num_rows == 0 for t in results[1:])
+
+
+@pytest.mark.parametrize("world_size", [1, 2, 4])
+def test_top_k_ties_across_ranks(run_ranks, world_size):
+    """q07 tail: ORDER BY cnt DESC, ca_state LIMIT, with ties on cnt spread over the ranks"""
+    states = [f"s{i:02d}" for i in range(12)]
+    counts = [5, 3, 5, 5, 1, 3, 5, 2, 5, 3, 4, 5]
+
+    def rank_top_k(env):
+        rows = range(env.rank, len(states), env.world_size)
+        table = pa.table({"ca_state": [states[i] for i in rows],
+                          "cnt": [counts[i] for i in rows]})
+        return top_k(env, to_dataframe(env, table), 4, by=["cnt", "ca_state"],
+                     ascending=[False, True]).to_arrow()
+
+    result = run_ranks(world_size, rank_top_k)[0]
+    assert result.column("ca_state").to_pylist() == ["s00", "s02", "s03", "s06"]
@@ -0,0 +1,72 @@
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+##
+import os
+
+import pyarrow as pa
+
+from cylon_xbb_tools import zonemap
+
+
+def test_chunk_may_match():
+    ranges = {"k": (10, 20)}
+    assert zonemap.chunk_may_match(ranges, [("k", ">=", 15)])
+    assert not zonemap.chunk_may_match(ranges, [("k", ">", 20)])
+    assert not zonemap.chunk_may_match(ranges, [("k", "in", [1, 30])])
+    # DNF: one matching conjunction is enough
+    assert zonemap.chunk_may_match(ranges, [[("k", "<", 5)], [("k", "==", 12)]])
+    # all null chunks and unindexed columns
+    assert not zonemap.chunk_may_match({"k": (None, None)}, [("k", "==", 1)])
+    assert zonemap.chunk_may_match(ranges, [("v", "==", 1)])
+
+
+def test_prune_range():
+    chunks = [(0, 10, {"k": (0, 9)}), (10, 20, {"k": (10, 19)}), (20, 30, {"k": (20, 29)})]
+    assert zonemap.prune_range(chunks, 0, 30, [("k", ">=", 12)]) == [(10, 30)]
+    assert zonemap.prune_range(chunks, 0, 30, [("k", "in", [5, 25])]) == [(0, 10), (20, 30)]
+    assert zonemap.prune_range(chunks, 15, 30, [("k", "<", 12)]) == [(15, 20)]
+
+
+def test_get_key_range_filters():
+    table = pa.table({"d_date_sk": [7, 3, 5]})
+    assert zonemap.get_key_range_filters(table, "d_date_sk", "ss_sold_date_sk") == \
+        [("ss_sold_date_sk", ">=", 3), ("ss_sold_date_sk", "<=", 7)]
+    assert zonemap.get_key_range_filters(table.slice(0, 0), "d_date_sk", "ss_sold_date_sk") == \
+        [("ss_sold_date_sk", "in", [])]
+
+
+def test_read_write(tmp_path):
+    data = tmp_path / "data.dat"
+    data.write_text("1|a\n2|b\n")
+    zone_map_dir = str(tmp_path / "zone_maps")
+    chunks = [[0, 4, {"k": [1, 1]}]]
+
+    assert zonemap.read_zone_map(zone_map_dir, str(data), 0, 4) is None
+    assert zonemap.write_zone_map(zone_map_dir, str(data), 0, 4, chunks)
+    assert zonemap.read_zone_map(zone_map_dir, str(data), 0, 4) == chunks
+    # zone maps are per byte range, and never written next to the data
+    assert zonemap.read_zone_map(zone_map_dir, str(data), 4, 8) is None
+    assert sorted(os.listdir(tmp_path)) == ["data.dat", "zone_maps"]
+
+    # stale once the file changes
+    data.write_text("1|a\n2|b\n3|c\n")
+    assert zonemap.read_zone_map(zone_map_dir, str(data), 0, 4) is None
+
+
+def test_failed_write_is_tolerated(tmp_path):
+    data = tmp_path / "data.dat"
+    data.write_text("1|a\n")
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("")
+    assert not zonemap.write_zone_map(str(not_a_dir), str(data), 0, 4, [])
+    assert zonemap.read_zone_map(str(not_a_dir), str(data), 0, 4) is None